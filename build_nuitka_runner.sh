@@ -0,0 +1,3 @@
+# headless-раннер для воркеров: без веб-сервера и его зависимостей
+rm -rf ./cbuilds/runner;
+python -m nuitka --standalone ./src/runner.py --output-dir=./cbuilds/runner --python-flag=no_site --nofollow-import-to=hosting --nofollow-import-to=flask --nofollow-import-to=fastapi --nofollow-import-to=starlette --nofollow-import-to=uvicorn --nofollow-import-to=matplotlib;
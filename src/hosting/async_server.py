@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from hosting.server import create_app
+from hosting.controllers.modeling_core_repository import ModelingCoresSingletone
+from hosting.streaming.snapshot_broadcaster import SnapshotBroadcaster
+
+def findCore(simulationId):
+    """Модель из реестра или None - проверяется до начала ответа"""
+    try:
+        return ModelingCoresSingletone.get(simulationId)
+    except KeyError:
+        return None
+
+async def iterateDeltas(simulationId, core, rate):
+    """Асинхронный поток дельт состояния модели не чаще rate раз в секунду"""
+    broadcaster = SnapshotBroadcaster.forSimulation(simulationId, core)
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    subscriber = broadcaster.subscribe(lambda: loop.call_soon_threadsafe(changed.set))
+    try:
+        while True:
+            await changed.wait()
+            changed.clear()
+            delta = subscriber.take()
+            if delta is not None:
+                yield delta
+            if subscriber.closed is not None:
+                # опрос модели прекращен - последнее событие потока с причиной
+                yield {"error": subscriber.closed}
+                return
+            # между отправками изменения копятся у подписчика и сливаются
+            await asyncio.sleep(1 / rate)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+def create_async_app(simulationBackend=None, simulationWorkers=None):
+    """ASGI-приложение: потоковые эндпоинты + все Flask API через WSGI"""
+    app = FastAPI()
+    ModelingCoresSingletone.addEvictionListener(SnapshotBroadcaster.replaceCore)
+
+    @app.get("/api/simulations/{simulationId}/stream")
+    async def streamSimulation(simulationId: int, rate: float = 5):
+        if rate <= 0:
+            return JSONResponse({"error": "rate must be positive"}, status_code=400)
+        core = findCore(simulationId)
+        if core is None:
+            return JSONResponse({"error": f"Simulation not found: {simulationId}"}, status_code=404)
+
+        async def events():
+            async for delta in iterateDeltas(simulationId, core, rate):
+                yield f"data: {json.dumps(delta)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.websocket("/api/simulations/{simulationId}/ws")
+    async def streamSimulationWebSocket(websocket: WebSocket, simulationId: int, rate: float = 5):
+        await websocket.accept()
+        core = findCore(simulationId)
+        error = None
+        if rate <= 0:
+            error = "rate must be positive"
+        elif core is None:
+            error = f"Simulation not found: {simulationId}"
+        if error is not None:
+            await websocket.send_text(json.dumps({"error": error}))
+            await websocket.close(code=1008)
+            return
+        try:
+            async for delta in iterateDeltas(simulationId, core, rate):
+                await websocket.send_text(json.dumps(delta))
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+
+    app.mount("/", WSGIMiddleware(create_app(simulationBackend, simulationWorkers)))
+    return app
@@ -0,0 +1,7 @@
+class AdmissionError(Exception):
+    """Сервер не принимает новые модели: превышен лимит живых моделей или памяти (HTTP 429)"""
+
+    def __init__(self, message, retryAfter):
+        super().__init__(message)
+        # через сколько секунд имеет смысл повторить запрос
+        self.retryAfter = retryAfter
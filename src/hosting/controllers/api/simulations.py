@@ -1,29 +1,82 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import uuid
 
-from modeling.modeling_core import ModelingCore
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from hosting.controllers.admission_error import AdmissionError
 from hosting.controllers.modeling_core_repository import ModelingCoresSingletone
+from hosting.controllers.simulation_backend import SimulationBackend, BACKEND_CLUSTER
+from hosting.controllers.spilled_simulation import SpilledSimulation
+from modeling.experiments import replications, parameter_sweep
+from modeling.checkpoint.checkpoint_file import readCheckpoint
+from modeling.model_spec import ModelSpec
+from modeling.modeling_core import RUN_MODE_BATCH
+from modeling.analysis.flow_analysis import analyzeFlow
+from modeling.partitioning.partitioned_run import runPartitioned
+from modeling.recording.result_file import ResultFile
 
 bp = Blueprint('simulations', __name__)
 
+# Каталог контрольных точек: в запросах файлы указываются только по имени
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", "checkpoints")
+# Каталог файлов результатов (ResultFile) - так же только по имени
+RESULTS_DIR = os.environ.get("RESULTS_DIR", "results")
+
+# Последний сериализованный срез модели - одна запись на модель: (fields, (restarted, modelTime), etag, body).
+# Запрос с другим набором полей вытесняет запись, память не растет от разных ?fields=
+snapshotCache = dict()
+
+def dropSnapshotCache(simulationId, replacement):
+    #evicted simulation: its cached body is no longer needed
+    snapshotCache.pop(simulationId, None)
+
+ModelingCoresSingletone.addEvictionListener(dropSnapshotCache)
+
+def admissionRejected(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retryAfter)
+    return response
+
 @bp.route('/')
 def getSimulations():
     simulations = ModelingCoresSingletone.getAll()
     simulationsData = []
-    id = 0
     for sim in simulations:
-        id = id + 1
         simData = {
-            "id": id,
+            "id": sim,
             "name": simulations[sim].name,
             "caption": simulations[sim].caption,
-            "status": "running",
+            "status": simulations[sim].getState(),
             "duration": simulations[sim].getDuration(),
-            "acceleration": "x?????",
-            "modelTime": simulations[sim].getModelTime()
+            "acceleration": f"x{simulations[sim].getAcceleration():.1f}",
+            "modelTime": simulations[sim].getModelTime(),
+            #worker-hosted simulations restart from t=0 when their worker is lost
+            "restarted": getattr(simulations[sim], "restarted", 0),
+            "evicted": isinstance(simulations[sim], SpilledSimulation)
         }
         simulationsData.append(simData)
     return jsonify(simulationsData)
 
+@bp.route('/cluster')
+def getClusterWorkers():
+    pool = SimulationBackend.getPool() if SimulationBackend.backend == BACKEND_CLUSTER else None
+    if pool is None:
+        return jsonify({"error": "Cluster backend is not enabled"}), 400
+    return jsonify({"workers": pool.getWorkers()})
+
+@bp.route('/cluster/stop', methods=['POST'])
+def stopClusterWorkers():
+    #explicit admin action: a server shutdown only disconnects the workers, they wait to reconnect
+    if SimulationBackend.backend != BACKEND_CLUSTER:
+        return jsonify({"error": "Cluster backend is not enabled"}), 400
+    return jsonify({"stopped": SimulationBackend.getPool().stopWorkers()})
+
+@bp.route('/registry')
+def getRegistryStatistics():
+    return jsonify(ModelingCoresSingletone.getStatistics())
+
 @bp.route('/<int:simulationId>')
 def getSimulation(simulationId):
     return jsonify({"simulation": []})
@@ -31,18 +84,293 @@ def getSimulation(simulationId):
 @bp.route('/<int:simulationId>/<simulationNodeType>/<int:simulationNodeId>')
 def getSimulationNode(simulationId, simulationNodeType, simulationNodeId):
     simCore = ModelingCoresSingletone.get(simulationId)
-    time = simCore.env.now
+    time = simCore.getModelTime()
     nodeStatus = simCore.getEntityStatus(simulationNodeType, simulationNodeId)
     nodeStatus["time"] = time
     return jsonify(nodeStatus)
 
+@bp.route('/<int:simulationId>/snapshot')
+def getSimulationSnapshot(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    #normalized field list: the same set in any order hits the same cache entry
+    fields = sorted({field for field in request.args.get("fields", "").split(",") if field}) or None
+    fieldsKey = ",".join(fields) if fields else ""
+
+    #model time is the version of the snapshot: unchanged time - unchanged state.
+    #A restart from t=0 repeats model times, so the restart count is part of the version
+    modelTime = simCore.getModelTime()
+    restarted = getattr(simCore, "restarted", 0)
+    since = request.args.get("since", type=float)
+    cached = snapshotCache.get(simulationId)
+    if since is not None and since == modelTime:
+        return Response(status=304)
+    if cached is not None and cached[0] == fieldsKey and cached[1] == (restarted, modelTime):
+        if request.if_none_match.contains(cached[2]):
+            return Response(status=304)
+        etag, body = cached[2], cached[3]
+    else:
+        snapshot = simCore.getSnapshot(fields)
+        etag = f"{simulationId}-{restarted}-{snapshot['time']!r}-{fieldsKey}"
+        body = json.dumps(snapshot).encode()
+        snapshotCache[simulationId] = (fieldsKey, (restarted, snapshot["time"]), etag, body)
+        if request.if_none_match.contains(etag):
+            return Response(status=304)
+
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+@bp.route('/<int:simulationId>/profile')
+def getSimulationProfile(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    try:
+        return jsonify(simCore.getProfile())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@bp.route('/<int:simulationId>/steady-state')
+def getSimulationSteadyState(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    try:
+        return jsonify(simCore.getSteadyState())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@bp.route('/<int:simulationId>/series')
+def getSimulationSeries(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    try:
+        series = simCore.getSeries(*getSeriesArgs())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return seriesResponse(series)
+
+def getSeriesArgs():
+    columns = request.args.get("columns")
+    return request.args.get("from", type=float), request.args.get("to", type=float), columns.split(",") if columns else None
+
+def seriesResponse(series):
+    #columnar payload: one array per recorded column
+    payload = json.dumps({
+        "interval": series["interval"],
+        "columns": series["columns"],
+        "time": series["time"].tolist(),
+        "values": {name: series["values"][:, index].tolist() for index, name in enumerate(series["columns"])}
+    }).encode()
+    response = Response(payload, mimetype="application/json")
+    if request.args.get("compress") == "zstd":
+        import zstandard
+        response.set_data(zstandard.ZstdCompressor(level=3).compress(payload))
+        response.headers["Content-Encoding"] = "zstd"
+    return response
+
+@bp.route('/<int:simulationId>/results', methods=['POST'])
+def saveSimulationResults(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    requestData = request.get_json(silent=True) or {}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    resultsName = f"sim{simulationId}-{uuid.uuid4().hex[:8]}.results"
+    modelTime = simCore.getModelTime()
+    simCore.saveResults(os.path.abspath(os.path.join(RESULTS_DIR, resultsName)), requestData.get("compress", False))
+    return jsonify({
+        "results": resultsName,
+        "modelTime": modelTime
+    })
+
+def openResults(resultsName):
+    resultsPath = os.path.join(RESULTS_DIR, os.path.basename(resultsName))
+    if not os.path.isfile(resultsPath):
+        raise ValueError(f"Results not found: {resultsName}")
+    return ResultFile(resultsPath)
+
+@bp.route('/results/<resultsName>')
+def getResults(resultsName):
+    try:
+        with openResults(resultsName) as results:
+            header = results.header
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    series = header["series"]
+    return jsonify({
+        "results": resultsName,
+        "savedAt": header["savedAt"],
+        "summary": header["summary"],
+        "counters": header["counters"],
+        "series": None if series is None else {
+            "interval": series["interval"],
+            "columns": series["columns"],
+            "rows": series["rows"],
+            "compression": series["compression"]
+        }
+    })
+
+@bp.route('/results/<resultsName>/series')
+def getResultsSeries(resultsName):
+    #historical runs: columns are sliced from the memory-mapped file, not loaded whole
+    try:
+        with openResults(resultsName) as results:
+            series = results.getSeries(*getSeriesArgs())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return seriesResponse(series)
+
+@bp.route('/<int:simulationId>/checkpoint', methods=['POST'])
+def saveSimulationCheckpoint(simulationId):
+    simCore = ModelingCoresSingletone.get(simulationId)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    checkpointName = f"sim{simulationId}-{uuid.uuid4().hex[:8]}.ckpt"
+    modelTime = simCore.getModelTime()
+    simCore.saveCheckpoint(os.path.abspath(os.path.join(CHECKPOINT_DIR, checkpointName)))
+    return jsonify({
+        "checkpoint": checkpointName,
+        "modelTime": modelTime
+    })
+
+@bp.route('/restore', methods=['POST'])
+def restoreSimulation():
+    requestData = request.get_json()
+    checkpointName = os.path.basename(requestData.get("checkpoint", ""))
+    checkpointPath = os.path.join(CHECKPOINT_DIR, checkpointName)
+    if not checkpointName or not os.path.isfile(checkpointPath):
+        return jsonify({"error": f"Checkpoint not found: {checkpointName}"}), 400
+    #no forks - plain restore, otherwise one simulation per parameter set
+    forks = requestData.get("forks") or [requestData.get("parameters", {})]
+    try:
+        ModelingCoresSingletone.admit(len(forks))
+    except AdmissionError as e:
+        return admissionRejected(e)
+    coreInstances = []
+    try:
+        checkpoint = readCheckpoint(checkpointPath)
+        for parameters in forks:
+            runOptions = dict(requestData.get("run", {}), checkpoint=checkpoint, parameters=parameters)
+            coreInstances.append(SimulationBackend.createSimulation(
+                None, requestData.get("name", checkpoint["name"]), requestData.get("caption", checkpoint["caption"]), runOptions))
+    except ValueError as e:
+        for coreInstance in coreInstances:
+            coreInstance.remove_simulation()
+        ModelingCoresSingletone.cancelAdmission(len(forks))
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        ModelingCoresSingletone.cancelAdmission(len(forks))
+        raise
+    simulations = []
+    for coreInstance in coreInstances:
+        simulations.append({
+            "id": ModelingCoresSingletone.add(coreInstance),
+            "mode": coreInstance.runMode,
+            "status": coreInstance.getState(),
+            "modelTime": coreInstance.getModelTime()
+        })
+    return jsonify({
+        "checkpoint": checkpointName,
+        "modelTime": checkpoint["modelTime"],
+        "simulations": simulations
+    })
+
 @bp.route('/', methods=['POST'])
 def runSimulation():
     simulationMap = request.get_json()
-    #create core instance with imported map
-    coreInstance = ModelingCore(simulationMap, simulationMap["name"], simulationMap["caption"])
+    #validate and analyse the map, then create core instance and start it in configured backend
+    try:
+        modelSpec = ModelSpec.parse(simulationMap)
+        analysis = analyzeFlow(modelSpec)
+        if analysis.getErrors():
+            return jsonify({"error": "Map has errors", "issues": analysis.getErrors()}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        ModelingCoresSingletone.admit()
+    except AdmissionError as e:
+        return admissionRejected(e)
+    try:
+        coreInstance = SimulationBackend.createSimulation(
+            modelSpec, simulationMap["name"], simulationMap["caption"], simulationMap.get("run", {}))
+    except ValueError as e:
+        ModelingCoresSingletone.cancelAdmission()
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        ModelingCoresSingletone.cancelAdmission()
+        raise
     #register core instance and set id
     newId = ModelingCoresSingletone.add(coreInstance)
-    #start simulation
-    coreInstance.start_simulation()
-    return jsonify({"id": newId})
\ No newline at end of file
+    status = coreInstance.getState()
+    response = jsonify({
+        "id": newId,
+        "mode": coreInstance.runMode,
+        "status": status,
+        "modelTime": coreInstance.getModelTime(),
+        "speed": coreInstance.getAcceleration(),
+        "analysis": analysis.getSummary()
+    })
+    #batch still running in its thread: the result is polled by id
+    if coreInstance.runMode == RUN_MODE_BATCH and status == "running":
+        response.status_code = 202
+    return response
+
+@bp.route('/analyze', methods=['POST'])
+def analyzeMap():
+    try:
+        analysis = analyzeFlow(ModelSpec.parse(request.get_json()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(analysis.getReport())
+
+@bp.route('/replications', methods=['POST'])
+def runReplications():
+    requestData = request.get_json()
+    simulationMap = requestData["map"]
+    try:
+        result = replications.runReplications(
+            simulationMap,
+            requestData.get("replications", 10),
+            requestData.get("until"),
+            requestData.get("seed"),
+            requestData.get("processes"),
+            requestData.get("confidence", 0.95))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@bp.route('/partitioned', methods=['POST'])
+def runPartitionedSimulation():
+    """Прогон одной большой карты до until разделами в параллельных процессах"""
+    requestData = request.get_json()
+    try:
+        result = runPartitioned(
+            requestData["map"],
+            requestData.get("until"),
+            requestData.get("partitions", os.cpu_count() or 1),
+            requestData.get("seed"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@bp.route('/sweeps', methods=['POST'])
+def runSweep():
+    requestData = request.get_json()
+    try:
+        if "grid" in requestData:
+            points = parameter_sweep.gridPoints(requestData["grid"])
+        elif "latinHypercube" in requestData:
+            design = requestData["latinHypercube"]
+            points = parameter_sweep.latinHypercubePoints(design["parameters"], design["samples"], design.get("seed"))
+        else:
+            return jsonify({"error": "Sweep requires 'grid' or 'latinHypercube'"}), 400
+        results = parameter_sweep.runSweep(
+            requestData["map"],
+            points,
+            requestData.get("until"),
+            requestData.get("seed"),
+            requestData.get("processes"),
+            prune=requestData.get("prune"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    #NDJSON: one line per finished point, results arrive as points complete
+    def streamResults():
+        for result in results:
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "points": len(points)}) + "\n"
+
+    return Response(stream_with_context(streamResults()), mimetype="application/x-ndjson")
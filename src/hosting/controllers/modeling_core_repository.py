@@ -1,25 +1,250 @@
+import itertools
+import os
+import time
+import uuid
+from threading import Thread, Timer, Lock
+
+from hosting.controllers.admission_error import AdmissionError
+from hosting.controllers.registry_entry import RegistryEntry
+from hosting.controllers.spilled_simulation import SpilledSimulation
+
 class ModelingCoresSingletone:
+    """Реестр моделей сервера: id -> ModelingCore (или прокси воркера).
+    Записи разложены по шардам со своими блокировками. Закончившиеся и остановленные модели
+    вытесняются по TTL и LRU, их результаты перед этим выгружаются на диск.
+    Число живых моделей и их память ограничены - сверх лимита новые не принимаются"""
+
+    SHARDS_COUNT = 16
+    shards = [dict() for _ in range(SHARDS_COUNT)]
+    shardLocks = [Lock() for _ in range(SHARDS_COUNT)]
+
+    # выдача id и учет допущенных, но еще не добавленных моделей
+    stateLock = Lock()
+    ids = itertools.count()
+    pendingCount = 0
+
+    # вытеснение: простой дольше ttl секунд, лимиты живых моделей и их памяти
+    ttl = 1800.0
+    maxLive = 64
+    maxMemory = 2 * 1024 * 1024 * 1024
+    spillDir = "spilled"
+    # вытесненная модель разбирается не сразу: запросы, успевшие получить ее до замены, дочитывают
+    teardownDelay = 30.0
+    # допуск новой модели берет оценки памяти не старше memoryMaxAge секунд,
+    # а не опрашивает каждую живую модель (у моделей воркеров это запрос к процессу)
+    memoryMaxAge = 5.0
+    evictionListeners = []
+    janitor = None
+
+    @staticmethod
+    def configure(ttl=None, maxLive=None, maxMemory=None, spillDir=None, teardownDelay=None, memoryMaxAge=None):
+        environ = os.environ
+        ModelingCoresSingletone.ttl = float(ttl if ttl is not None else environ.get("SIMULATION_TTL", 1800))
+        ModelingCoresSingletone.maxLive = int(maxLive if maxLive is not None else environ.get("SIMULATION_MAX_LIVE", 64))
+        ModelingCoresSingletone.maxMemory = int(maxMemory if maxMemory is not None else environ.get("SIMULATION_MAX_MEMORY", 2 * 1024 * 1024 * 1024))
+        ModelingCoresSingletone.spillDir = spillDir or environ.get("SPILL_DIR", "spilled")
+        ModelingCoresSingletone.teardownDelay = float(teardownDelay if teardownDelay is not None else environ.get("SIMULATION_TEARDOWN_DELAY", 30))
+        ModelingCoresSingletone.memoryMaxAge = float(memoryMaxAge if memoryMaxAge is not None else environ.get("SIMULATION_MEMORY_MAX_AGE", 5))
+        if ModelingCoresSingletone.ttl <= 0 or ModelingCoresSingletone.maxLive <= 0 or ModelingCoresSingletone.maxMemory <= 0:
+            raise ValueError("Registry limits must be positive")
+        if ModelingCoresSingletone.teardownDelay < 0 or ModelingCoresSingletone.memoryMaxAge < 0:
+            raise ValueError("Teardown delay and memory age must not be negative")
+
+    @staticmethod
+    def addEvictionListener(listener):
+        """listener(simulationId, replacement) - после замены модели выгруженной сводкой"""
+        ModelingCoresSingletone.evictionListeners.append(listener)
+
+    @staticmethod
+    def _getShard(id):
+        index = id % ModelingCoresSingletone.SHARDS_COUNT
+        return ModelingCoresSingletone.shards[index], ModelingCoresSingletone.shardLocks[index]
+
+    @staticmethod
+    def _getEntries():
+        entries = []
+        for shard, lock in zip(ModelingCoresSingletone.shards, ModelingCoresSingletone.shardLocks):
+            with lock:
+                entries.extend(shard.items())
+        return entries
+
+    @staticmethod
+    def admit(count=1):
+        """Резервирует место под count новых моделей: при нехватке сначала вытесняет
+        простаивающие, затем - AdmissionError. Резерв снимается add() или cancelAdmission()"""
+        if ModelingCoresSingletone._tryAdmit(count):
+            return
+        ModelingCoresSingletone.evict(count)
+        if not ModelingCoresSingletone._tryAdmit(count):
+            raise AdmissionError(
+                f"Server is at its simulation limit ({ModelingCoresSingletone.maxLive} live, "
+                f"{ModelingCoresSingletone.maxMemory} bytes)", retryAfter=5)
+
+    @staticmethod
+    def _tryAdmit(count):
+        # janitor обновляет оценки памяти раз в несколько минут - устаревшие обновляются здесь.
+        # Вне stateLock: у моделей воркеров это запрос к процессу
+        ModelingCoresSingletone._refreshMemory(ModelingCoresSingletone.memoryMaxAge)
+        with ModelingCoresSingletone.stateLock:
+            live, memory = ModelingCoresSingletone._getUsage()
+            if live + ModelingCoresSingletone.pendingCount + count > ModelingCoresSingletone.maxLive:
+                return False
+            if memory >= ModelingCoresSingletone.maxMemory:
+                return False
+            ModelingCoresSingletone.pendingCount = ModelingCoresSingletone.pendingCount + count
+            return True
+
+    @staticmethod
+    def cancelAdmission(count=1):
+        with ModelingCoresSingletone.stateLock:
+            ModelingCoresSingletone.pendingCount = max(0, ModelingCoresSingletone.pendingCount - count)
+
+    @staticmethod
+    def _refreshMemory(maxAge=0):
+        """Обновляет оценки памяти старше maxAge секунд"""
+        now = time.monotonic()
+        for _, entry in ModelingCoresSingletone._getEntries():
+            if not entry.spilled and not entry.evicting and now - entry.memoryTime >= maxAge:
+                entry.memory = ModelingCoresSingletone._getMemory(entry.core)
+                entry.memoryTime = now
 
-    modelingCores = dict()
-    modelingCoreNext = 0
+    @staticmethod
+    def _getUsage():
+        live = 0
+        memory = 0
+        for _, entry in ModelingCoresSingletone._getEntries():
+            if not entry.spilled:
+                live = live + 1
+                memory = memory + entry.memory
+        return live, memory
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-    
     @staticmethod
     def add(item):
-        """Статический метод для добавления элемента в статический массив"""
-        ModelingCoresSingletone.modelingCores[ModelingCoresSingletone.modelingCoreNext] = item
-        placedId = ModelingCoresSingletone.modelingCoreNext
-        ModelingCoresSingletone.modelingCoreNext = ModelingCoresSingletone.modelingCoreNext + 1
+        """Регистрирует модель и возвращает ее id"""
+        entry = RegistryEntry(item, ModelingCoresSingletone._getMemory(item))
+        with ModelingCoresSingletone.stateLock:
+            placedId = next(ModelingCoresSingletone.ids)
+            ModelingCoresSingletone.pendingCount = max(0, ModelingCoresSingletone.pendingCount - 1)
+        shard, lock = ModelingCoresSingletone._getShard(placedId)
+        with lock:
+            shard[placedId] = entry
+        ModelingCoresSingletone._startJanitor()
         return placedId
-        
+
     @staticmethod
     def get(id):
-        return ModelingCoresSingletone.modelingCores[id]
-    
+        shard, lock = ModelingCoresSingletone._getShard(id)
+        with lock:
+            entry = shard[id]
+            entry.lastAccess = time.monotonic()
+            return entry.core
+
     @staticmethod
     def getAll():
-        return ModelingCoresSingletone.modelingCores
\ No newline at end of file
+        return {id: entry.core for id, entry in sorted(ModelingCoresSingletone._getEntries(), key=lambda item: item[0])}
+
+    @staticmethod
+    def getStatistics():
+        entries = ModelingCoresSingletone._getEntries()
+        live, memory = ModelingCoresSingletone._getUsage()
+        return {
+            "live": live,
+            "spilled": len(entries) - live,
+            "pending": ModelingCoresSingletone.pendingCount,
+            "memory": memory,
+            "maxLive": ModelingCoresSingletone.maxLive,
+            "maxMemory": ModelingCoresSingletone.maxMemory,
+            "ttl": ModelingCoresSingletone.ttl
+        }
+
+    @staticmethod
+    def _getMemory(core):
+        try:
+            return core.getMemoryUsage()
+        except ConnectionError:
+            return 0
+
+    @staticmethod
+    def _isIdle(entry):
+        """Вытеснять можно только не исполняющуюся модель"""
+        try:
+            return entry.core.getState() != "running"
+        except ConnectionError:
+            return False
+
+    @staticmethod
+    def sweep():
+        """Обход реестра: обновляет оценки памяти и вытесняет простаивающие дольше ttl"""
+        ModelingCoresSingletone._refreshMemory()
+        now = time.monotonic()
+        for id, entry in ModelingCoresSingletone._getEntries():
+            if entry.spilled or entry.evicting:
+                continue
+            if now - entry.lastAccess > ModelingCoresSingletone.ttl and ModelingCoresSingletone._isIdle(entry):
+                ModelingCoresSingletone._evictEntry(id, entry)
+        ModelingCoresSingletone.evict()
+
+    @staticmethod
+    def evict(need=0):
+        """LRU: вытесняет простаивающие модели, пока живые (с учетом need новых) не уложатся в лимиты"""
+        entries = [(id, entry) for id, entry in ModelingCoresSingletone._getEntries() if not entry.spilled]
+        entries.sort(key=lambda item: item[1].lastAccess)
+        live = len(entries) + ModelingCoresSingletone.pendingCount + need
+        memory = sum(entry.memory for _, entry in entries)
+        for id, entry in entries:
+            if live <= ModelingCoresSingletone.maxLive and memory < ModelingCoresSingletone.maxMemory:
+                break
+            if ModelingCoresSingletone._isIdle(entry) and ModelingCoresSingletone._evictEntry(id, entry):
+                live = live - 1
+                memory = memory - entry.memory
+
+    @staticmethod
+    def _evictEntry(id, entry):
+        shard, lock = ModelingCoresSingletone._getShard(id)
+        with lock:
+            if entry.evicting or shard.get(id) is not entry:
+                return False
+            entry.evicting = True
+        # выгрузка на диск - вне блокировки шарда, до замены модель продолжает отвечать
+        try:
+            os.makedirs(ModelingCoresSingletone.spillDir, exist_ok=True)
+            path = os.path.abspath(os.path.join(ModelingCoresSingletone.spillDir, f"sim{id}-{uuid.uuid4().hex[:8]}.spill"))
+            replacement = SpilledSimulation.spill(entry.core, path)
+        except (OSError, ConnectionError) as e:
+            print(f"Spill error for simulation {id}: {e}")
+            entry.evicting = False
+            return False
+        spilledEntry = RegistryEntry(replacement, spilled=True)
+        spilledEntry.lastAccess = entry.lastAccess
+        with lock:
+            shard[id] = spilledEntry
+        for listener in ModelingCoresSingletone.evictionListeners:
+            listener(id, replacement)
+        teardown = Timer(ModelingCoresSingletone.teardownDelay, ModelingCoresSingletone._teardown, args=(id, entry.core))
+        teardown.daemon = True
+        teardown.start()
+        return True
+
+    @staticmethod
+    def _teardown(id, core):
+        try:
+            core.remove_simulation()
+        except ConnectionError as e:
+            print(f"Teardown error for simulation {id}: {e}")
+
+    @staticmethod
+    def _startJanitor():
+        with ModelingCoresSingletone.stateLock:
+            if ModelingCoresSingletone.janitor is not None:
+                return
+            ModelingCoresSingletone.janitor = Thread(target=ModelingCoresSingletone._janitorLoop, daemon=True)
+            ModelingCoresSingletone.janitor.start()
+
+    @staticmethod
+    def _janitorLoop():
+        while True:
+            time.sleep(min(60.0, ModelingCoresSingletone.ttl / 4))
+            try:
+                ModelingCoresSingletone.sweep()
+            except Exception as e:
+                print(f"Registry sweep error: {e}")
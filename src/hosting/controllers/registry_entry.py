@@ -0,0 +1,14 @@
+import time
+
+class RegistryEntry:
+    """Запись реестра моделей: модель (или ее выгруженная сводка) и учет для вытеснения"""
+
+    def __init__(self, core, memory=0, spilled=False):
+        self.core = core
+        # последнее обращение по API - для TTL и LRU
+        self.lastAccess = time.monotonic()
+        # последняя оценка памяти модели, байт (обновляется при обходе реестра)
+        self.memory = memory
+        self.memoryTime = time.monotonic()
+        self.spilled = spilled
+        self.evicting = False
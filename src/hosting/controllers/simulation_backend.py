@@ -0,0 +1,77 @@
+import atexit
+import os
+from threading import Lock
+
+from modeling.modeling_core import ModelingCore
+from modeling.model_spec import ModelSpec
+from modeling.experiments import replications
+
+BACKEND_THREAD = "thread"
+BACKEND_PROCESS = "process"
+BACKEND_CLUSTER = "cluster"
+
+BACKENDS = (BACKEND_THREAD, BACKEND_PROCESS, BACKEND_CLUSTER)
+
+class SimulationBackend:
+    """Где исполняются модели: потоки внутри Flask-процесса, пул процессов-воркеров
+    или воркеры кластера, подключившиеся к координатору по TCP/Unix-сокету"""
+
+    backend = BACKEND_PROCESS
+    workersCount = None
+    pool = None
+    poolLock = Lock()
+
+    @staticmethod
+    def configure(backend=None, workersCount=None):
+        SimulationBackend.backend = backend or os.environ.get("SIMULATION_BACKEND", BACKEND_PROCESS)
+        if workersCount is None and os.environ.get("SIMULATION_WORKERS"):
+            workersCount = int(os.environ["SIMULATION_WORKERS"])
+        SimulationBackend.workersCount = workersCount
+        if SimulationBackend.backend not in BACKENDS:
+            raise ValueError(f"Unknown simulation backend: {SimulationBackend.backend}")
+        if SimulationBackend.backend == BACKEND_CLUSTER:
+            # replications и sweeps тоже идут на воркеры кластера
+            replications.executorFactory = SimulationBackend.createClusterExecutor
+        else:
+            replications.executorFactory = None
+
+    @staticmethod
+    def getPool():
+        with SimulationBackend.poolLock:
+            if SimulationBackend.pool is None:
+                if SimulationBackend.backend == BACKEND_CLUSTER:
+                    from hosting.workers.cluster_address import getClusterSettings
+                    from hosting.workers.cluster_coordinator import ClusterCoordinator
+                    address, authkey = getClusterSettings()
+                    SimulationBackend.pool = ClusterCoordinator(address, authkey, int(os.environ.get("CLUSTER_MAX_RETRIES", 2)))
+                else:
+                    from hosting.workers.worker_pool import WorkerPool
+                    SimulationBackend.pool = WorkerPool(SimulationBackend.workersCount)
+                atexit.register(SimulationBackend.pool.shutdown)
+            return SimulationBackend.pool
+
+    @staticmethod
+    def startCoordinator():
+        """Для кластера - создает координатор при старте сервера, а не на первом запросе,
+        который иначе ждал бы регистрации воркеров"""
+        if SimulationBackend.backend == BACKEND_CLUSTER:
+            SimulationBackend.getPool()
+
+    @staticmethod
+    def createClusterExecutor(initializer, initargs):
+        from hosting.workers.cluster_executor import ClusterExecutor
+        return ClusterExecutor(SimulationBackend.getPool(), initializer, initargs)
+
+    @staticmethod
+    def createSimulation(modelDescription, name, caption, runOptions):
+        """Создает и запускает модель, возвращает ModelingCore или его прокси.
+        Карта проверяется здесь же - ошибки схемы не доходят до воркера.
+        В потоках batch идет в потоке модели: запрос сервера не ждет конца прогона"""
+        if modelDescription is not None:
+            modelDescription = ModelSpec.parse(modelDescription)
+        if SimulationBackend.backend != BACKEND_THREAD:
+            return SimulationBackend.getPool().submit(modelDescription, name, caption, runOptions)
+
+        coreInstance = ModelingCore.create(modelDescription, name, caption, runOptions)
+        coreInstance.launch(background=True)
+        return coreInstance
@@ -0,0 +1,99 @@
+import os
+import shutil
+
+from modeling.checkpoint.checkpoint_file import writeJson
+from modeling.recording.result_file import ResultFile
+
+class SpilledSimulation:
+    """Вытесненная из памяти модель: срез, ряды и контрольная точка лежат в файле результатов
+    (ResultFile), в памяти остаются заголовок файла без контрольной точки и срез.
+    Отвечает на запросы чтения так же, как ModelingCore"""
+
+    def __init__(self, path, header):
+        self.path = path
+        # контрольная точка - самая большая часть заголовка, ее читает только getCheckpoint
+        self.header = dict(header, checkpoint=None)
+        self.summary = header["summary"]
+        self.name = self.summary["name"]
+        self.caption = self.summary["caption"]
+        self.runMode = self.summary["mode"]
+        self.restarted = self.summary.get("restarted", 0)
+        # ключи JSON - строки, в живой модели id сущностей целые
+        snapshot = header["snapshot"]
+        self.snapshot = {
+            "time": snapshot["time"],
+            "nodes": {int(entityId): status for entityId, status in snapshot["nodes"].items()},
+            "transports": {int(entityId): status for entityId, status in snapshot["transports"].items()}
+        }
+
+    @staticmethod
+    def spill(core, path):
+        """Выгружает результаты модели в файл и возвращает заменяющий ее объект"""
+        ResultFile.write(path, core, compress=True, checkpoint=True)
+        with ResultFile(path) as results:
+            return SpilledSimulation(path, results.header)
+
+    def getState(self):
+        return self.summary["status"]
+
+    def getDuration(self):
+        return self.summary["duration"]
+
+    def getModelTime(self):
+        return self.summary["modelTime"]
+
+    def getAcceleration(self):
+        return self.summary["acceleration"]
+
+    def getSummary(self):
+        return self.summary
+
+    def getMemoryUsage(self):
+        return 0
+
+    def getSnapshot(self, fields=None):
+        """Срез из памяти: файл при этом не читается"""
+        nodes = self.snapshot["nodes"]
+        transports = self.snapshot["transports"]
+        if fields is not None:
+            nodes = {entityId: {field: status[field] for field in fields if field in status} for entityId, status in nodes.items()}
+            transports = {entityId: {field: status[field] for field in fields if field in status} for entityId, status in transports.items()}
+        return {
+            "time": self.snapshot["time"],
+            "nodes": dict(nodes),
+            "transports": dict(transports)
+        }
+
+    def getEntityStatus(self, entityType, entityId):
+        if entityType == "Transport":
+            return self.snapshot["transports"][entityId]
+        elif entityType == "Node":
+            return self.snapshot["nodes"][entityId]
+
+    def getSeries(self, fromTime=None, toTime=None, columns=None):
+        with ResultFile(self.path, self.header) as results:
+            return results.getSeries(fromTime, toTime, columns)
+
+    def getProfile(self):
+        raise ValueError("Simulation was evicted, its profile is not kept")
+
+    def getSteadyState(self):
+        raise ValueError("Simulation was evicted, its warm-up statistics are not kept")
+
+    def getCheckpoint(self):
+        with ResultFile(self.path) as results:
+            return results.getCheckpoint()
+
+    def saveCheckpoint(self, path):
+        return writeJson(path, self.getCheckpoint())
+
+    def saveResults(self, path, compress=False):
+        # файл вытеснения уже в формате результатов (сжатый, с контрольной точкой)
+        shutil.copyfile(self.path, path)
+        return path
+
+    def remove_simulation(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,8 +1,17 @@
 from flask import Flask
 
-def create_app():
+def create_app(simulationBackend=None, simulationWorkers=None):
     app = Flask(__name__)
 
+    # Бэкенд исполнения моделей: пул процессов (по умолчанию) или потоки
+    from hosting.controllers.simulation_backend import SimulationBackend
+    SimulationBackend.configure(simulationBackend, simulationWorkers)
+    # Координатор кластера слушает сразу: воркеры регистрируются до первого запроса
+    SimulationBackend.startCoordinator()
+    # Лимиты и вытеснение моделей в реестре
+    from hosting.controllers.modeling_core_repository import ModelingCoresSingletone
+    ModelingCoresSingletone.configure()
+
     # Регистрируем Blueprint'ы
     from hosting.controllers.api.health import bp as healthBP
     from hosting.controllers.api.simulations import bp as simulationsBP
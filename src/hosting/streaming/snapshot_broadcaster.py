@@ -0,0 +1,145 @@
+import os
+from threading import Thread, Lock, Event
+
+# Период опроса модели для рассылки изменений, секунды
+DEFAULT_STREAM_INTERVAL = float(os.environ.get("STREAM_INTERVAL", "0.2"))
+
+class SnapshotSubscriber:
+    """Получатель изменений: пока он не забрал накопленное, новые дельты сливаются в одну"""
+
+    def __init__(self, notify):
+        self.notify = notify
+        self.lock = Lock()
+        self.pending = None
+        # опрос модели прекращен: None - поток продолжается, иначе причина
+        self.closed = None
+
+    def publish(self, delta):
+        with self.lock:
+            if self.pending is None:
+                self.pending = {"time": delta["time"], "nodes": dict(delta["nodes"]), "transports": dict(delta["transports"])}
+            else:
+                self.pending["time"] = delta["time"]
+                self.pending["nodes"].update(delta["nodes"])
+                self.pending["transports"].update(delta["transports"])
+        self.notify()
+
+    def close(self, reason):
+        """Рассылки больше не будет - поток подписчика должен завершиться"""
+        with self.lock:
+            self.closed = reason
+        self.notify()
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, None
+        return pending
+
+class SnapshotBroadcaster:
+    """Один опрос модели на всех зрителей: снимает срез при изменении env.now
+    и рассылает подписчикам только изменившиеся статусы сущностей"""
+
+    broadcasters = dict()
+    broadcastersLock = Lock()
+
+    @staticmethod
+    def forSimulation(simulationId, core):
+        with SnapshotBroadcaster.broadcastersLock:
+            broadcaster = SnapshotBroadcaster.broadcasters.get(simulationId)
+            if broadcaster is None or broadcaster.core is not core:
+                broadcaster = SnapshotBroadcaster(simulationId, core)
+                SnapshotBroadcaster.broadcasters[simulationId] = broadcaster
+            return broadcaster
+
+    @staticmethod
+    def replaceCore(simulationId, core):
+        """Модель вытеснена из реестра: зрители дальше читают выгруженную сводку,
+        без зрителей вещатель забывается"""
+        with SnapshotBroadcaster.broadcastersLock:
+            broadcaster = SnapshotBroadcaster.broadcasters.get(simulationId)
+            if broadcaster is None:
+                return
+            with broadcaster.lock:
+                broadcaster.core = core
+                if not broadcaster.subscribers:
+                    del SnapshotBroadcaster.broadcasters[simulationId]
+
+    def __init__(self, simulationId, core, interval=DEFAULT_STREAM_INTERVAL):
+        self.simulationId = simulationId
+        self.core = core
+        self.interval = interval
+        self.lock = Lock()
+        self.subscribers = []
+        self.lastSnapshot = None
+        # у каждого потока опроса свое событие остановки: старый поток не оживет от новой подписки
+        self.stopped = None
+        self.thread = None
+
+    def subscribe(self, notify):
+        """Подписка: сразу получает полный срез, далее - дельты"""
+        subscriber = SnapshotSubscriber(notify)
+        with self.lock:
+            self.subscribers.append(subscriber)
+            if self.thread is None:
+                self.stopped = Event()
+                self.thread = Thread(target=self._pollLoop, args=(self.stopped,), daemon=True)
+                self.thread.start()
+            lastSnapshot = self.lastSnapshot
+        if lastSnapshot is not None:
+            subscriber.publish(lastSnapshot)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            if not self.subscribers and self.thread is not None:
+                self.stopped.set()
+                self.stopped = None
+                self.thread = None
+
+    def _pollLoop(self, stopped):
+        while not stopped.is_set():
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Stream error: {e}")
+                self._stopOnError(stopped, str(e))
+                return
+            stopped.wait(self.interval)
+
+    def _stopOnError(self, stopped, reason):
+        """Опрос упал (например, модель удалена): потоки зрителей закрываются,
+        следующая подписка запустит опрос заново"""
+        with self.lock:
+            if self.stopped is not stopped:
+                # поток уже остановлен отпиской, новый поток опроса - не наш
+                return
+            self.thread = None
+            self.stopped = None
+            self.lastSnapshot = None
+            subscribers, self.subscribers = self.subscribers, []
+        for subscriber in subscribers:
+            subscriber.close(reason)
+
+    def _poll(self):
+        if self.lastSnapshot is not None and self.core.getModelTime() == self.lastSnapshot["time"]:
+            return
+        snapshot = self.core.getSnapshot()
+        delta = self._getDelta(self.lastSnapshot, snapshot)
+        with self.lock:
+            self.lastSnapshot = snapshot
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.publish(delta)
+
+    def _getDelta(self, previous, snapshot):
+        if previous is None:
+            return snapshot
+        return {
+            "time": snapshot["time"],
+            "nodes": {entityId: status for entityId, status in snapshot["nodes"].items()
+                      if previous["nodes"].get(entityId) != status},
+            "transports": {entityId: status for entityId, status in snapshot["transports"].items()
+                           if previous["transports"].get(entityId) != status}
+        }
@@ -0,0 +1,24 @@
+import os
+
+DEFAULT_CLUSTER_ADDRESS = "127.0.0.1:5100"
+
+def parseAddress(address):
+    """'host:port' - TCP, 'unix:/path' или путь - Unix-сокет"""
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    if address.startswith("/"):
+        return address
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(f"Cluster address must be host:port or unix:/path: {address}")
+    return (host, int(port))
+
+def getClusterSettings(address=None, authkey=None):
+    """Адрес координатора и ключ аутентификации из аргументов или CLUSTER_ADDRESS/CLUSTER_AUTHKEY.
+    Ключ обязателен и для loopback: по соединению идут pickle, с известным ключом
+    любой локальный процесс выполнил бы код от имени сервера"""
+    address = parseAddress(address or os.environ.get("CLUSTER_ADDRESS", DEFAULT_CLUSTER_ADDRESS))
+    authkey = authkey or os.environ.get("CLUSTER_AUTHKEY")
+    if not authkey:
+        raise ValueError("CLUSTER_AUTHKEY is required for the cluster backend and its workers")
+    return address, authkey.encode() if isinstance(authkey, str) else authkey
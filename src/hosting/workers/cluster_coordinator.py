@@ -0,0 +1,155 @@
+import os
+import socket
+from multiprocessing.connection import Listener, answer_challenge, deliver_challenge
+from threading import Thread, Condition, Event, Lock, Timer
+
+from hosting.workers.worker_pool import WorkerPool, WorkerConnection, shutdownSocket
+
+class ClusterCoordinator(WorkerPool):
+    """Пул воркеров, которые сами подключаются по TCP или Unix-сокету (hosting.workers.cluster_worker).
+    Протокол тот же, что у локального пула: модели создаются на наименее загруженном
+    зарегистрированном воркере, задачи исполнителя (ClusterExecutor) - на свободном"""
+
+    def __init__(self, address, authkey, maxRetries=2, registrationTimeout=30.0, handshakeTimeout=10.0):
+        super().__init__(maxRetries=maxRetries)
+        self.address = address
+        self.authkey = authkey
+        self.registrationTimeout = registrationTimeout
+        self.handshakeTimeout = handshakeTimeout
+        self.changed = Condition(self.lock)
+        # исполнители, ждущие свободного воркера для задач
+        self.executors = set()
+        # ключ проверяется не в accept, а в потоке соединения - с таймаутом
+        self.listener = Listener(address)
+        self.closed = False
+        self.acceptor = Thread(target=self._acceptLoop, daemon=True)
+        self.acceptor.start()
+
+    def _acceptLoop(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except Exception as e:
+                if self.closed:
+                    break
+                print(f"Cluster accept error: {e}")
+                continue
+            if self.closed:
+                connection.close()
+                break
+            # рукопожатие - в своем потоке: молчащий клиент не задерживает остальных воркеров
+            Thread(target=self._register, args=(connection, str(self.listener.last_accepted)), daemon=True).start()
+
+    def _register(self, connection, address):
+        """Проверка ключа и регистрация воркера. Проверку ключа ограничивает сторож
+        (закрывает сокет по таймауту), сообщение register - poll с таймаутом"""
+        handshakeLock = Lock()
+        aborted = Event()
+
+        def abortHandshake():
+            with handshakeLock:
+                aborted.set()
+                shutdownSocket(connection)
+
+        watchdog = Timer(self.handshakeTimeout, abortHandshake)
+        watchdog.start()
+        try:
+            deliver_challenge(connection, self.authkey)
+            answer_challenge(connection, self.authkey)
+            with handshakeLock:
+                watchdog.cancel()
+                if aborted.is_set():
+                    raise TimeoutError("authentication timed out")
+            if not connection.poll(self.handshakeTimeout):
+                raise TimeoutError("no registration message")
+            command, info = connection.recv()
+            if command != "register":
+                raise ValueError(f"unexpected command {command!r}")
+        except Exception as e:
+            watchdog.cancel()
+            # неверный ключ, таймаут или оборванная регистрация
+            print(f"Cluster worker rejected ({address}): {e!r}")
+            connection.close()
+            return
+        if self.closed:
+            connection.close()
+            return
+        worker = WorkerConnection(connection)
+        worker.info = dict(info, address=address)
+        with self.lock:
+            self.workers.append(worker)
+            self.changed.notify_all()
+        self.notifyExecutors()
+
+    def notifyExecutors(self):
+        with self.lock:
+            executors = list(self.executors)
+        for executor in executors:
+            executor.pump()
+
+    def _selectWorker(self):
+        with self.lock:
+            if not self.changed.wait_for(self._hasWorkers, self.registrationTimeout):
+                raise ConnectionError("No cluster workers registered")
+            worker = min(self.workers, key=lambda w: w.simulationsCount)
+            worker.simulationsCount = worker.simulationsCount + 1
+            return worker
+
+    def _hasWorkers(self):
+        self.workers = [worker for worker in self.workers if worker.alive]
+        return bool(self.workers)
+
+    def waitForWorkers(self):
+        with self.lock:
+            if not self.changed.wait_for(self._hasWorkers, self.registrationTimeout):
+                raise ConnectionError("No cluster workers registered")
+
+    def acquireTaskWorker(self):
+        """Свободный для задачи воркер (задачи на воркере идут по одной) или None"""
+        with self.lock:
+            self.workers = [worker for worker in self.workers if worker.alive]
+            idle = [worker for worker in self.workers if worker.tasksCount == 0]
+            if not idle:
+                return None
+            worker = min(idle, key=lambda w: w.simulationsCount)
+            worker.tasksCount = 1
+            return worker
+
+    def releaseTask(self, worker):
+        with self.lock:
+            worker.tasksCount = 0
+
+    def getWorkers(self):
+        with self.lock:
+            return [dict(worker.info, alive=worker.alive, simulations=worker.simulationsCount, busy=worker.tasksCount > 0)
+                    for worker in self.workers]
+
+    def _wakeAcceptor(self):
+        """accept в другом потоке закрытие сокета не прерывает - подключаемся к себе сами"""
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        try:
+            with socket.socket(family) as wakeup:
+                wakeup.connect(self.address)
+        except OSError:
+            pass
+
+    def shutdown(self):
+        """Остановка координатора. Воркеры продолжают работать: связь с ними рвется,
+        и они переподключаются к перезапущенному координатору. Остановить их - stopWorkers()"""
+        self.closed = True
+        self._wakeAcceptor()
+        self.listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.disconnect()
+
+    def stopWorkers(self):
+        """Команда shutdown всем зарегистрированным воркерам - они завершаются, а не переподключаются"""
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+        return len(workers)
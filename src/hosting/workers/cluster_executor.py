@@ -0,0 +1,97 @@
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future
+from threading import Lock
+
+class ClusterExecutor(Executor):
+    """concurrent.futures.Executor поверх воркеров координатора: для replications и sweeps.
+    initializer(*initargs) выполняется на воркере один раз перед задачами сессии,
+    задача с потерянного воркера повторяется на другом"""
+
+    def __init__(self, coordinator, initializer=None, initargs=()):
+        self.coordinator = coordinator
+        self.sessionId = uuid.uuid4().hex
+        self.initializer = initializer
+        self.initargs = initargs
+        self.lock = Lock()
+        self.queue = deque()
+        self.pending = set()
+        self.shutdownRequested = False
+        coordinator.waitForWorkers()
+        with coordinator.lock:
+            coordinator.executors.add(self)
+
+    def submit(self, fn, /, *args, **kwargs):
+        if kwargs:
+            raise ValueError("ClusterExecutor tasks take positional arguments only")
+        future = Future()
+        with self.lock:
+            if self.shutdownRequested:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self.queue.append((future, fn, args, 0))
+            self.pending.add(future)
+        self.pump()
+        return future
+
+    def pump(self):
+        """Раздает задачи из очереди свободным воркерам"""
+        while True:
+            with self.lock:
+                if not self.queue:
+                    return
+                worker = self.coordinator.acquireTaskWorker()
+                if worker is None:
+                    return
+                task = self.queue.popleft()
+            self._send(worker, *task)
+
+    def _send(self, worker, future, fn, args, attempt):
+        try:
+            if self.sessionId not in worker.sessions:
+                worker.request("openSession", self.sessionId, self.initializer, self.initargs)
+                worker.sessions.add(self.sessionId)
+            request = worker.request("task", self.sessionId, fn, args)
+        except ConnectionError as e:
+            self._finish(worker, future, fn, args, attempt, e, None)
+            return
+        request.add_done_callback(lambda done: self._finish(worker, future, fn, args, attempt, done.exception(), done))
+
+    def _finish(self, worker, future, fn, args, attempt, error, done):
+        self.coordinator.releaseTask(worker)
+        if isinstance(error, ConnectionError) and attempt < self.coordinator.maxRetries:
+            with self.lock:
+                self.queue.appendleft((future, fn, args, attempt + 1))
+        else:
+            with self.lock:
+                self.pending.discard(future)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result())
+        # освободился воркер - следующая задача этого или другого исполнителя
+        self.coordinator.notifyExecutors()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.lock:
+            self.shutdownRequested = True
+            if cancel_futures:
+                for future, _, _, _ in self.queue:
+                    future.cancel()
+                    self.pending.discard(future)
+                self.queue.clear()
+            pending = list(self.pending)
+        if wait:
+            for future in pending:
+                try:
+                    future.exception()
+                except BaseException:
+                    pass
+        with self.coordinator.lock:
+            self.coordinator.executors.discard(self)
+            workers = [worker for worker in self.coordinator.workers if self.sessionId in worker.sessions]
+        for worker in workers:
+            try:
+                worker.request("closeSession", self.sessionId)
+            except ConnectionError:
+                pass
+            worker.sessions.discard(self.sessionId)
@@ -0,0 +1,24 @@
+import os
+import socket
+import time
+from multiprocessing.connection import Client
+
+from hosting.workers.worker_process import WorkerProcess
+
+def runClusterWorker(address, authkey, retryInterval=1.0):
+    """Процесс-воркер кластера: подключается к координатору и исполняет его команды.
+    При потере связи переподключается, по команде shutdown - завершается"""
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+        except OSError:
+            # координатор еще не запущен или перезапускается
+            time.sleep(retryInterval)
+            continue
+        connection.send(("register", {"host": socket.gethostname(), "pid": os.getpid()}))
+        try:
+            if WorkerProcess(connection).serve():
+                return
+        finally:
+            connection.close()
+        time.sleep(retryInterval)
@@ -0,0 +1,92 @@
+import datetime
+from threading import Lock
+
+from modeling.checkpoint.checkpoint_file import writeCheckpoint
+from modeling.recording.result_file import ResultFile
+
+class RemoteModelingCore:
+    """Прокси ModelingCore, запущенного в процессе-воркере.
+    При потере воркера модель пересоздается пулом на другом (job - аргументы создания)
+    и начинается заново с t=0 - restarted считает такие перезапуски для клиентов"""
+
+    def __init__(self, pool, worker, simulationId, name, caption, summary, job=None):
+        self.pool = pool
+        self.worker = worker
+        self.simulationId = simulationId
+        self.name = name
+        self.caption = caption
+        self.runMode = summary["mode"]
+        self.summary = summary
+        self.job = job
+        self.startTime = datetime.datetime.now()
+        self.removed = False
+        self.restarted = 0
+        self.recoverLock = Lock()
+
+    def _call(self, method, *args):
+        worker = self.worker
+        try:
+            return worker.call("call", self.simulationId, method, args)
+        except ConnectionError:
+            if self.removed or self.job is None:
+                raise
+        self._recover(worker)
+        return self.worker.call("call", self.simulationId, method, args)
+
+    def _recover(self, lostWorker):
+        with self.recoverLock:
+            # другой поток мог уже пересоздать модель
+            if self.worker is lostWorker:
+                self.pool.resubmit(self)
+
+    def getDuration(self):
+        return self._call("getDuration")
+
+    def getModelTime(self):
+        return self._call("getModelTime")
+
+    def getAcceleration(self):
+        return self._call("getAcceleration")
+
+    def getSummary(self):
+        return dict(self._call("getSummary"), restarted=self.restarted)
+
+    def getState(self):
+        return self._call("getState")
+
+    def getEntityStatus(self, entityType, entityId):
+        return self._call("getEntityStatus", entityType, entityId)
+
+    def getSeries(self, fromTime=None, toTime=None, columns=None):
+        return self._call("getSeries", fromTime, toTime, columns)
+
+    def getSnapshot(self, fields=None):
+        return self._call("getSnapshot", fields)
+
+    def getProfile(self):
+        return self._call("getProfile")
+
+    def getSteadyState(self):
+        return self._call("getSteadyState")
+
+    def getCheckpoint(self):
+        return self._call("getCheckpoint")
+
+    def saveCheckpoint(self, path):
+        """Файл пишется здесь, а не на воркере: у кластера воркер может быть на другом хосте"""
+        return writeCheckpoint(path, self.getCheckpoint())
+
+    def saveResults(self, path, compress=False):
+        return ResultFile.write(path, self, compress)
+
+    def getMemoryUsage(self):
+        return self._call("getMemoryUsage")
+
+    def remove_simulation(self):
+        if self.removed:
+            return
+        self.removed = True
+        try:
+            self.worker.call("remove", self.simulationId)
+        finally:
+            self.pool.release(self.worker)
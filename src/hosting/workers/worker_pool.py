@@ -0,0 +1,150 @@
+import itertools
+import multiprocessing
+import os
+import socket
+from concurrent.futures import Future
+from threading import Thread, Lock
+
+from hosting.workers.worker_process import runWorker
+from hosting.workers.remote_modeling_core import RemoteModelingCore
+
+def shutdownSocket(connection):
+    """shutdown на копии дескриптора прерывает recv, заблокированный в другом потоке.
+    Одного close для этого мало - и собеседник разрыва не увидит"""
+    try:
+        with socket.socket(fileno=os.dup(connection.fileno())) as duplicate:
+            duplicate.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+class WorkerConnection:
+    """Канал до одного процесса-воркера: запросы с id, ответы разбирает отдельный поток"""
+
+    def __init__(self, connection, process=None):
+        self.connection = connection
+        self.process = process
+        self.sendLock = Lock()
+        self.pending = dict()
+        self.requestIds = itertools.count()
+        self.simulationsCount = 0
+        # задачи исполнителя (ClusterExecutor) в работе и открытые на воркере сессии
+        self.tasksCount = 0
+        self.sessions = set()
+        self.info = dict()
+        self.alive = True
+        self.reader = Thread(target=self._readLoop, daemon=True)
+        self.reader.start()
+
+    def request(self, command, *args):
+        future = Future()
+        with self.sendLock:
+            if not self.alive:
+                raise ConnectionError("Worker is not available")
+            requestId = next(self.requestIds)
+            self.pending[requestId] = future
+            self.connection.send((requestId, command, args))
+        return future
+
+    def call(self, command, *args):
+        return self.request(command, *args).result()
+
+    def _readLoop(self):
+        while True:
+            try:
+                requestId, status, payload = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self.pending.pop(requestId, None)
+            if future is None:
+                continue
+            if status == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(payload)
+
+        with self.sendLock:
+            self.alive = False
+            pending, self.pending = self.pending, dict()
+        for future in pending.values():
+            future.set_exception(ConnectionError("Worker connection lost"))
+
+    def close(self):
+        try:
+            self.call("shutdown")
+        except ConnectionError:
+            pass
+        self.connection.close()
+        if self.process is not None:
+            self.process.join(timeout=1.0)
+
+    def disconnect(self):
+        """Разрыв связи без команды shutdown: воркер кластера переподключится"""
+        shutdownSocket(self.connection)
+        self.connection.close()
+
+class WorkerPool:
+    """Пул процессов для ModelingCore: модели распределяются на наименее загруженный воркер"""
+
+    def __init__(self, size=None, maxRetries=2):
+        self.size = size or os.cpu_count() or 1
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self.lock = Lock()
+        self.simulationKeys = itertools.count()
+        # сколько раз модель пересоздается на другом воркере при потере своего
+        self.maxRetries = maxRetries
+
+    def _startWorker(self):
+        parentConnection, childConnection = self.context.Pipe()
+        process = self.context.Process(target=runWorker, args=(childConnection,), daemon=True)
+        process.start()
+        childConnection.close()
+        return WorkerConnection(parentConnection, process)
+
+    def _selectWorker(self):
+        with self.lock:
+            self.workers = [worker for worker in self.workers if worker.alive]
+            idle = [worker for worker in self.workers if worker.simulationsCount == 0]
+            if not idle and len(self.workers) < self.size:
+                self.workers.append(self._startWorker())
+            worker = min(self.workers, key=lambda w: w.simulationsCount)
+            worker.simulationsCount = worker.simulationsCount + 1
+            return worker
+
+    def submit(self, modelDescription, name, caption, runOptions):
+        """Создает и запускает модель в воркере, возвращает прокси"""
+        job = (modelDescription, name, caption, runOptions)
+        worker, simulationId, summary = self._create(job)
+        return RemoteModelingCore(self, worker, simulationId, name, caption, summary, job)
+
+    def resubmit(self, core):
+        """Воркер модели потерян: та же модель создается заново на другом воркере.
+        Состояние не переносится - модель начинает с t=0, это отмечается в core.restarted"""
+        worker, simulationId, summary = self._create(core.job)
+        core.worker, core.simulationId, core.summary = worker, simulationId, summary
+        core.restarted = core.restarted + 1
+        print(f"Simulation {core.name} restarted from t=0 after its worker was lost ({core.restarted})")
+
+    def _create(self, job):
+        for attempt in range(self.maxRetries + 1):
+            simulationId = next(self.simulationKeys)
+            worker = self._selectWorker()
+            try:
+                return worker, simulationId, worker.call("create", simulationId, *job)
+            except ConnectionError:
+                self.release(worker)
+                if attempt == self.maxRetries:
+                    raise
+            except Exception:
+                self.release(worker)
+                raise
+
+    def release(self, worker):
+        with self.lock:
+            worker.simulationsCount = worker.simulationsCount - 1
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
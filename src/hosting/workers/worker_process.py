@@ -0,0 +1,109 @@
+import traceback
+from threading import Thread, Lock
+
+from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+
+# Методы ModelingCore, которые можно вызвать из родительского процесса
+REMOTE_METHODS = {
+    "getDuration",
+    "getModelTime",
+    "getAcceleration",
+    "getSummary",
+    "getState",
+    "getEntityStatus",
+    "getSeries",
+    "getSnapshot",
+    "getProfile",
+    "getSteadyState",
+    "getCheckpoint",
+    "getMemoryUsage",
+}
+
+class WorkerProcess:
+    """Хост моделей внутри дочернего процесса: принимает команды по Connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sendLock = Lock()
+        self.modelingCores = dict()
+        # задачи исполнителя идут по одной: initializer сессии задает глобальное состояние модуля
+        self.taskLock = Lock()
+        self.taskSessions = dict()
+        self.taskSession = None
+
+    def send(self, requestId, status, payload):
+        with self.sendLock:
+            self.connection.send((requestId, status, payload))
+
+    def serve(self):
+        """Цикл команд; True - родитель велел завершиться, False - связь потеряна"""
+        shutdown = False
+        while True:
+            try:
+                requestId, command, args = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            if command == "shutdown":
+                self.send(requestId, "ok", None)
+                shutdown = True
+                break
+            if command == "task" or (command == "create" and args[4].get("mode") == RUN_MODE_BATCH):
+                # batch-прогон и задача идут в своем потоке, чтобы не блокировать остальные запросы
+                Thread(target=self.handle, args=(requestId, command, args), daemon=True).start()
+            else:
+                self.handle(requestId, command, args)
+
+        for core in self.modelingCores.values():
+            core.remove_simulation()
+        return shutdown
+
+    def handle(self, requestId, command, args):
+        try:
+            handler = getattr(self, "on_" + command)
+            self.send(requestId, "ok", handler(*args))
+        except ValueError as e:
+            self.send(requestId, "error", e)
+        except Exception as e:
+            traceback.print_exc()
+            self.send(requestId, "error", e)
+
+    def on_create(self, simulationId, modelDescription, name, caption, runOptions):
+        core = ModelingCore.create(modelDescription, name, caption, runOptions)
+        self.modelingCores[simulationId] = core
+        core.launch()
+        return {
+            "mode": core.runMode,
+            "status": core.getState(),
+            "modelTime": core.getModelTime(),
+            "speed": core.getAcceleration()
+        }
+
+    def on_call(self, simulationId, method, methodArgs):
+        if method not in REMOTE_METHODS:
+            raise AttributeError(f"Method {method} is not available remotely")
+        return getattr(self.modelingCores[simulationId], method)(*methodArgs)
+
+    def on_remove(self, simulationId):
+        core = self.modelingCores.pop(simulationId, None)
+        if core is not None:
+            core.remove_simulation()
+
+    def on_openSession(self, sessionId, initializer, initargs):
+        """Сессия исполнителя: initializer(*initargs) выполняется перед ее задачами"""
+        self.taskSessions[sessionId] = (initializer, initargs)
+
+    def on_closeSession(self, sessionId):
+        self.taskSessions.pop(sessionId, None)
+
+    def on_task(self, sessionId, function, args):
+        with self.taskLock:
+            if self.taskSession != sessionId:
+                initializer, initargs = self.taskSessions[sessionId]
+                if initializer is not None:
+                    initializer(*initargs)
+                self.taskSession = sessionId
+            return function(*args)
+
+def runWorker(connection):
+    """Точка входа дочернего процесса"""
+    WorkerProcess(connection).serve()
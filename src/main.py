@@ -1,5 +1,18 @@
+import os
+
 from hosting.server import create_app   
 
 if __name__ == "__main__":
-    app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    if os.environ.get("SERVER_MODE") == "worker":
+        # воркер кластера: подключается к координатору (SIMULATION_BACKEND=cluster) по CLUSTER_ADDRESS
+        from hosting.workers.cluster_address import getClusterSettings
+        from hosting.workers.cluster_worker import runClusterWorker
+        runClusterWorker(*getClusterSettings())
+    elif os.environ.get("SERVER_MODE") == "async":
+        # FastAPI + uvicorn: потоковые эндпоинты и Flask API в одном процессе
+        import uvicorn
+        from hosting.async_server import create_async_app
+        uvicorn.run(create_async_app(), host='0.0.0.0', port=5000)
+    else:
+        app = create_app()
+        app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,370 @@
+import numpy as np
+
+NODE_SOURCE = 0
+NODE_STORAGE = 1
+NODE_FABRIC = 2
+NODE_SINK = 3
+
+NODE_KINDS = {
+    "source": NODE_SOURCE,
+    "simple_storage": NODE_STORAGE,
+    "fabric": NODE_FABRIC,
+    "sink": NODE_SINK,
+}
+
+# загрузка ниже 1 на эту величину - насыщение (узкое место)
+SATURATION_TOLERANCE = 1e-9
+
+def getTransportCapacity(transport):
+    """Предельный поток транспорта в единицах ресурса за единицу модельного времени"""
+    data = transport.data
+    if transport.type == "teleport":
+        # frame за delay = frame / perMinute
+        return float(data.perMinute)
+    # поезд: limit за оборот туда-обратно, время в пути ~ U(min_delay, max_delay)
+    roundTrip = data.min_delay + data.max_delay
+    trains = data.count if transport.type == "fleet" else 1
+    return trains * data.limit / roundTrip if roundTrip > 0 else np.inf
+
+class FlowAnalysis:
+    """Статический анализ графа материальных потоков без прогона модели:
+    установившийся предельный поток по каждому транспорту и стоку, узкие места
+    и неподключенные/мертвые точки. Граф обходится по уровням топологического
+    порядка, внутри уровня - векторно (NumPy)"""
+
+    def __init__(self, modelSpec):
+        self.modelSpec = modelSpec
+        self.issues = []
+        self._buildArrays()
+        self._buildLevels()
+        self._checkEndpoints()
+        self._runBackwardPass()
+        self._runForwardPass()
+
+    def _buildArrays(self):
+        spec = self.modelSpec
+        nodes = spec.nodes
+        nodesCount = len(nodes)
+        self.nodeIds = np.array([node.id for node in nodes], dtype=np.int64)
+        self.nodeKinds = np.array([NODE_KINDS[node.type] for node in nodes], dtype=np.int8)
+        # собственный предел узла: генератор - выработка, фабрика - циклов рецепта в единицу времени
+        nodeRates = [np.inf] * nodesCount
+        # задержки блокировок буферов (0 - без блокировки) и число доков
+        importLockDelays = [0.0] * nodesCount
+        exportLockDelays = [0.0] * nodesCount
+        importLockSlots = [1] * nodesCount
+        exportLockSlots = [1] * nodesCount
+
+        resources = dict()
+        # порты: входы и выходы узлов, к которым подключается транспорт
+        inPortNodes, inPortAmounts, inPortResources = [], [], []
+        outPortNodes, outPortAmounts, outPortResources = [], [], []
+        for position, node in enumerate(nodes):
+            nodeType = node.type
+            if nodeType == "source":
+                # порция miningSpeed / miningFrame каждые miningFrame / miningSpeed
+                nodeRates[position] = (node.miningSpeed / node.miningFrame) ** 2
+                outPortNodes.append(position)
+                outPortAmounts.append(1.0)
+                outPortResources.append(resources.setdefault(node.resourceType, len(resources)))
+            elif nodeType == "simple_storage":
+                if node.importLock:
+                    importLockDelays[position] = node.importLockDelay
+                    importLockSlots[position] = node.importPorts
+                if node.exportLock:
+                    exportLockDelays[position] = node.exportLockDelay
+                    exportLockSlots[position] = node.exportPorts
+                resource = resources.setdefault(node.resourceType, len(resources))
+                inPortNodes.append(position)
+                inPortAmounts.append(1.0)
+                inPortResources.append(resource)
+                outPortNodes.append(position)
+                outPortAmounts.append(1.0)
+                outPortResources.append(resource)
+            elif nodeType == "fabric":
+                # несколько рецептов считаются в равных долях циклов (приближение: реальная
+                # доля зависит от выбора рецепта и запасов), линии работают параллельно
+                recipes = node.getRecipes()
+                nodeRates[position] = node.lines * len(recipes) / sum(recipe[2] for recipe in recipes)
+                for index, item in enumerate(node.imports):
+                    inPortNodes.append(position)
+                    inPortAmounts.append(sum(recipe[3][index] for recipe in recipes) / len(recipes))
+                    inPortResources.append(resources.setdefault(item.resourceType, len(resources)))
+                for index, item in enumerate(node.exports):
+                    outPortNodes.append(position)
+                    outPortAmounts.append(sum(recipe[4][index] for recipe in recipes) / len(recipes))
+                    outPortResources.append(resources.setdefault(item.resourceType, len(resources)))
+            elif nodeType == "sink":
+                inPortNodes.append(position)
+                inPortAmounts.append(1.0)
+                inPortResources.append(resources.setdefault(node.resourceType, len(resources)))
+        self.nodeRates = np.array(nodeRates, dtype=np.float64)
+        self.importLockDelays = np.array(importLockDelays, dtype=np.float64)
+        self.exportLockDelays = np.array(exportLockDelays, dtype=np.float64)
+        self.importLockSlots = np.array(importLockSlots, dtype=np.float64)
+        self.exportLockSlots = np.array(exportLockSlots, dtype=np.float64)
+        self.inPortNodes = np.array(inPortNodes, dtype=np.int64)
+        self.inPortAmounts = np.array(inPortAmounts, dtype=np.float64)
+        self.inPortResources = np.array(inPortResources, dtype=np.int64)
+        self.outPortNodes = np.array(outPortNodes, dtype=np.int64)
+        self.outPortAmounts = np.array(outPortAmounts, dtype=np.float64)
+        self.outPortResources = np.array(outPortResources, dtype=np.int64)
+        # порты узла - отрезок [starts[position], starts[position + 1])
+        self.inPortStarts = np.searchsorted(self.inPortNodes, np.arange(nodesCount + 1))
+        self.outPortStarts = np.searchsorted(self.outPortNodes, np.arange(nodesCount + 1))
+
+        transports = spec.transports
+        self.linkIds = np.array([transport.id for transport in transports], dtype=np.int64)
+        self.linkCapacities = np.array([getTransportCapacity(transport) for transport in transports], dtype=np.float64)
+        # порция транспорта за одну операцию get/put - для блокировок буфера
+        self.linkAmounts = np.array([transport.data.frame if transport.type == "teleport" else transport.data.limit
+                                     for transport in transports], dtype=np.float64)
+        positions = spec.nodePositions
+        self.linkSources = np.array([positions[transport.from_id] for transport in transports], dtype=np.int64)
+        self.linkDestinations = np.array([positions[transport.to_id] for transport in transports], dtype=np.int64)
+        fromEndpoints = np.array([transport.from_endpoint for transport in transports], dtype=np.int64)
+        toEndpoints = np.array([transport.to_endpoint for transport in transports], dtype=np.int64)
+        self.linkSourcePorts = self._getLinkPorts(self.outPortStarts, self.linkSources, fromEndpoints)
+        self.linkDestinationPorts = self._getLinkPorts(self.inPortStarts, self.linkDestinations, toEndpoints)
+        self._applyStorageLocks()
+
+    def _getLinkPorts(self, starts, positions, endpoints):
+        """Глобальные индексы портов для точек подключения транспорта (-1 - точки нет).
+        У генератора, буфера и стока один вход/выход и номер точки не используется,
+        у фабрики - номер входа/выхода, как в Fabric.putResources/getResources"""
+        portsCounts = starts[positions + 1] - starts[positions]
+        fabric = self.nodeKinds[positions] == NODE_FABRIC
+        offsets = np.where(fabric, endpoints, 0)
+        valid = (portsCounts > 0) & ~(fabric & (endpoints >= portsCounts))
+        return np.where(valid, starts[positions] + offsets, -1)
+
+    def _applyStorageLocks(self):
+        """Блокировка буфера: каждая операция держит слот дока не меньше задержки.
+        Транспорт делает одну операцию за раз - предел порция/задержка на транспорт,
+        а все транспорты порта вместе - не больше slots операций за задержку"""
+        nodesCount = len(self.nodeIds)
+        for delays, slots, linkNodes in ((self.importLockDelays, self.importLockSlots, self.linkDestinations),
+                                         (self.exportLockDelays, self.exportLockSlots, self.linkSources)):
+            linkDelays = delays[linkNodes]
+            locked = np.flatnonzero(linkDelays > 0)
+            if not locked.size:
+                continue
+            capacities = np.minimum(self.linkCapacities[locked], self.linkAmounts[locked] / linkDelays[locked])
+            operations = np.bincount(linkNodes[locked], capacities / self.linkAmounts[locked], minlength=nodesCount)
+            with np.errstate(divide="ignore"):
+                factors = np.minimum(1.0, slots / (delays * operations))
+            self.linkCapacities[locked] = capacities * factors[linkNodes[locked]]
+
+    def _buildLevels(self):
+        """Уровни топологического порядка (алгоритм Кана, фронт обрабатывается векторно).
+        Узлы на циклах и после них уровня не получают"""
+        nodesCount = len(self.nodeIds)
+        order = np.argsort(self.linkSources, kind="stable")
+        starts = np.searchsorted(self.linkSources[order], np.arange(nodesCount + 1))
+        inDegrees = np.bincount(self.linkDestinations, minlength=nodesCount)
+        self.nodeLevels = np.full(nodesCount, -1, dtype=np.int64)
+        frontier = np.flatnonzero(inDegrees == 0)
+        level = 0
+        while frontier.size:
+            self.nodeLevels[frontier] = level
+            counts = starts[frontier + 1] - starts[frontier]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.repeat(starts[frontier] - (np.cumsum(counts) - counts), counts) + np.arange(total)
+            destinations = self.linkDestinations[order[offsets]]
+            np.subtract.at(inDegrees, destinations, 1)
+            frontier = np.unique(destinations[inDegrees[destinations] == 0])
+            level = level + 1
+        self.levelsCount = level + 1
+        cyclic = np.flatnonzero(self.nodeLevels < 0)
+        if cyclic.size:
+            self._addIssues("warning", "cycle", "Node", cyclic, "node is on or after a cycle, its flow is not analysed")
+
+        # группы по уровням: узлы уровня и транспорт, входящий в них/выходящий из них
+        levelOrder = np.argsort(self.nodeLevels, kind="stable")
+        levelStarts = np.searchsorted(self.nodeLevels[levelOrder], np.arange(self.levelsCount + 1))
+        self.levelNodes = [levelOrder[levelStarts[level]:levelStarts[level + 1]] for level in range(self.levelsCount)]
+        resolved = (self.nodeLevels[self.linkSources] >= 0) & (self.nodeLevels[self.linkDestinations] >= 0)
+        self.levelInLinks = self._groupLinks(self.nodeLevels[self.linkDestinations], resolved)
+        self.levelOutLinks = self._groupLinks(self.nodeLevels[self.linkSources], resolved)
+
+    def _groupLinks(self, linkLevels, resolved):
+        links = np.flatnonzero(resolved & (self.linkSourcePorts >= 0) & (self.linkDestinationPorts >= 0))
+        order = links[np.argsort(linkLevels[links], kind="stable")]
+        starts = np.searchsorted(linkLevels[order], np.arange(self.levelsCount + 1))
+        return [order[starts[level]:starts[level + 1]] for level in range(self.levelsCount)]
+
+    def _checkEndpoints(self):
+        badSource = np.flatnonzero(self.linkSourcePorts < 0)
+        badDestination = np.flatnonzero(self.linkDestinationPorts < 0)
+        self._addIssues("error", "unknownEndpoint", "Transport", badSource, "from_endpoint does not exist on the source node")
+        self._addIssues("error", "unknownEndpoint", "Transport", badDestination, "to_endpoint does not exist on the destination node")
+
+        valid = np.flatnonzero((self.linkSourcePorts >= 0) & (self.linkDestinationPorts >= 0))
+        mismatched = valid[self.outPortResources[self.linkSourcePorts[valid]] != self.inPortResources[self.linkDestinationPorts[valid]]]
+        self._addIssues("warning", "resourceMismatch", "Transport", mismatched, "transport links ports of different resources")
+
+        nodesCount = len(self.nodeIds)
+        connected = np.bincount(self.linkSources, minlength=nodesCount) + np.bincount(self.linkDestinations, minlength=nodesCount)
+        isolated = np.flatnonzero(connected == 0)
+        self._addIssues("warning", "isolatedNode", "Node", isolated, "node has no transport")
+        isolatedMask = connected == 0
+
+        # точки без транспорта у подключенных узлов: выход копится и блокирует узел, вход голодает
+        outUsed = np.bincount(self.linkSourcePorts[self.linkSourcePorts >= 0], minlength=len(self.outPortNodes))
+        inUsed = np.bincount(self.linkDestinationPorts[self.linkDestinationPorts >= 0], minlength=len(self.inPortNodes))
+        deadOut = np.flatnonzero((outUsed == 0) & ~isolatedMask[self.outPortNodes])
+        deadIn = np.flatnonzero((inUsed == 0) & ~isolatedMask[self.inPortNodes])
+        self._addIssues("warning", "unconnectedExport", "Node", self.outPortNodes[deadOut], "export has no transport, the node will block",
+                        deadOut - self.outPortStarts[self.outPortNodes[deadOut]])
+        self._addIssues("warning", "unconnectedImport", "Node", self.inPortNodes[deadIn], "import has no transport, the node will starve",
+                        deadIn - self.inPortStarts[self.inPortNodes[deadIn]])
+
+    def _runBackwardPass(self):
+        """От стоков к источникам: сколько каждый транспорт может сдать дальше по графу.
+        Пропускная способность транспорта урезается до спроса приемника"""
+        self.linkLimits = np.zeros(len(self.linkIds))
+        self.inPortDemands = np.zeros(len(self.inPortNodes))
+        self.nodeDemandCycles = np.zeros(len(self.nodeIds))
+        outPortDemands = np.zeros(len(self.outPortNodes))
+        for level in range(self.levelsCount - 1, -1, -1):
+            nodes = self.levelNodes[level]
+            outLinks = self.levelOutLinks[level]
+            np.add.at(outPortDemands, self.linkSourcePorts[outLinks], self.linkLimits[outLinks])
+
+            cycles = self._getNodeCycles(nodes, self.outPortStarts, self.outPortNodes, outPortDemands, self.outPortAmounts)
+            self.nodeDemandCycles[nodes] = cycles[nodes]
+            inPorts = self._getNodePorts(nodes, self.inPortStarts)
+            portNodes = self.inPortNodes[inPorts]
+            demands = cycles[portNodes] * self.inPortAmounts[inPorts]
+            # сток принимает без ограничений
+            demands[self.nodeKinds[portNodes] == NODE_SINK] = np.inf
+            self.inPortDemands[inPorts] = demands
+
+            inLinks = self.levelInLinks[level]
+            self.linkLimits[inLinks] = self._share(inLinks, self.linkDestinationPorts, self.linkCapacities, self.inPortDemands)
+
+    def _runForwardPass(self):
+        """От источников к стокам: установившийся поток с учетом пределов из обратного прохода"""
+        self.linkFlows = np.zeros(len(self.linkIds))
+        inPortFlows = np.zeros(len(self.inPortNodes))
+        self.outPortSupplies = np.zeros(len(self.outPortNodes))
+        self.nodeCycles = np.zeros(len(self.nodeIds))
+        for level in range(self.levelsCount):
+            nodes = self.levelNodes[level]
+            inLinks = self.levelInLinks[level]
+            np.add.at(inPortFlows, self.linkDestinationPorts[inLinks], self.linkFlows[inLinks])
+
+            cycles = self._getNodeCycles(nodes, self.inPortStarts, self.inPortNodes, inPortFlows, self.inPortAmounts)
+            # узел не вырабатывает больше, чем может сдать дальше (иначе блокируется)
+            cycles[nodes] = np.minimum(cycles[nodes], self.nodeDemandCycles[nodes])
+            self.nodeCycles[nodes] = cycles[nodes]
+            outPorts = self._getNodePorts(nodes, self.outPortStarts)
+            self.outPortSupplies[outPorts] = cycles[self.outPortNodes[outPorts]] * self.outPortAmounts[outPorts]
+
+            outLinks = self.levelOutLinks[level]
+            self.linkFlows[outLinks] = self._share(outLinks, self.linkSourcePorts, self.linkLimits, self.outPortSupplies)
+        self.inPortFlows = inPortFlows
+
+    def _getNodeCycles(self, nodes, portStarts, portNodes, portRates, portAmounts):
+        """Циклов (единиц выработки) узла в единицу времени: собственный предел узла,
+        ограниченный самым бедным портом. У буфера и стока предел задают только порты"""
+        cycles = np.full(len(self.nodeIds), np.inf)
+        cycles[nodes] = self.nodeRates[nodes]
+        ports = self._getNodePorts(nodes, portStarts)
+        amounts = portAmounts[ports]
+        limited = amounts > 0
+        np.minimum.at(cycles, portNodes[ports][limited], portRates[ports][limited] / amounts[limited])
+        noPorts = nodes[portStarts[nodes + 1] == portStarts[nodes]]
+        # у генератора нет входов, у стока нет выходов: бесконечность - только для них
+        cycles[noPorts[self.nodeKinds[noPorts] == NODE_STORAGE]] = 0
+        return cycles
+
+    def _getNodePorts(self, nodes, portStarts):
+        counts = portStarts[nodes + 1] - portStarts[nodes]
+        total = int(counts.sum())
+        return np.repeat(portStarts[nodes] - (np.cumsum(counts) - counts), counts) + np.arange(total)
+
+    def _share(self, links, linkPorts, linkCapacities, portRates):
+        """Поток порта делится между его транспортом пропорционально пропускной способности"""
+        ports = linkPorts[links]
+        capacities = linkCapacities[links]
+        totals = np.zeros(len(portRates))
+        np.add.at(totals, ports, capacities)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factors = np.where(totals[ports] > 0, np.minimum(1.0, portRates[ports] / totals[ports]), 0.0)
+        return capacities * factors
+
+    def _addIssues(self, severity, kind, entityType, positions, message, ports=None):
+        ids = self.nodeIds if entityType == "Node" else self.linkIds
+        for index, position in enumerate(positions):
+            issue = {
+                "severity": severity,
+                "kind": kind,
+                "type": entityType,
+                "id": int(ids[position]),
+                "message": message
+            }
+            if ports is not None:
+                issue["port"] = int(ports[index])
+            self.issues.append(issue)
+
+    def getErrors(self):
+        return [issue for issue in self.issues if issue["severity"] == "error"]
+
+    def getSinkThroughputs(self):
+        """Установившийся поток в каждый сток: {id стока: единиц за единицу времени}"""
+        sinks = np.flatnonzero(self.nodeKinds == NODE_SINK)
+        inflows = np.zeros(len(self.nodeIds))
+        np.add.at(inflows, self.inPortNodes, self.inPortFlows)
+        return {int(self.nodeIds[position]): float(inflows[position]) for position in sinks}
+
+    def getBottlenecks(self):
+        """Насыщенные элементы: транспорт, генераторы и фабрики, работающие на пределе"""
+        bottlenecks = []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            linkUtilization = self.linkFlows / self.linkCapacities
+            nodeUtilization = np.where(np.isfinite(self.nodeRates), self.nodeCycles / self.nodeRates, 0.0)
+        for position in np.flatnonzero(linkUtilization >= 1 - SATURATION_TOLERANCE):
+            bottlenecks.append({"type": "Transport", "id": int(self.linkIds[position]), "flow": float(self.linkFlows[position])})
+        for position in np.flatnonzero((nodeUtilization >= 1 - SATURATION_TOLERANCE) & (self.nodeCycles > 0)):
+            bottlenecks.append({"type": "Node", "id": int(self.nodeIds[position]), "cycles": float(self.nodeCycles[position])})
+        return bottlenecks
+
+    def getSummary(self):
+        return {
+            "sinks": self.getSinkThroughputs(),
+            "bottlenecks": self.getBottlenecks(),
+            "issues": self.issues
+        }
+
+    def getReport(self):
+        """Полный отчет: сводка, поток и загрузка по каждому транспорту и узлу"""
+        report = self.getSummary()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            linkUtilization = np.nan_to_num(self.linkFlows / self.linkCapacities)
+        report["transports"] = {
+            int(linkId): {
+                "capacity": float(capacity),
+                "flow": float(flow),
+                "utilization": float(utilization)
+            }
+            for linkId, capacity, flow, utilization in zip(self.linkIds, self.linkCapacities, self.linkFlows, linkUtilization)
+        }
+        outflows = np.zeros(len(self.nodeIds))
+        np.add.at(outflows, self.outPortNodes, self.outPortSupplies)
+        report["nodes"] = {
+            int(nodeId): {
+                "outflow": float(outflow),
+                "cycles": float(cycles) if np.isfinite(cycles) else None
+            }
+            for nodeId, outflow, cycles in zip(self.nodeIds, outflows, self.nodeCycles)
+        }
+        return report
+
+def analyzeFlow(modelSpec):
+    """Анализ один на спецификацию: ModelSpec неизменяем, результат кешируется в нем"""
+    if modelSpec.flowAnalysis is None:
+        modelSpec.flowAnalysis = FlowAnalysis(modelSpec)
+    return modelSpec.flowAnalysis
@@ -0,0 +1,37 @@
+import json
+
+CHECKPOINT_VERSION = 4
+
+# Сжатые контрольные точки начинаются с магического числа кадра zstd
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def writeJson(path, payload, compress=True):
+    """JSON в файл, сжатый zstd (если пакет установлен)"""
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    if compress:
+        try:
+            import zstandard
+            data = zstandard.ZstdCompressor(level=3).compress(data)
+        except ImportError:
+            pass
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+def readJson(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if data.startswith(ZSTD_MAGIC):
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return json.loads(data)
+
+def writeCheckpoint(path, checkpoint, compress=True):
+    """Пишет контрольную точку модели"""
+    return writeJson(path, checkpoint, compress)
+
+def readCheckpoint(path):
+    checkpoint = readJson(path)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+    return checkpoint
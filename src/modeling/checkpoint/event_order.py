@@ -0,0 +1,28 @@
+class EventOrder:
+    """Порядок ожидаемых моделью событий на момент контрольной точки.
+    Одновременные события SimPy обрабатываются в порядке создания, запросы к узлу - в порядке
+    очереди узла. При восстановлении сущности создают их заново (RestoreOrder) по этим ключам,
+    иначе порядок определялся бы порядком сущностей в карте"""
+
+    def __init__(self, env, nodes):
+        # очередь SimPy: (время, приоритет, eid, событие)
+        self.ranks = {entry[3]: rank for rank, entry in enumerate(sorted(env._queue, key=lambda entry: entry[:3]))}
+        # ожидающие запросы - по месту в своей очереди узла
+        self.positions = dict()
+        for node in nodes:
+            getRequestQueues = getattr(node, "getRequestQueues", None)
+            if getRequestQueues is None:
+                continue
+            for queue in getRequestQueues():
+                for position, event in enumerate(queue):
+                    self.positions[event] = position
+
+    def getKey(self, event):
+        """[0, ранг] - событие в очереди SimPy, [1, место] - запрос в очереди узла, None - неизвестно"""
+        rank = self.ranks.get(event)
+        if rank is not None:
+            return [0, rank]
+        position = self.positions.get(event)
+        if position is not None:
+            return [1, position]
+        return None
@@ -0,0 +1,18 @@
+class RestoreOrder:
+    """Действия восстановления из контрольной точки, которые создают события SimPy
+    или подают запросы к узлам. Выполняются после restoreState всех сущностей по ключам EventOrder:
+    таймауты - в исходном порядке очереди SimPy, запросы - в исходном порядке очередей узлов.
+    При равных ключах - в порядке добавления (узлы восстанавливаются раньше транспорта)"""
+
+    def __init__(self):
+        self.actions = []
+
+    def add(self, key, action, *args):
+        # без ключа (состояние до запуска процессов) - первыми, в порядке добавления
+        self.actions.append((key if key is not None else [-1], len(self.actions), action, args))
+
+    def run(self):
+        self.actions.sort(key=lambda item: (item[0], item[1]))
+        for _, _, action, args in self.actions:
+            action(*args)
+        self.actions = []
@@ -0,0 +1,93 @@
+import itertools
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from modeling.model_spec import ModelSpec
+from modeling.experiments import replications
+from modeling.analysis.flow_analysis import analyzeFlow
+
+def gridPoints(parameters):
+    """Полный перебор: {путь: [значения]} -> список точек {путь: значение}"""
+    paths = list(parameters)
+    return [dict(zip(paths, values)) for values in itertools.product(*(parameters[path] for path in paths))]
+
+def latinHypercubePoints(parameters, samples, seed=None):
+    """Латинский гиперкуб: {путь: {"min", "max", "integer"}} -> samples точек"""
+    if samples < 1:
+        raise ValueError("samples must be positive")
+    rng = np.random.default_rng(seed)
+    paths = list(parameters)
+    # по каждой оси - перестановка страт и случайная точка внутри страты
+    strata = np.stack([rng.permutation(samples) for _ in paths], axis=1)
+    unit = (strata + rng.random((samples, len(paths)))) / samples
+    points = [dict() for _ in range(samples)]
+    for column, path in enumerate(paths):
+        bounds = parameters[path]
+        values = bounds["min"] + unit[:, column] * (bounds["max"] - bounds["min"])
+        if bounds.get("integer", False):
+            values = np.floor(values + 0.5)
+        for point, value in zip(points, values):
+            point[path] = int(value) if bounds.get("integer", False) else float(value)
+    return points
+
+def runWorkerSweepPoint(index, parameters, until, seed, sampleInterval):
+    modelSpec = replications.workerModelSpec.withParameters(parameters)
+    return index, replications.runReplication(modelSpec, until, seed, sampleInterval)
+
+def getPredictedThroughput(modelSpec, sinkId=None):
+    """Установившийся поток в сток (или во все стоки) по статическому анализу"""
+    throughputs = analyzeFlow(modelSpec).getSinkThroughputs()
+    if sinkId is None:
+        return sum(throughputs.values())
+    if sinkId not in throughputs:
+        raise ValueError(f"Unknown sink: {sinkId}")
+    return throughputs[sinkId]
+
+def runSweep(modelDescription, points, until, seed=None, processes=None, sampleInterval=1, prune=None):
+    """Прогоняет модель в каждой точке плана параллельно по процессам.
+    Генератор: результаты отдаются по мере завершения точек, а не в порядке плана.
+    prune - {"minThroughput", "sink"}: точки, где даже предельный поток по статическому
+    анализу ниже minThroughput, не моделируются и отдаются первыми с pruned=True"""
+    if until is None or until <= 0:
+        raise ValueError("Sweep requires positive 'until'")
+    modelSpec = ModelSpec.parse(modelDescription)
+    errors = analyzeFlow(modelSpec).getErrors()
+    if errors:
+        raise ValueError(f"Map has errors: {errors[0]['type']} {errors[0]['id']}: {errors[0]['message']}")
+    if prune is not None and "minThroughput" not in prune:
+        raise ValueError("prune requires 'minThroughput'")
+    prunedResults = []
+    simulatedPoints = []
+    for index, point in enumerate(points):
+        # значения тоже проверяются схемой - до запуска процессов
+        pointSpec = modelSpec.withParameters(point)
+        if prune is not None:
+            predicted = getPredictedThroughput(pointSpec, prune.get("sink"))
+            if predicted < prune["minThroughput"]:
+                prunedResults.append({
+                    "index": index,
+                    "parameters": point,
+                    "pruned": True,
+                    "predictedThroughput": predicted
+                })
+                continue
+        simulatedPoints.append((index, point))
+    return _runSweepPoints(modelSpec, simulatedPoints, prunedResults, until, seed, processes, sampleInterval)
+
+def _runSweepPoints(modelSpec, points, prunedResults, until, seed, processes, sampleInterval):
+    yield from prunedResults
+    if not points:
+        return
+    with replications.createExecutor(modelSpec, processes) as executor:
+        futures = {
+            executor.submit(runWorkerSweepPoint, index, point, until, seed, sampleInterval): point
+            for index, point in points
+        }
+        for future in as_completed(futures):
+            index, metrics = future.result()
+            yield {
+                "index": index,
+                "parameters": futures[future],
+                "metrics": metrics
+            }
@@ -0,0 +1,98 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+from modeling.model_spec import ModelSpec
+from modeling.material_flow.node.buffer.buffer import Buffer
+from modeling.material_flow.node.sink.sink import Sink
+from modeling.statistics.summary import summarize
+
+def collectMetrics(core, bufferLevelSums, samplesCount):
+    """Итоговые метрики одного прогона: выработка стоков и уровни буферов"""
+    duration = core.getModelTime()
+    metrics = dict()
+    for entityId, node in core.nodes.items():
+        if isinstance(node, Sink):
+            processedCount = node.getProcessedCount()
+            metrics[f"sink.{entityId}.total"] = processedCount
+            metrics[f"sink.{entityId}.throughput"] = processedCount / duration if duration > 0 else 0
+        elif isinstance(node, Buffer):
+            metrics[f"buffer.{entityId}.level"] = node.getCurrentCount()
+            metrics[f"buffer.{entityId}.meanLevel"] = bufferLevelSums[entityId] / samplesCount if samplesCount else 0
+    return metrics
+
+# Спецификация модели, переданная в процесс пула один раз при его старте
+workerModelSpec = None
+
+def initWorker(modelSpec):
+    global workerModelSpec
+    workerModelSpec = modelSpec
+
+def runWorkerReplication(until, seed, sampleInterval):
+    return runReplication(workerModelSpec, until, seed, sampleInterval)
+
+# Внешний исполнитель прогонов (например, кластер воркеров): executorFactory(initializer, initargs) -> Executor
+executorFactory = None
+
+def createExecutor(modelSpec, processes):
+    """Пул процессов, в каждый из которых спецификация модели передается один раз"""
+    if executorFactory is not None:
+        return executorFactory(initWorker, (modelSpec,))
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=initWorker, initargs=(modelSpec,))
+
+def runReplication(modelDescription, until, seed, sampleInterval=1):
+    """Один независимый прогон модели со своим seed до модельного времени until"""
+    modelSpec = ModelSpec.parse(modelDescription)
+    core = ModelingCore(modelSpec, modelSpec.name, modelSpec.caption, seed)
+    core.configureRun(RUN_MODE_BATCH, until=until)
+
+    buffers = {entityId: node for entityId, node in core.nodes.items() if isinstance(node, Buffer)}
+    bufferLevelSums = dict.fromkeys(buffers, 0)
+    samples = [0]
+
+    def levelSampler():
+        while True:
+            yield core.env.timeout(sampleInterval)
+            for entityId, node in buffers.items():
+                bufferLevelSums[entityId] = bufferLevelSums[entityId] + node.getCurrentCount()
+            samples[0] = samples[0] + 1
+
+    if buffers:
+        core.env.process(levelSampler())
+    core.run_batch()
+    return collectMetrics(core, bufferLevelSums, samples[0])
+
+def spawnSeeds(seed, count):
+    """Независимые seed'ы для прогонов из одного базового (numpy SeedSequence)"""
+    seedSequence = np.random.SeedSequence(seed)
+    seeds = [int(child.generate_state(1)[0]) for child in seedSequence.spawn(count)]
+    return seedSequence.entropy, seeds
+
+def runReplications(modelDescription, replications, until, seed=None, processes=None, confidence=0.95, sampleInterval=1):
+    """Монте-Карло: N прогонов модели параллельно по процессам с агрегированной статистикой"""
+    if replications < 1:
+        raise ValueError("replications must be positive")
+    if until is None or until <= 0:
+        raise ValueError("Replications require positive 'until'")
+
+    modelSpec = ModelSpec.parse(modelDescription)
+    baseSeed, seeds = spawnSeeds(seed, replications)
+    count = len(seeds)
+    with createExecutor(modelSpec, processes) as executor:
+        runs = list(executor.map(runWorkerReplication, [until] * count, seeds, [sampleInterval] * count))
+
+    metrics = dict()
+    for name in runs[0]:
+        metrics[name] = summarize([run[name] for run in runs], confidence)
+
+    return {
+        "replications": count,
+        "until": until,
+        "seed": baseSeed,
+        "seeds": seeds,
+        "metrics": metrics,
+        "runs": runs
+    }
@@ -0,0 +1,59 @@
+from modeling.material_flow.node.buffer.buffer import Buffer
+from modeling.material_flow.node.fabric.fabric import Fabric
+from modeling.material_flow.node.fabric.fabric_export import FabricExport
+from modeling.material_flow.node.fabric.fabric_import import FabricImport
+from modeling.material_flow.node.fabric.fabric_reciept import FabricReciept
+from modeling.material_flow.node.sink.sink import Sink
+
+# Построители сущностей по типу записи карты:
+# узел - builder(core, entry), транспорт - builder(core, entry, source, destination)
+NODE_BUILDERS = dict()
+TRANSPORT_BUILDERS = dict()
+
+def nodeBuilder(nodeType):
+    def register(builder):
+        NODE_BUILDERS[nodeType] = builder
+        return builder
+    return register
+
+def transportBuilder(transportType):
+    def register(builder):
+        TRANSPORT_BUILDERS[transportType] = builder
+        return builder
+    return register
+
+@nodeBuilder("source")
+def buildSource(core, entry):
+    fluid = core.modelSpec.fluid if entry.fluid is None else entry.fluid
+    return core.getDefaultRudeMiner(entry.resourceType, entry.miningSpeed, entry.miningFrame, entry.internalStorageCapacity, fluid)
+
+@nodeBuilder("simple_storage")
+def buildStorage(core, entry):
+    return Buffer(core.env, entry.resourceType, entry.capacity, entry.importLock, entry.exportLock, entry.importLockDelay, entry.exportLockDelay,
+                  entry.importPorts, entry.exportPorts)
+
+@nodeBuilder("fabric")
+def buildFabric(core, entry):
+    imports = [FabricImport(item.resourceType, item.minForReciept, item.internalCapacity) for item in entry.imports]
+    exports = [FabricExport(item.resourceType, item.outPerReciept, item.internalCapacity) for item in entry.exports]
+    reciepts = [FabricReciept(inputs, outputs, delay, name, priority) for name, priority, delay, inputs, outputs in entry.getRecipes()]
+    return Fabric(core.env, imports, exports, reciepts, entry.lines, entry.batch, entry.selection)
+
+@nodeBuilder("sink")
+def buildSink(core, entry):
+    return Sink(core.env, entry.resourceType)
+
+@transportBuilder("teleport")
+def buildTeleport(core, entry, source, destination):
+    fluid = core.modelSpec.fluid if entry.fluid is None else entry.fluid
+    return core.getDefaultTeleport(source, entry.from_endpoint, destination, entry.to_endpoint, entry.data.perMinute, entry.data.frame, fluid)
+
+@transportBuilder("train")
+def buildTrain(core, entry, source, destination):
+    rng = core.getRandomStream(f"transport/{entry.id}")
+    return core.getTrain(entry.data.min_delay, entry.data.max_delay, entry.data.limit, source, entry.from_endpoint, destination, entry.to_endpoint, rng)
+
+@transportBuilder("fleet")
+def buildFleet(core, entry, source, destination):
+    rng = core.getRandomStream(f"transport/{entry.id}")
+    return core.getTrainFleet(entry.data.count, entry.data.min_delay, entry.data.max_delay, entry.data.limit, source, entry.from_endpoint, destination, entry.to_endpoint, rng)
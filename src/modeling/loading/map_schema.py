@@ -0,0 +1,330 @@
+from typing import ClassVar, Literal, Optional, Tuple, Union
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+
+# целые значения карты остаются целыми (счетчики в статусах не превращаются во float)
+Number = Union[int, float]
+
+class EntitySchema(BaseModel):
+    """Запись карты. Неизвестные поля (координаты редактора и т.п.) отбрасываются,
+    модели неизменяемые и хешируемые"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    id: int
+    type: str
+
+# --- узлы ---
+
+class NodeSchema(EntitySchema):
+    # есть ли у узла входы/выходы для транспорта
+    hasImports: ClassVar[bool] = True
+    hasExports: ClassVar[bool] = True
+
+    def getImportsCount(self):
+        """Сколько входов адресует to_endpoint транспорта (индексы с 0)"""
+        return 1 if self.hasImports else 0
+
+    def getExportsCount(self):
+        return 1 if self.hasExports else 0
+
+class SourceNode(NodeSchema):
+    hasImports: ClassVar[bool] = False
+
+    resourceType: str
+    miningSpeed: Number = Field(gt=0)
+    miningFrame: Number = Field(gt=0)
+    internalStorageCapacity: Number = Field(gt=0)
+    fluid: Optional[bool] = None
+
+class StorageNode(NodeSchema):
+    resourceType: str
+    importLock: bool
+    importLockDelay: Number = Field(ge=0)
+    exportLock: bool
+    exportLockDelay: Number = Field(ge=0)
+    capacity: Number = Field(gt=0)
+    # число доков (одновременных операций под блокировкой) на входе и выходе
+    importPorts: int = Field(default=1, ge=1)
+    exportPorts: int = Field(default=1, ge=1)
+
+class FabricImportSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    resourceType: str
+    # расход единственного рецепта (старая форма карты): обязателен без recipes, при recipes не нужен
+    minForReciept: Optional[Number] = Field(default=None, ge=0)
+    internalCapacity: Number = Field(gt=0)
+
+class FabricExportSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    resourceType: str
+    outPerReciept: Optional[Number] = Field(default=None, ge=0)
+    internalCapacity: Number = Field(gt=0)
+
+class RecieptSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    delay: Number = Field(gt=0)
+
+class RecipeItemSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    resourceType: str
+    amount: Number = Field(ge=0)
+
+class FabricRecipeSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    name: Optional[str] = None
+    delay: Number = Field(gt=0)
+    # при selection=priority выбирается готовый рецепт с наибольшим приоритетом
+    priority: Number = 0
+    inputs: Tuple[RecipeItemSchema, ...] = ()
+    outputs: Tuple[RecipeItemSchema, ...] = ()
+
+class FabricNode(NodeSchema):
+    imports: Tuple[FabricImportSchema, ...]
+    exports: Tuple[FabricExportSchema, ...]
+    reciept: Optional[RecieptSchema] = None
+    recipes: Tuple[FabricRecipeSchema, ...] = ()
+    selection: Literal["priority", "roundRobin", "mostCycles"] = "priority"
+    # параллельные производственные линии и сколько циклов линия берет за один раз
+    lines: int = Field(default=1, ge=1)
+    batch: int = Field(default=1, ge=1)
+
+    @model_validator(mode="after")
+    def checkRecipes(self):
+        if not self.recipes:
+            if self.reciept is None:
+                raise ValueError("fabric requires 'reciept' or 'recipes'")
+            for ports, field, section in ((self.imports, "minForReciept", "imports"), (self.exports, "outPerReciept", "exports")):
+                for position, port in enumerate(ports):
+                    if getattr(port, field) is None:
+                        raise ValueError(f"{section}[{position}].{field} is required without recipes")
+            return self
+        for ports, items, section in ((self.imports, "inputs", "imports"), (self.exports, "outputs", "exports")):
+            resourceTypes = [port.resourceType for port in ports]
+            if len(set(resourceTypes)) != len(resourceTypes):
+                raise ValueError(f"{section} resource types must be unique when recipes are used")
+            for position, recipe in enumerate(self.recipes):
+                for item in getattr(recipe, items):
+                    if item.resourceType not in resourceTypes:
+                        raise ValueError(f"recipes[{position}].{items}: {item.resourceType!r} is not in {section}")
+        return self
+
+    def getImportsCount(self):
+        return len(self.imports)
+
+    def getExportsCount(self):
+        return len(self.exports)
+
+    def getRecipes(self):
+        """Рецепты фабрики: (name, priority, delay, расход по входам, выход по выходам).
+        Старая форма карты (reciept + minForReciept/outPerReciept) - один рецепт"""
+        if not self.recipes:
+            return [(None, 0, self.reciept.delay,
+                     [port.minForReciept for port in self.imports],
+                     [port.outPerReciept for port in self.exports])]
+        recipes = []
+        for recipe in self.recipes:
+            inputs = {item.resourceType: item.amount for item in recipe.inputs}
+            outputs = {item.resourceType: item.amount for item in recipe.outputs}
+            recipes.append((recipe.name, recipe.priority, recipe.delay,
+                            [inputs.get(port.resourceType, 0) for port in self.imports],
+                            [outputs.get(port.resourceType, 0) for port in self.exports]))
+        return recipes
+
+class SinkNode(NodeSchema):
+    hasExports: ClassVar[bool] = False
+
+    resourceType: str
+
+# --- транспорт ---
+
+class TransportSchema(EntitySchema):
+    from_id: int
+    from_endpoint: int = Field(ge=0)
+    to_id: int
+    to_endpoint: int = Field(ge=0)
+
+class TeleportData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    perMinute: Number = Field(gt=0)
+    frame: Number = Field(gt=0)
+
+class TeleportTransport(TransportSchema):
+    data: TeleportData
+    fluid: Optional[bool] = None
+
+class TrainData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    limit: Number = Field(gt=0)
+    min_delay: Number = Field(ge=0)
+    max_delay: Number = Field(ge=0)
+
+    @model_validator(mode="after")
+    def checkDelays(self):
+        if self.min_delay > self.max_delay:
+            raise ValueError("min_delay must not exceed max_delay")
+        return self
+
+class TrainTransport(TransportSchema):
+    data: TrainData
+
+class FleetData(TrainData):
+    count: int = Field(gt=0)
+
+class FleetTransport(TransportSchema):
+    data: FleetData
+
+NODE_SCHEMAS = {
+    "source": SourceNode,
+    "simple_storage": StorageNode,
+    "fabric": FabricNode,
+    "sink": SinkNode,
+}
+
+TRANSPORT_SCHEMAS = {
+    "teleport": TeleportTransport,
+    "train": TrainTransport,
+    "fleet": FleetTransport,
+}
+
+# --- условия остановки прогона (секция run.stop) ---
+
+class StopConditionSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    type: str
+
+class TimeStopCondition(StopConditionSchema):
+    until: Number = Field(gt=0)
+
+class SinkTotalStopCondition(StopConditionSchema):
+    sink: int
+    total: Number = Field(gt=0)
+
+class ConfidenceStopCondition(StopConditionSchema):
+    """Относительная полуширина интервала выработки стока (без sink - всех стоков) после прогрева"""
+    sink: Optional[int] = None
+    relativeHalfWidth: Number = Field(gt=0)
+    confidence: Number = Field(default=0.95, gt=0, lt=1)
+    batches: int = Field(default=20, ge=2)
+    # наблюдений (замеров рекордера) в одном батче не меньше
+    minBatchSize: int = Field(default=25, ge=1)
+
+STOP_CONDITION_SCHEMAS = {
+    "time": TimeStopCondition,
+    "sinkTotal": SinkTotalStopCondition,
+    "confidence": ConfidenceStopCondition,
+}
+
+# --- запись рядов (секция run.recording) ---
+
+class RecordingSchema(BaseModel):
+    """Параметры записи рядов; не заданные берутся по умолчанию ядра"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    interval: Optional[Number] = Field(default=None, gt=0)
+    maxBytes: Optional[int] = Field(default=None, gt=0)
+
+def describeValidationError(error):
+    """Ошибки pydantic одной строкой: поле и причина (ветви Number - одной ошибкой)"""
+    messages = dict()
+    for detail in error.errors():
+        field = ".".join(str(part) for part in detail["loc"] if part not in ("int", "float")) or "entry"
+        messages[field] = detail["msg"]
+    return "; ".join(f"{field}: {message}" for field, message in messages.items())
+
+def validateEntry(section, position, entry):
+    """Проверяет одну запись карты по схеме ее типа, ошибки - ValueError с указанием записи"""
+    schemas = NODE_SCHEMAS if section == "nodes" else TRANSPORT_SCHEMAS
+    if not isinstance(entry, dict):
+        raise ValueError(f"{section}[{position}]: entry must be an object")
+    schema = schemas.get(entry.get("type"))
+    if schema is None:
+        raise ValueError(f"{section}[{position}] (id={entry.get('id')}): unknown type {entry.get('type')!r}")
+    try:
+        return schema.model_validate(entry)
+    except ValidationError as e:
+        raise ValueError(f"{section}[{position}] (id={entry.get('id')}): {describeValidationError(e)}") from None
+
+def validateStopConditions(conditions):
+    """Условия остановки из секции run.stop: прогон кончается по первому выполненному"""
+    if not isinstance(conditions, list):
+        raise ValueError("run.stop must be a list")
+    validated = []
+    for position, condition in enumerate(conditions):
+        if not isinstance(condition, dict):
+            raise ValueError(f"run.stop[{position}]: condition must be an object")
+        schema = STOP_CONDITION_SCHEMAS.get(condition.get("type"))
+        if schema is None:
+            raise ValueError(f"run.stop[{position}]: unknown type {condition.get('type')!r}")
+        try:
+            validated.append(schema.model_validate(condition))
+        except ValidationError as e:
+            raise ValueError(f"run.stop[{position}]: {describeValidationError(e)}") from None
+    return tuple(validated)
+
+def validateRecording(recording, required=False):
+    """Секция run.recording: без нее или false - ряды не пишутся, true - параметры по умолчанию.
+    required - ряды нужны определению прогрева: без секции запись включается.
+    Возвращает RecordingSchema или None"""
+    if recording is None:
+        recording = required
+    if recording is False:
+        return None
+    if recording is True:
+        recording = {}
+    if not isinstance(recording, dict):
+        raise ValueError("run.recording must be a boolean or an object")
+    try:
+        return RecordingSchema.model_validate(recording)
+    except ValidationError as e:
+        raise ValueError(f"run.recording: {describeValidationError(e)}") from None
+
+def validateMap(modelDescription):
+    """Проверка карты целиком: записи по схемам, уникальность id и ссылки транспорта на узлы.
+    Возвращает (nodes, transports) - кортежи неизменяемых записей"""
+    if not isinstance(modelDescription, dict):
+        raise ValueError("Model map must be an object")
+    for section in ("nodes", "transport"):
+        if not isinstance(modelDescription.get(section), list):
+            raise ValueError(f"Model map requires a '{section}' list")
+    nodes = tuple(validateEntry("nodes", position, entry) for position, entry in enumerate(modelDescription["nodes"]))
+    transports = tuple(validateEntry("transport", position, entry) for position, entry in enumerate(modelDescription["transport"]))
+
+    nodesById = dict()
+    for node in nodes:
+        if node.id in nodesById:
+            raise ValueError(f"Duplicate node id: {node.id}")
+        nodesById[node.id] = node
+    transportIds = set()
+    for transport in transports:
+        if transport.id in transportIds:
+            raise ValueError(f"Duplicate transport id: {transport.id}")
+        transportIds.add(transport.id)
+        validateLinks(transport, nodesById)
+    return nodes, transports
+
+def validateLinks(transport, nodesById):
+    source = nodesById.get(transport.from_id)
+    destination = nodesById.get(transport.to_id)
+    if source is None:
+        raise ValueError(f"Transport {transport.id}: unknown from_id {transport.from_id}")
+    if destination is None:
+        raise ValueError(f"Transport {transport.id}: unknown to_id {transport.to_id}")
+    if not source.hasExports:
+        raise ValueError(f"Transport {transport.id}: node {source.id} ({source.type}) has no exports")
+    if not destination.hasImports:
+        raise ValueError(f"Transport {transport.id}: node {destination.id} ({destination.type}) has no imports")
+    # индексы с 0: карта со старыми индексами фабрики с 1 отклоняется, а не адресует соседний вход
+    if transport.from_endpoint >= source.getExportsCount():
+        raise ValueError(f"Transport {transport.id}: from_endpoint {transport.from_endpoint} is out of range, "
+                         f"node {source.id} ({source.type}) has {source.getExportsCount()} export(s) numbered from 0")
+    if transport.to_endpoint >= destination.getImportsCount():
+        raise ValueError(f"Transport {transport.id}: to_endpoint {transport.to_endpoint} is out of range, "
+                         f"node {destination.id} ({destination.type}) has {destination.getImportsCount()} import(s) numbered from 0")
@@ -1,10 +1,23 @@
+import math
 import simpy
 from modeling.material_flow.node.export_endpoint import ExportEndpoint
 from modeling.material_flow.node.import_endpoint import ImportEndpoint
+from modeling.material_flow.node.buffer.lock_port import LockPort
+
+# фазы операции под блокировкой дока
+PHASE_WAIT = "WAIT"
+PHASE_DELAY = "DELAY"
+PHASE_OPERATION = "OPERATION"
+# свободный док без задержки: событие контейнера отдано транспорту напрямую
+PHASE_DIRECT = "DIRECT"
 
 class Buffer:
+    __slots__ = ("env", "resourceGuid", "bufferSize", "accumulatedResources", "container", "lockingImport",
+                 "lockingExport", "importLocklDelay", "exportLockDelay", "totalIn", "totalOut", "importPort",
+                 "exportPort", "export_busy", "importStreams", "exportStreams", "streamIn", "streamOut", "streamHorizon",
+                 "streamWakeupTime", "streamWakeups", "profiler", "profileKey")
 
-    def __init__(self, env, resourceGuid, bufferSize, lockingImport, lockingExport, importLocklDelay, exportLockDelay):
+    def __init__(self, env, resourceGuid, bufferSize, lockingImport, lockingExport, importLocklDelay, exportLockDelay, importPorts=1, exportPorts=1):
         self.resourceGuid = resourceGuid
         self.bufferSize = bufferSize
         self.accumulatedResources = 0
@@ -18,85 +31,334 @@ class Buffer:
         self.totalIn = 0
         self.totalOut = 0
         
-        # Ресурсы для блокировок
-        self.import_resource = simpy.Resource(env, 1) if lockingImport else None
-        self.export_resource = simpy.Resource(env, 1) if lockingExport else None
+        # Доки для блокировок: importPorts/exportPorts одновременных операций
+        self.importPort = LockPort(env, importPorts, importLocklDelay) if lockingImport else None
+        self.exportPort = LockPort(env, exportPorts, exportLockDelay) if lockingExport else None
+
+        # fluid-телепорты, чьи поставки и заборы досчитываются лениво (Teleport.syncStream):
+        # их итог попадает в контейнер одним put/get при синхронизации
+        self.importStreams = []
+        self.exportStreams = []
+        self.streamIn = 0
+        self.streamOut = 0
+        # до этого момента ленивые поставки гарантированно помещаются в буфер
+        self.streamHorizon = None
+        self.streamWakeupTime = None
+        # запланированные пересчеты горизонта: (момент, таймаут)
+        self.streamWakeups = []
             
     def getResources(self, exportIndex, resourcesCount):
         self.totalOut = self.totalOut + resourcesCount
         """Получить ресурсы из буфера"""
-        if self.lockingExport and self.export_resource:
-            # Возвращаем составное событие: сначала захват ресурса, потом получение из контейнера
-            return self._getWithLock(resourcesCount)
+        if self.exportPort is not None:
+            if self.exportPort.resumed:
+                # повторный запрос после восстановления - продолжается операция из контрольной точки
+                return self.exportPort.resumed.pop(0)[2]
+            # Операция через док: слот, задержка блокировки, получение из контейнера
+            return self._lockedOperation(self.exportPort, self._containerGet, resourcesCount)
         else:
             # Без блокировки - просто возвращаем событие контейнера
-            return self.container.get(resourcesCount)
+            return self._containerGet(resourcesCount)
     
     def putResources(self, inputIndex, resourcesCount):
         self.totalIn = self.totalIn + resourcesCount
         """Добавить ресурсы в буфер"""
-        if self.lockingImport and self.import_resource:
-            # Возвращаем составное событие: сначала захват ресурса, потом добавление в контейнер
-            return self._putWithLock(resourcesCount)
+        if self.importPort is not None:
+            if self.importPort.resumed:
+                return self.importPort.resumed.pop(0)[2]
+            # Операция через док: слот, задержка блокировки, добавление в контейнер
+            return self._lockedOperation(self.importPort, self._containerPut, resourcesCount)
         else:
             # Без блокировки - просто возвращаем событие контейнера
-            return self.container.put(resourcesCount)
-    
-    def _getWithLock(self, resourcesCount):
-        """Вспомогательный метод для получения с блокировкой"""
-        def process():
-            # Захватываем блокировку
-            request = self.export_resource.request()
-            yield request
-
-            yield self.env.timeout(self.exportLockDelay)
-            
-            try:
-                # Получаем ресурсы из контейнера
-                yield self.container.get(resourcesCount)
-            finally:
-                # Освобождаем блокировку
-                self.export_resource.release(request)
-        
-        return self.env.process(process())
+            return self._containerPut(resourcesCount)
+
+    def _containerGet(self, resourcesCount):
+        """Операции контейнера видят ленивые потоки досчитанными, после них потоки перепланируются"""
+        self.syncStreams()
+        event = self.container.get(resourcesCount)
+        self._planStreams()
+        return event
+
+    def _containerPut(self, resourcesCount):
+        self.syncStreams()
+        event = self.container.put(resourcesCount)
+        self._planStreams()
+        return event
+
+    def attachImportStream(self, inputIndex, stream):
+        self.importStreams.append(stream)
+
+    def attachExportStream(self, exportIndex, stream):
+        self.exportStreams.append(stream)
+
+    def getStreamPuts(self, inputIndex, resourcesCount):
+        """Поставки без событий: док не блокируется, никто не ждет в очередях контейнера,
+        место до горизонта гарантировано (см. _planHorizon)"""
+        if self.importPort is not None or self.streamHorizon is None or self.container.get_queue or self.container.put_queue:
+            return 0
+        return math.inf
+
+    def streamPut(self, inputIndex, resourcesCount, putTime):
+        self.totalIn = self.totalIn + resourcesCount
+        self.streamIn = self.streamIn + resourcesCount
+
+    def getStreamTakes(self, exportIndex, resourcesCount):
+        """Заборы без событий: единственный ленивый получатель, док не блокируется, очереди пусты"""
+        if (self.exportPort is not None or len(self.exportStreams) != 1 or self.container.get_queue
+                or self.container.put_queue):
+            return 0
+        return int(self._getLevel() // resourcesCount)
+
+    def getStreamTakeTime(self, exportIndex, resourcesCount, readyTime):
+        return readyTime
+
+    def streamTake(self, exportIndex, resourcesCount, takeTime):
+        self.totalOut = self.totalOut + resourcesCount
+        self.streamOut = self.streamOut + resourcesCount
+
+    def _getLevel(self):
+        return self.container.level + self.streamIn - self.streamOut
+
+    def syncStreams(self):
+        """Досчитывает ленивые потоки до текущего момента и переносит их итог в контейнер"""
+        for stream in self.importStreams:
+            stream.syncStream()
+        for stream in self.exportStreams:
+            stream.syncStream()
+        if self.streamIn > 0:
+            self.container.put(self.streamIn)
+            self.streamIn = 0
+        if self.streamOut > 0:
+            self.container.get(self.streamOut)
+            self.streamOut = 0
+
+    def _planStreams(self):
+        self._planHorizon()
+        for stream in self.importStreams:
+            stream.planStream()
+        for stream in self.exportStreams:
+            stream.planStream()
+
+    def _planHorizon(self):
+        """Горизонт ленивых поставок: за время h поток с кадром f и задержкой d поставит
+        не больше (h / d + 1) * f, поэтому до now + h все поставки помещаются в свободное место.
+        Горизонт короче рейса самого быстрого потока не берется - поставки идут событиями"""
+        if not self.importStreams:
+            return
+        frames = sum(stream.frame for stream in self.importStreams)
+        rate = sum(stream.frame / stream.delay for stream in self.importStreams)
+        horizon = (self.bufferSize - self._getLevel() - frames) / rate
+        if horizon < min(stream.delay for stream in self.importStreams):
+            self.streamHorizon = None
+            return
+        self.streamHorizon = self.env.now + horizon
+        if self.streamWakeupTime is not None and self.streamWakeupTime <= self.streamHorizon:
+            return
+        self.streamWakeupTime = self.streamHorizon
+        self._addStreamWakeup(self.streamHorizon)
+
+    def _addStreamWakeup(self, wakeupTime):
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "timeout")
+        timeout = self.env.timeout(max(0, wakeupTime - self.env.now))
+        self.streamWakeups.append((wakeupTime, timeout))
+        timeout.callbacks.append(lambda event: self._onStreamWakeup(event, wakeupTime))
+
+    def _onStreamWakeup(self, event, wakeupTime):
+        self.streamWakeups.remove((wakeupTime, event))
+        if self.streamWakeupTime == wakeupTime:
+            self.streamWakeupTime = None
+        self.syncStreams()
+        self._planStreams()
     
-    def _putWithLock(self, resourcesCount):
-        """Вспомогательный метод для добавления с блокировкой"""
-        def process():
-            # Захватываем блокировку
-            request = self.import_resource.request()
-            yield request
-
-            yield self.env.timeout(self.importLocklDelay)
-            
-            try:
-                # Добавляем ресурсы в контейнер
-                yield self.container.put(resourcesCount)
-            finally:
-                # Освобождаем блокировку
-                self.import_resource.release(request)
-        
-        return self.env.process(process())
+    def _lockedOperation(self, port, operation, resourcesCount):
+        """Операция под блокировкой дока без отдельного процесса: цепочка колбэков
+        слот -> задержка -> операция контейнера -> освобождение слота"""
+        if port.delay <= 0 and port.isFree():
+            # свободный док без задержки - событие контейнера и есть результат
+            port.acquire(_skip)
+            record = [PHASE_DIRECT, self.env.now, None, None, resourcesCount]
+            port.operations.append(record)
+            return self._issueDirect(port, operation, record)
+
+        record = [PHASE_WAIT, self.env.now, self.env.event(), None, resourcesCount]
+        port.operations.append(record)
+        port.acquire(self._bindOperation(port, operation, record)[0])
+        return record[2]
+
+    def _issueDirect(self, port, operation, record):
+        event = operation(record[4])
+        record[2] = record[3] = event
+        event.callbacks.append(lambda _: port.finish(record))
+        return event
+
+    def _bindOperation(self, port, operation, record):
+        """Колбэки операции record: start - слот получен, startDelay - задержка блокировки,
+        issueOperation - операция контейнера, по ее завершении слот освобождается"""
+        def onOperationDone(_):
+            port.finish(record)
+            record[2].succeed()
+
+        def issueOperation(_=None):
+            record[0] = PHASE_OPERATION
+            record[3] = operation(record[4])
+            record[3].callbacks.append(onOperationDone)
+
+        def startDelay(delay):
+            if getattr(self, "profiler", None) is not None:
+                self.profiler.countEvent(self.profileKey, "timeout")
+            record[0] = PHASE_DELAY
+            record[1] = self.env.now + delay
+            record[3] = self.env.timeout(delay)
+            record[3].callbacks.append(issueOperation)
+
+        def start():
+            if port.delay <= 0:
+                issueOperation()
+            else:
+                startDelay(port.delay)
+
+        return start, startDelay, issueOperation
     
+    def getExportSlots(self, exportIndex):
+        """Сколько операций выдачи идут одновременно - столько запросов держит флот поездов"""
+        return 1 if self.exportPort is None else self.exportPort.slots
+
+    def getImportSlots(self, inputIndex):
+        return 1 if self.importPort is None else self.importPort.slots
+
     def setExportBusy(self, busy=True):
         """Установить/снять блокировку экспорта вручную"""
         self.export_busy = busy
+
+    def getRequestQueues(self):
+        """Ожидающие запросы транспорта по очередям - для их порядка в контрольной точке"""
+        return [
+            self.container.put_queue if self.importPort is None else [record[2] for record in self.importPort.operations],
+            self.container.get_queue if self.exportPort is None else [record[2] for record in self.exportPort.operations]
+        ]
+
+    def getCurrentCount(self):
+        self.syncStreams()
+        return self.container.level
+
+    def getState(self, order):
+        self.syncStreams()
+        return {
+            "level": self.container.level,
+            "totalIn": self.totalIn,
+            "totalOut": self.totalOut,
+            "importPort": None if self.importPort is None else self.importPort.getState(),
+            "exportPort": None if self.exportPort is None else self.exportPort.getState(),
+            "importOperations": self._getOperationsState(self.importPort, order),
+            "exportOperations": self._getOperationsState(self.exportPort, order),
+            "streamHorizon": self.streamHorizon,
+            "streamWakeupTime": self.streamWakeupTime,
+            "streamWakeups": [[wakeupTime, order.getKey(timeout)] for wakeupTime, timeout in self.streamWakeups]
+        }
+
+    def _getOperationsState(self, port, order):
+        if port is None:
+            return []
+        operations = []
+        for phase, time, _, phaseEvent, count in port.operations:
+            operation = {"phase": phase, "count": count}
+            if phase == PHASE_WAIT:
+                operation["requestTime"] = time
+            elif phase == PHASE_DELAY:
+                operation["remaining"] = time - self.env.now
+                operation["order"] = order.getKey(phaseEvent)
+            operations.append(operation)
+        return operations
+
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки. Незавершенные операции под блокировкой
+        продолжаются с той же фазы, транспорт получает их события, подав запрос заново"""
+        if state["level"] > self.bufferSize:
+            raise ValueError(f"Buffer capacity {self.bufferSize} is below checkpoint level {state['level']}")
+        self.container = simpy.Container(self.env, self.bufferSize, state["level"])
+        self.restoreCounters(state)
+        for port, operation, operations in ((self.importPort, self._containerPut, state.get("importOperations")),
+                                            (self.exportPort, self._containerGet, state.get("exportOperations"))):
+            if port is not None and operations:
+                self._restoreOperations(port, operation, operations, restore)
+        self.streamHorizon = state["streamHorizon"]
+        self.streamWakeupTime = state["streamWakeupTime"]
+        for wakeupTime, key in state["streamWakeups"]:
+            restore.add(key, self._addStreamWakeup, wakeupTime)
+
+    def _restoreOperations(self, port, operation, operations, restore):
+        """Ожидающие слота - в очередь дока с исходным временем запроса, задержки и операции
+        контейнера создаются заново в исходном порядке (ключи RestoreOrder)"""
+        for index, state in enumerate(operations):
+            phase = state["phase"]
+            record = [phase, state.get("requestTime", self.env.now), None, None, state["count"]]
+            port.operations.append(record)
+            if phase == PHASE_DIRECT:
+                port.busy = port.busy + 1
+                restore.add([1, index], self._issueDirect, port, operation, record)
+                continue
+            record[2] = self.env.event()
+            start, startDelay, issueOperation = self._bindOperation(port, operation, record)
+            if phase == PHASE_WAIT:
+                port.waiting.append((record[1], start))
+                continue
+            port.busy = port.busy + 1
+            if phase == PHASE_DELAY:
+                restore.add(state["order"], startDelay, state["remaining"])
+            else:
+                restore.add([1, index], issueOperation)
+        port.resumed = list(port.operations)
+
+    def restoreCounters(self, state):
+        self.totalIn = state["totalIn"]
+        self.totalOut = state["totalOut"]
+        for port, portState in ((self.importPort, state.get("importPort")), (self.exportPort, state.get("exportPort"))):
+            if port is not None and portState is not None:
+                port.restoreState(portState)
+                # операции, которые транспорт не запросил заново, не выдаются новым запросам
+                port.resumed = []
     
     def getImportNodes(self):
-        return [ImportEndpoint(self.resourceGuid)]
+        return [ImportEndpoint.get(self.resourceGuid)]
     
     def getExportNodes(self):
-        return [ExportEndpoint(self.resourceGuid)]
+        return [ExportEndpoint.get(self.resourceGuid)]
+
+    def getPortStatus(self, prefix, port):
+        """Статистика дока плоскими числовыми полями - попадает в записываемые ряды"""
+        if port is None:
+            return {
+                f"{prefix}Use": False,
+                f"{prefix}Locked": False
+            }
+        statistics = port.getStatistics()
+        return {
+            f"{prefix}Use": port.busy > 0,
+            f"{prefix}Locked": port.busy == port.slots,
+            f"{prefix}Slots": statistics["slots"],
+            f"{prefix}QueueLength": statistics["queueLength"],
+            f"{prefix}MaxQueueLength": statistics["maxQueueLength"],
+            f"{prefix}MeanQueueLength": statistics["meanQueueLength"],
+            f"{prefix}Utilization": statistics["utilization"],
+            f"{prefix}MeanWait": statistics["meanWait"],
+            f"{prefix}MaxWait": statistics["maxWait"]
+        }
     
     def getStatus(self):
-        return {
+        self.syncStreams()
+        status = {
             "type": "Node",
-            "nodeType": "buffer",
-            "importUse": False if self.import_resource == None else len(self.import_resource.users) > 0,
-            "importLocked": False if self.import_resource == None else len(self.import_resource.users) == self.import_resource.capacity,
-            "importUse": False if self.export_resource == None else len(self.export_resource.users) > 0,
-            "importLocked": False if self.export_resource == None else len(self.export_resource.users) == self.export_resource.capacity,
+            "nodeType": "buffer"
+        }
+        status.update(self.getPortStatus("import", self.importPort))
+        status.update(self.getPortStatus("export", self.exportPort))
+        status.update({
             "totalIn": self.totalIn,
             "totalOut": self.totalOut,
             "currentCount": self.container.level
-        }
\ No newline at end of file
+        })
+        return status
+
+def _skip():
+    pass
@@ -0,0 +1,118 @@
+class LockPort:
+    """Док буфера: slots одновременных операций, остальные ждут в очереди.
+    Без simpy.Resource и без процесса на операцию - занятие и освобождение слота
+    синхронные, ожидающий получает слот прямо при освобождении.
+    Ведет статистику очереди и ожиданий (средние по времени - интегралом)"""
+
+    __slots__ = ("env", "slots", "delay", "busy", "waiting", "operations", "resumed", "startTime", "lastChange",
+                 "queueArea", "busyArea", "maxQueueLength", "requestsCount", "waitedCount", "totalWait", "maxWait")
+
+    def __init__(self, env, slots, delay):
+        if slots < 1:
+            raise ValueError("Port needs at least one slot")
+        self.env = env
+        self.slots = slots
+        self.delay = delay
+        self.busy = 0
+        # очередь к доку короткая - список легче deque
+        self.waiting = []
+        # незавершенные операции в порядке запроса (ведет буфер, нужны контрольной точке):
+        # [фаза, время запроса или конца задержки, событие транспорта, событие фазы, количество]
+        self.operations = []
+        # восстановленные операции, которые еще не запросил заново транспорт
+        self.resumed = []
+
+        self.startTime = env.now
+        self.lastChange = env.now
+        self.queueArea = 0
+        self.busyArea = 0
+        self.maxQueueLength = 0
+        self.requestsCount = 0
+        self.waitedCount = 0
+        self.totalWait = 0
+        self.maxWait = 0
+
+    def _account(self):
+        now = self.env.now
+        elapsed = now - self.lastChange
+        if elapsed > 0:
+            self.queueArea = self.queueArea + len(self.waiting) * elapsed
+            self.busyArea = self.busyArea + self.busy * elapsed
+            self.lastChange = now
+
+    def isFree(self):
+        return self.busy < self.slots and not self.waiting
+
+    def acquire(self, start):
+        """start() вызывается, когда операции достался слот (сразу или из очереди)"""
+        self._account()
+        self.requestsCount = self.requestsCount + 1
+        if self.busy < self.slots:
+            self.busy = self.busy + 1
+            start()
+            return
+        self.waiting.append((self.env.now, start))
+        if len(self.waiting) > self.maxQueueLength:
+            self.maxQueueLength = len(self.waiting)
+
+    def release(self, _=None):
+        self._account()
+        if not self.waiting:
+            self.busy = self.busy - 1
+            return
+        # слот переходит первому в очереди, busy не меняется
+        requestTime, start = self.waiting.pop(0)
+        wait = self.env.now - requestTime
+        self.waitedCount = self.waitedCount + 1
+        self.totalWait = self.totalWait + wait
+        if wait > self.maxWait:
+            self.maxWait = wait
+        start()
+
+    def finish(self, operation):
+        """Операция завершена: слот освобождается"""
+        self.operations.remove(operation)
+        self.release()
+
+    def getStatistics(self):
+        self._account()
+        elapsed = self.env.now - self.startTime
+        return {
+            "slots": self.slots,
+            "busy": self.busy,
+            "queueLength": len(self.waiting),
+            "maxQueueLength": self.maxQueueLength,
+            "meanQueueLength": self.queueArea / elapsed if elapsed > 0 else 0,
+            "utilization": self.busyArea / (elapsed * self.slots) if elapsed > 0 else 0,
+            "requests": self.requestsCount,
+            "waited": self.waitedCount,
+            # ожидание считается по всем запросам: получившие слот сразу ждали 0
+            "meanWait": self.totalWait / self.requestsCount if self.requestsCount else 0,
+            "maxWait": self.maxWait
+        }
+
+    def getState(self):
+        self._account()
+        return {
+            "elapsed": self.env.now - self.startTime,
+            "queueArea": self.queueArea,
+            "busyArea": self.busyArea,
+            "maxQueueLength": self.maxQueueLength,
+            "requestsCount": self.requestsCount,
+            "waitedCount": self.waitedCount,
+            "totalWait": self.totalWait,
+            "maxWait": self.maxWait
+        }
+
+    def restoreState(self, state):
+        """Накопленная статистика из контрольной точки (занятость слотов и очередь
+        восстанавливает буфер вместе с незавершенными операциями)"""
+        self._account()
+        self.startTime = self.env.now - state["elapsed"]
+        self.queueArea = state["queueArea"]
+        self.busyArea = state["busyArea"]
+        self.maxQueueLength = state["maxQueueLength"]
+        self.requestsCount = state["requestsCount"]
+        self.waitedCount = state["waitedCount"]
+        self.totalWait = state["totalWait"]
+        self.maxWait = state["maxWait"]
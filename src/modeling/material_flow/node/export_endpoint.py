@@ -1,3 +1,15 @@
 class ExportEndpoint:
+    """Точка стыковки транспорта с узлом. Неизменяема, поэтому одна на тип ресурса"""
+    __slots__ = ("resourceGuid",)
+
+    shared = dict()
+
     def __init__(self, resourceGuid):
-        self.resourceGuid = resourceGuid
\ No newline at end of file
+        self.resourceGuid = resourceGuid
+
+    @staticmethod
+    def get(resourceGuid):
+        endpoint = ExportEndpoint.shared.get(resourceGuid)
+        if endpoint is None:
+            endpoint = ExportEndpoint.shared.setdefault(resourceGuid, ExportEndpoint(resourceGuid))
+        return endpoint
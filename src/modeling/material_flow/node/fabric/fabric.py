@@ -1,39 +1,312 @@
-import simpy
+from modeling.material_flow.node.fabric.fabric_store import FabricStore
+
+# сколько ленивых поставок на вход считается вперед - дальше поток пересчитывается
+STREAM_PUTS_LIMIT = 64
 
 class Fabric:
+    """Фабрика с несколькими рецептами и параллельными линиями без процессов SimPy:
+    линия забирает из входов сырье сразу на batch циклов (сколько позволяет запас),
+    ждет одно событие timeout на всю партию и кладет выход в хранилища выходов.
+    Если места на выходе нет - линия блокируется до освобождения"""
+
+    __slots__ = ("env", "fabricImports", "fabricExports", "reciepts", "lines", "batch", "selection", "importSources",
+                 "exportDestinations", "recieptOrder", "nextReciept", "activeLines", "blockedLines", "updating",
+                 "dirty", "cyclesCount", "busyTime", "blockedTime", "starvedTime", "accountedTime", "startTime",
+                 "profiler", "profileKey")
+
+    SELECTIONS = ("priority", "roundRobin", "mostCycles")
 
-    def __init__(self, env, fabricReciept):
+    def __init__(self, env, fabricImports, fabricExports, reciepts, lines=1, batch=1, selection="priority"):
+        if selection not in Fabric.SELECTIONS:
+            raise ValueError(f"Unknown recipe selection: {selection}")
         self.env = env
-        self.fabricReciept = fabricReciept
-        self.importSources = []
-        for importPoint in fabricReciept.fabricImports:
-            newImport = simpy.Container(env, init=0, capacity=importPoint.capacity)
-            self.importSources.append(newImport)
-        self.exportDestinations = []
-        for exportPoint in fabricReciept.fabricExports:
-            newExport = simpy.Container(env, init=0, capacity=exportPoint.capacity)
-            self.exportDestinations.append(newExport)
-    
+        self.fabricImports = fabricImports
+        self.fabricExports = fabricExports
+        self.reciepts = reciepts
+        self.lines = lines
+        self.batch = batch
+        self.selection = selection
+        self.importSources = [FabricStore(env, item.name, item.capacity, onChange=self._update) for item in fabricImports]
+        self.exportDestinations = [FabricStore(env, item.name, item.capacity, onChange=self._update) for item in fabricExports]
+        # порядок перебора рецептов: по убыванию приоритета, при равенстве - как в карте
+        self.recieptOrder = sorted(range(len(reciepts)), key=lambda index: -reciepts[index].priority)
+        self.nextReciept = 0
+
+        # занятые линии: [конец партии, рецепт, циклов, таймаут]; заблокированные - невыложенный выход
+        self.activeLines = []
+        self.blockedLines = []
+        self.updating = False
+        self.dirty = False
+
+        self.cyclesCount = [0] * len(reciepts)
+        # время линий (линия * время) в работе, в блокировке выхода и без сырья
+        self.busyTime = 0
+        self.blockedTime = 0
+        self.starvedTime = 0
+        self.accountedTime = env.now
+        self.startTime = env.now
+
+    def activate(self):
+        self._update()
+
     def putResources(self, inputIndex, resourcesCount):
-        # Возвращаем событие напрямую, а не как генератор
-        return self.importSources[inputIndex - 1].put(resourcesCount)
-    
+        self.syncStreams()
+        event = self.importSources[inputIndex].put(resourcesCount)
+        self._planStreams()
+        return event
+
+    def tryPutResources(self, inputIndex, resourcesCount):
+        self.syncStreams()
+        done = self.importSources[inputIndex].tryPut(resourcesCount)
+        self._planStreams()
+        return done
+
     def getResources(self, exportIndex, resourcesCount):
-        return self.exportDestinations[exportIndex - 1].get(resourcesCount)
-
-    def getSimuIterator(self):
-        while True:
-            #produce and export
-            for index, importSource in enumerate(self.importSources):
-                yield importSource.get(self.fabricReciept.fabricImports[index - 1].minForReciept)
-            #wait for produce
-            yield self.env.timeout(self.fabricReciept.durationPerReciept)
-            #export
-            for index, fabricExport in enumerate(self.exportDestinations):
-                yield fabricExport.put(self.fabricReciept.fabricExports[index - 1].exportPerReciept)
-    
+        self.syncStreams()
+        event = self.exportDestinations[exportIndex].get(resourcesCount)
+        self._planStreams()
+        return event
+
+    def tryGetResources(self, exportIndex, resourcesCount):
+        self.syncStreams()
+        done = self.exportDestinations[exportIndex].tryGet(resourcesCount)
+        self._planStreams()
+        return done
+
+    def attachImportStream(self, inputIndex, stream):
+        self.importSources[inputIndex].streams.append(stream)
+
+    def attachExportStream(self, exportIndex, stream):
+        self.exportDestinations[exportIndex].streams.append(stream)
+
+    def getStreamPuts(self, inputIndex, resourcesCount):
+        """Сколько поставок подряд на вход ничего не запустят: все линии заняты
+        или ни один рецепт еще не будет обеспечен сырьем"""
+        store = self.importSources[inputIndex]
+        if len(store.streams) != 1 or store.putQueue or store.getQueue:
+            return 0
+        freeLines = len(self.activeLines) + len(self.blockedLines) < self.lines
+        level = store.level
+        puts = 0
+        while puts < STREAM_PUTS_LIMIT:
+            level = level + resourcesCount
+            if level > store.capacity or (freeLines and self._canStartWith(inputIndex, level)):
+                break
+            puts = puts + 1
+        return puts
+
+    def streamPut(self, inputIndex, resourcesCount, putTime):
+        store = self.importSources[inputIndex]
+        store.level = store.level + resourcesCount
+
+    def getStreamTakes(self, exportIndex, resourcesCount):
+        """Заборы с выхода без событий, пока нет линий, ждущих места на выходе"""
+        store = self.exportDestinations[exportIndex]
+        if len(store.streams) != 1 or store.getQueue or store.putQueue or self.blockedLines:
+            return 0
+        return int(store.level // resourcesCount)
+
+    def getStreamTakeTime(self, exportIndex, resourcesCount, readyTime):
+        return readyTime
+
+    def streamTake(self, exportIndex, resourcesCount, takeTime):
+        store = self.exportDestinations[exportIndex]
+        store.level = store.level - resourcesCount
+
+    def syncStreams(self):
+        for store in self.importSources + self.exportDestinations:
+            for stream in store.streams:
+                stream.syncStream()
+
+    def _planStreams(self):
+        for store in self.importSources + self.exportDestinations:
+            for stream in store.streams:
+                stream.planStream()
+
+    def _update(self):
+        """Выкладывает выход заблокированных линий и запускает свободные.
+        Вызывается при любом изменении хранилищ - повторный вход только помечает проход"""
+        if self.updating:
+            self.dirty = True
+            return
+        self.updating = True
+        try:
+            self.dirty = True
+            while self.dirty:
+                self.dirty = False
+                self._unblockLines()
+                self._startLines()
+        finally:
+            self.updating = False
+
+    def _unblockLines(self):
+        # выход кладется по порядку выходов, как последовательные put; линии - по очереди
+        while self.blockedLines:
+            outputs = self.blockedLines[0]
+            for index, amount in enumerate(outputs):
+                if amount == 0:
+                    continue
+                store = self.exportDestinations[index]
+                if store.level + amount > store.capacity:
+                    return
+                outputs[index] = 0
+                store.add(amount)
+            self._account()
+            self.blockedLines.pop(0)
+
+    def _startLines(self):
+        while len(self.activeLines) + len(self.blockedLines) < self.lines:
+            recieptIndex, cycles = self._selectReciept()
+            if cycles == 0:
+                return
+            reciept = self.reciepts[recieptIndex]
+            self._account()
+            duration = reciept.durationPerReciept * cycles
+            line = [self.env.now + duration, recieptIndex, cycles, None]
+            self.activeLines.append(line)
+            for store, amount in zip(self.importSources, reciept.inputs):
+                if amount > 0:
+                    store.take(amount * cycles)
+            self._scheduleFinish(line, duration)
+
+    def _scheduleFinish(self, line, delay):
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "timeout")
+        line[3] = self.env.timeout(delay)
+        line[3].callbacks.append(lambda event: self._finishLine(line))
+
+    def _finishLine(self, line):
+        self.syncStreams()
+        self._account()
+        self.activeLines.remove(line)
+        recieptIndex, cycles = line[1], line[2]
+        self.cyclesCount[recieptIndex] = self.cyclesCount[recieptIndex] + cycles
+        self.blockedLines.append([amount * cycles for amount in self.reciepts[recieptIndex].outputs])
+        self._update()
+        self._planStreams()
+
+    def _getCycles(self, reciept):
+        """Сколько циклов рецепта (не больше batch) обеспечено сырьем на входах"""
+        cycles = self.batch
+        for store, amount in zip(self.importSources, reciept.inputs):
+            if amount > 0:
+                cycles = min(cycles, int(store.level // amount))
+                if cycles == 0:
+                    return 0
+        return cycles
+
+    def _canStartWith(self, inputIndex, level):
+        """Обеспечен ли сырьем хотя бы один рецепт, если на входе inputIndex будет level"""
+        for reciept in self.reciepts:
+            if all((level if index == inputIndex else store.level) >= amount
+                   for index, (store, amount) in enumerate(zip(self.importSources, reciept.inputs)) if amount > 0):
+                return True
+        return False
+
+    def _selectReciept(self):
+        if self.selection == "mostCycles":
+            best, bestCycles = None, 0
+            for index in self.recieptOrder:
+                cycles = self._getCycles(self.reciepts[index])
+                if cycles > bestCycles:
+                    best, bestCycles = index, cycles
+            return best, bestCycles
+        if self.selection == "roundRobin":
+            count = len(self.reciepts)
+            for shift in range(count):
+                index = (self.nextReciept + shift) % count
+                cycles = self._getCycles(self.reciepts[index])
+                if cycles > 0:
+                    self.nextReciept = (index + 1) % count
+                    return index, cycles
+            return None, 0
+        for index in self.recieptOrder:
+            cycles = self._getCycles(self.reciepts[index])
+            if cycles > 0:
+                return index, cycles
+        return None, 0
+
+    def _account(self):
+        """Накопление времени линий по состояниям до текущего момента"""
+        elapsed = self.env.now - self.accountedTime
+        if elapsed <= 0:
+            return
+        busy = len(self.activeLines)
+        blocked = len(self.blockedLines)
+        self.busyTime = self.busyTime + busy * elapsed
+        self.blockedTime = self.blockedTime + blocked * elapsed
+        self.starvedTime = self.starvedTime + (self.lines - busy - blocked) * elapsed
+        self.accountedTime = self.env.now
+
+    def getRequestQueues(self):
+        """Ожидающие запросы транспорта по хранилищам - для их порядка в контрольной точке"""
+        return ([[event for event, _ in store.putQueue] for store in self.importSources] +
+                [[event for event, _ in store.getQueue] for store in self.exportDestinations])
+
+    def getState(self, order):
+        self.syncStreams()
+        self._account()
+        return {
+            "importLevels": [store.level for store in self.importSources],
+            "exportLevels": [store.level for store in self.exportDestinations],
+            "activeLines": [[recieptIndex, cycles, end - self.env.now, order.getKey(timeout)]
+                            for end, recieptIndex, cycles, timeout in self.activeLines],
+            "blockedLines": [list(outputs) for outputs in self.blockedLines],
+            "nextReciept": self.nextReciept,
+            "cyclesCount": list(self.cyclesCount),
+            "busyTime": self.busyTime,
+            "blockedTime": self.blockedTime,
+            "starvedTime": self.starvedTime,
+            "startTime": self.startTime
+        }
+
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки вместо activate(): уровни внутренних хранилищ,
+        партии в работе и невыложенный выход заблокированных линий"""
+        if len(state["importLevels"]) != len(self.importSources) or len(state["exportLevels"]) != len(self.exportDestinations):
+            raise ValueError("Fabric imports/exports cannot change on restore")
+        if len(state["cyclesCount"]) != len(self.reciepts):
+            raise ValueError("Fabric recipes cannot change on restore")
+        if len(state["activeLines"]) + len(state["blockedLines"]) > self.lines:
+            raise ValueError(f"Fabric lines {self.lines} are below checkpoint busy lines")
+        for store, level in zip(self.importSources + self.exportDestinations, state["importLevels"] + state["exportLevels"]):
+            if level > store.capacity:
+                raise ValueError(f"Fabric storage capacity {store.capacity} is below checkpoint level {level}")
+            store.level = level
+        for recieptIndex, cycles, remaining, key in state["activeLines"]:
+            line = [self.env.now + remaining, recieptIndex, cycles, None]
+            self.activeLines.append(line)
+            restore.add(key, self._scheduleFinish, line, remaining)
+        self.blockedLines = [list(outputs) for outputs in state["blockedLines"]]
+        self.nextReciept = state["nextReciept"]
+        self.restoreCounters(state)
+
+    def restoreCounters(self, state):
+        self.cyclesCount = list(state["cyclesCount"])
+        self.busyTime = state["busyTime"]
+        self.blockedTime = state["blockedTime"]
+        self.starvedTime = state["starvedTime"]
+        self.startTime = state["startTime"]
+        self.accountedTime = self.env.now
+
     def getStatus(self):
+        self.syncStreams()
+        self._account()
+        lineTime = self.lines * (self.env.now - self.startTime)
         return {
             "type": "Node",
-            "nodeType": "fabric"
-        }
\ No newline at end of file
+            "nodeType": "fabric",
+            "lines": self.lines,
+            "busyLines": len(self.activeLines),
+            "blockedLines": len(self.blockedLines),
+            "cycles": sum(self.cyclesCount),
+            "utilization": self.busyTime / lineTime if lineTime > 0 else 0.0,
+            "starvedTime": self.starvedTime,
+            "blockedTime": self.blockedTime,
+            "starvedFraction": self.starvedTime / lineTime if lineTime > 0 else 0.0,
+            "blockedFraction": self.blockedTime / lineTime if lineTime > 0 else 0.0,
+            "recipes": {
+                reciept.name if reciept.name is not None else str(index): count
+                for index, (reciept, count) in enumerate(zip(self.reciepts, self.cyclesCount))
+            }
+        }
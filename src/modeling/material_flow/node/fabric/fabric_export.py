@@ -1,4 +1,6 @@
 class FabricExport:
+    __slots__ = ("name", "exportPerReciept", "capacity")
+
     def __init__(self, name, exportPerReciept, capacity):
         self.name = name 
         self.exportPerReciept = exportPerReciept
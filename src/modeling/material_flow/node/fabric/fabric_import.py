@@ -1,4 +1,6 @@
 class FabricImport:
+    __slots__ = ("name", "minForReciept", "capacity")
+
     def __init__(self, resourceType, minForReciept, capacity):
         self.name = resourceType 
         self.minForReciept = minForReciept
@@ -1,5 +1,10 @@
 class FabricReciept:
-    def __init__(self, fabricImports, fabricExports, durationPerReciept):
-        self.fabricImports = fabricImports
-        self.fabricExports = fabricExports
-        self.durationPerReciept = durationPerReciept
\ No newline at end of file
+    __slots__ = ("inputs", "outputs", "durationPerReciept", "name", "priority")
+
+    def __init__(self, inputs, outputs, durationPerReciept, name=None, priority=0):
+        # расход и выход за один цикл - по порядку входов/выходов фабрики
+        self.inputs = inputs
+        self.outputs = outputs
+        self.durationPerReciept = durationPerReciept
+        self.name = name
+        self.priority = priority
@@ -0,0 +1,69 @@
+class FabricStore:
+    """Внутреннее хранилище входа/выхода фабрики: уровень - число, запросы транспорта
+    ждут в очередях как у simpy.Container (FIFO, первый в очереди задерживает остальных).
+    Линии фабрики берут и кладут ресурсы напрямую, без событий"""
+
+    __slots__ = ("env", "name", "capacity", "level", "putQueue", "getQueue", "onChange", "streams")
+
+    def __init__(self, env, name, capacity, level=0, onChange=None):
+        self.env = env
+        self.name = name
+        self.capacity = capacity
+        self.level = level
+        # очереди короткие (транспорт у одного входа/выхода) - списки легче deque
+        self.putQueue = []
+        self.getQueue = []
+        # вызывается после каждого изменения уровня
+        self.onChange = onChange
+        # fluid-телепорты, которые кладут/забирают лениво (Teleport.syncStream)
+        self.streams = []
+
+    def put(self, amount):
+        event = self.env.event()
+        self.putQueue.append((event, amount))
+        self._serve()
+        return event
+
+    def get(self, amount):
+        event = self.env.event()
+        self.getQueue.append((event, amount))
+        self._serve()
+        return event
+
+    def tryPut(self, amount):
+        """Положить без события, если есть место и нет очереди"""
+        if self.putQueue or self.level + amount > self.capacity:
+            return False
+        self.add(amount)
+        return True
+
+    def tryGet(self, amount):
+        if self.getQueue or self.level < amount:
+            return False
+        self.take(amount)
+        return True
+
+    def add(self, amount):
+        self.level = self.level + amount
+        self._serve()
+
+    def take(self, amount):
+        self.level = self.level - amount
+        self._serve()
+
+    def _serve(self):
+        served = True
+        while served:
+            served = False
+            while self.putQueue and self.level + self.putQueue[0][1] <= self.capacity:
+                event, amount = self.putQueue.pop(0)
+                self.level = self.level + amount
+                event.succeed()
+                served = True
+            while self.getQueue and self.getQueue[0][1] <= self.level:
+                event, amount = self.getQueue.pop(0)
+                self.level = self.level - amount
+                event.succeed()
+                served = True
+        if self.onChange is not None:
+            self.onChange()
@@ -1,9 +1,14 @@
+import math
 import simpy
 from modeling.material_flow.node.export_endpoint import ExportEndpoint
+from modeling.profiling.kernel_profiler import startProcess
 
 class ResourceGenerator:
+    __slots__ = ("env", "resourceGuid", "bufferSize", "accumulatedResources", "frame", "cooldown", "fluid",
+                 "container", "fluidLevel", "nextPutTime", "blocked", "getQueue", "wakeupTime", "wakeups", "streams", "generatedCount",
+                 "sentCount", "phase", "pendingEvent", "phaseEnd", "profiler", "profileKey")
 
-    def __init__(self, env, resourceGuid, generatePerMinute, frame, bufferSize):
+    def __init__(self, env, resourceGuid, generatePerMinute, frame, bufferSize, fluid=False):
         self.generatedCount = 0
         self.sentCount = 0
         self.resourceGuid = resourceGuid
@@ -12,33 +17,279 @@ class ResourceGenerator:
         self.env = env
         self.frame = generatePerMinute / frame
         self.cooldown = frame / generatePerMinute
+        # fluid - выработка считается аналитически, события только на границах (ожидание получателя)
+        self.fluid = fluid
+        if fluid:
+            self.container = None
+            self.fluidLevel = 0
+            self.nextPutTime = None
+            self.blocked = False
+            self.getQueue = []
+            self.wakeupTime = None
+            # запланированные пробуждения: (момент, таймаут)
+            self.wakeups = []
+        else:
+            self.container = simpy.Container(self.env, self.bufferSize, 0)
+        # fluid-телепорты, которые забирают выработку лениво (Teleport.syncStream)
+        self.streams = []
+        # фаза дискретного цикла (PUT/COOLDOWN) - для контрольных точек
+        self.phase = None
+        self.pendingEvent = None
+        self.phaseEnd = None
 
     def activate(self):
-        self.env.process(self.runLifeCycle())
+        if self.fluid:
+            self.nextPutTime = self.env.now
+            return
+        startProcess(self, self.runLifeCycle())
 
     def runLifeCycle(self):
-        self.container = simpy.Container(self.env, self.bufferSize, 0)
         while True:
             self.generatedCount = self.generatedCount + self.frame
-            yield self.container.put(self.frame)
-            yield self.env.timeout(self.cooldown)
+            self.phase = "PUT"
+            self.pendingEvent = self.container.put(self.frame)
+            yield self.pendingEvent
+            self.phase = "COOLDOWN"
+            self.phaseEnd = self.env.now + self.cooldown
+            self.pendingEvent = self.env.timeout(self.cooldown)
+            yield self.pendingEvent
+
+    def resumeLifeCycle(self, phase):
+        """Доигрывает прерванный контрольной точкой цикл и продолжает обычный.
+        Событие фазы уже создано восстановлением (_resumePhase)"""
+        if phase is None:
+            # контрольная точка сделана до старта процесса
+            yield from self.runLifeCycle()
+        yield self.pendingEvent
+        if phase == "PUT":
+            self.phase = "COOLDOWN"
+            self.phaseEnd = self.env.now + self.cooldown
+            self.pendingEvent = self.env.timeout(self.cooldown)
+            yield self.pendingEvent
+        yield from self.runLifeCycle()
+
+    def _resumePhase(self, phase, remaining):
+        if phase == "PUT":
+            self.pendingEvent = self.container.put(self.frame)
+        else:
+            self.phaseEnd = self.env.now + remaining
+            self.pendingEvent = self.env.timeout(remaining)
+
+    def getRequestQueues(self):
+        """Ожидающие запросы по очередям - для их порядка в контрольной точке"""
+        if self.fluid:
+            return [[event for event, _ in self.getQueue]]
+        return [self.container.get_queue, self.container.put_queue]
+
+    def getState(self, order):
+        if self.fluid:
+            self.syncStreams()
+            self._advance(self.env.now)
+        state = {
+            "generatedCount": self.generatedCount,
+            "sentCount": self.sentCount
+        }
+        if self.fluid:
+            state.update({
+                "fluidLevel": self.fluidLevel,
+                "nextPutTime": self.nextPutTime,
+                "blocked": self.blocked,
+                "wakeupTime": self.wakeupTime,
+                "wakeups": [[wakeupTime, order.getKey(timeout)] for wakeupTime, timeout in self.wakeups]
+            })
+            return state
+        phase = self.phase
+        remaining = None
+        key = order.getKey(self.pendingEvent)
+        if phase == "COOLDOWN":
+            remaining = self.phaseEnd - self.env.now
+        elif self.pendingEvent is not None and self.pendingEvent.triggered:
+            # порция уже в хранилище, процесс еще не возобновлен
+            phase, remaining, key = "COOLDOWN", self.cooldown, None
+        state.update({
+            "level": self.container.level,
+            "phase": phase,
+            "remaining": remaining,
+            "order": key
+        })
+        return state
+
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки вместо activate()"""
+        if self.fluid != ("fluidLevel" in state):
+            raise ValueError("Source fluid mode cannot change on restore")
+        level = state["fluidLevel"] if self.fluid else state["level"]
+        if level > self.bufferSize:
+            raise ValueError(f"Storage capacity {self.bufferSize} is below checkpoint level {level}")
+        self.generatedCount = state["generatedCount"]
+        self.sentCount = state["sentCount"]
+        if self.fluid:
+            self.fluidLevel = level
+            self.nextPutTime = state["nextPutTime"]
+            self.blocked = state["blocked"]
+            self.wakeupTime = state["wakeupTime"]
+            for wakeupTime, key in state["wakeups"]:
+                restore.add(key, self._addWakeup, wakeupTime)
+            return
+        self.container = simpy.Container(self.env, self.bufferSize, level)
+        self.phase = state["phase"]
+        if self.phase is not None:
+            restore.add(state["order"], self._resumePhase, self.phase, state["remaining"])
+        startProcess(self, self.resumeLifeCycle(self.phase))
+
+    def restoreCounters(self, state):
+        """Счетчики после повторной подачи запросов транспорта при восстановлении"""
+        self.generatedCount = state["generatedCount"]
+        self.sentCount = state["sentCount"]
 
     def getImportNodes(self):
         return []
     
     def getExportNodes(self):
-        return [ExportEndpoint(self.resourceGuid)]
+        return [ExportEndpoint.get(self.resourceGuid)]
     
     def getResources(self, exportIndex, resourcesCount):
         self.sentCount = self.sentCount + resourcesCount
-        return self.container.get(resourcesCount)
+        if not self.fluid:
+            return self.container.get(resourcesCount)
+        self.syncStreams()
+        event = self.env.event()
+        self.getQueue.append((event, resourcesCount))
+        self._serve(self.env.now)
+        self._planStreams()
+        return event
+
+    def tryGetResources(self, exportIndex, resourcesCount):
+        """Забрать ресурсы без события, если они уже есть и нет очереди (только fluid)"""
+        if not self.fluid:
+            return False
+        self.syncStreams()
+        self._advance(self.env.now)
+        if self.getQueue or self.fluidLevel < resourcesCount:
+            return False
+        self.sentCount = self.sentCount + resourcesCount
+        self._take(resourcesCount, self.env.now)
+        return True
+
+    def attachExportStream(self, exportIndex, stream):
+        self.streams.append(stream)
+
+    def getStreamTakes(self, exportIndex, resourcesCount):
+        """Сколько порций подряд телепорт заберет без событий: выработка считается аналитически,
+        пока он единственный ленивый получатель и никто не ждет в очереди"""
+        if not self.fluid or len(self.streams) != 1 or self.getQueue:
+            return 0
+        return math.inf
+
+    def getStreamTakeTime(self, exportIndex, resourcesCount, readyTime):
+        """Когда после readyTime наберется resourcesCount (без изменения состояния), None - никогда"""
+        level, nextPutTime, blocked = self.fluidLevel, self.nextPutTime, self.blocked
+        while not blocked and nextPutTime <= readyTime:
+            if level + self.frame <= self.bufferSize:
+                level = level + self.frame
+                nextPutTime = nextPutTime + self.cooldown
+            else:
+                blocked = True
+        if level >= resourcesCount:
+            return readyTime
+        while not blocked:
+            if level + self.frame > self.bufferSize:
+                return None
+            level = level + self.frame
+            if level >= resourcesCount:
+                return nextPutTime
+            nextPutTime = nextPutTime + self.cooldown
+        return None
+
+    def streamTake(self, exportIndex, resourcesCount, takeTime):
+        self._advance(takeTime)
+        self.sentCount = self.sentCount + resourcesCount
+        self._take(resourcesCount, takeTime)
+
+    def syncStreams(self):
+        for stream in self.streams:
+            stream.syncStream()
+
+    def _planStreams(self):
+        for stream in self.streams:
+            stream.planStream()
+
+    def _advance(self, now):
+        """Досчитывает выработку до момента now так же, как это делал бы runLifeCycle"""
+        while not self.blocked and self.nextPutTime <= now:
+            self.generatedCount = self.generatedCount + self.frame
+            if self.fluidLevel + self.frame <= self.bufferSize:
+                self.fluidLevel = self.fluidLevel + self.frame
+                self.nextPutTime = self.nextPutTime + self.cooldown
+            else:
+                # хранилище полно - порция ждет места, как заблокированный put
+                self.blocked = True
+
+    def _take(self, resourcesCount, now):
+        self.fluidLevel = self.fluidLevel - resourcesCount
+        if self.blocked and self.fluidLevel + self.frame <= self.bufferSize:
+            self.fluidLevel = self.fluidLevel + self.frame
+            self.blocked = False
+            self.nextPutTime = now + self.cooldown
+
+    def _serve(self, now):
+        self._advance(now)
+        while self.getQueue and self.getQueue[0][1] <= self.fluidLevel:
+            event, resourcesCount = self.getQueue.pop(0)
+            self._take(resourcesCount, now)
+            event.succeed()
+        if self.getQueue:
+            self._scheduleWakeup(self.getQueue[0][1])
+
+    def _scheduleWakeup(self, resourcesCount):
+        """Одно событие на момент, когда накопится нужное первому в очереди"""
+        if self.blocked:
+            return
+        wakeupTime = self.nextPutTime
+        level = self.fluidLevel
+        while True:
+            if level + self.frame > self.bufferSize:
+                # столько в хранилище не поместится никогда - ждем, как и simpy.Container
+                return
+            level = level + self.frame
+            if level >= resourcesCount:
+                break
+            wakeupTime = wakeupTime + self.cooldown
+        if self.wakeupTime is not None and self.wakeupTime <= wakeupTime:
+            return
+        self.wakeupTime = wakeupTime
+        self._addWakeup(wakeupTime)
+
+    def _addWakeup(self, wakeupTime):
+        timeout = self.env.timeout(max(0, wakeupTime - self.env.now))
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "timeout")
+        self.wakeups.append((wakeupTime, timeout))
+        timeout.callbacks.append(lambda event: self._onWakeup(event, wakeupTime))
+
+    def _onWakeup(self, event, wakeupTime):
+        self.wakeups.remove((wakeupTime, event))
+        if self.wakeupTime == wakeupTime:
+            self.wakeupTime = None
+        self.syncStreams()
+        # max - защита от погрешности now + (t - now) != t
+        self._serve(max(self.env.now, wakeupTime))
+        self._planStreams()
+
+    def getCurrentCount(self):
+        if not self.fluid:
+            return self.container.level
+        return self.fluidLevel
     
     def getStatus(self):
+        if self.fluid:
+            self.syncStreams()
+            self._advance(self.env.now)
         return {
             "type": "Node",
             "nodeType": "resourceGenerator",
             "resource": self.resourceGuid,
-            "generatedCount": self.processedCount,
+            "generatedCount": self.generatedCount,
             "sentCount": self.sentCount,
-            "currentCount": self.container.level
-        }
\ No newline at end of file
+            "currentCount": self.getCurrentCount()
+        }
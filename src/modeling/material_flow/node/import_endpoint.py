@@ -1,3 +1,15 @@
 class ImportEndpoint:
+    """Точка стыковки транспорта с узлом. Неизменяема, поэтому одна на тип ресурса"""
+    __slots__ = ("resourceGuid",)
+
+    shared = dict()
+
     def __init__(self, resourceGuid):
-        self.resourceGuid = resourceGuid
\ No newline at end of file
+        self.resourceGuid = resourceGuid
+
+    @staticmethod
+    def get(resourceGuid):
+        endpoint = ImportEndpoint.shared.get(resourceGuid)
+        if endpoint is None:
+            endpoint = ImportEndpoint.shared.setdefault(resourceGuid, ImportEndpoint(resourceGuid))
+        return endpoint
@@ -1,26 +1,65 @@
-import simpy
+import math
 from modeling.material_flow.node.import_endpoint import ImportEndpoint
 
 class Sink:
+    __slots__ = ("env", "resourceType", "processedCount", "streams", "profiler", "profileKey")
 
     def __init__(self, env, resourceType):
         self.env = env
         self.resourceType = resourceType
         self.processedCount = 0
+        # fluid-телепорты, чьи поставки досчитываются лениво (Teleport.syncStream)
+        self.streams = []
     
     def putResources(self, inputIndex, resourcesCount):
         self.processedCount = self.processedCount + resourcesCount
         event = self.env.event()
         event.succeed()
         return event
+
+    def tryPutResources(self, inputIndex, resourcesCount):
+        """Сток принимает всегда - прием без события"""
+        self.processedCount = self.processedCount + resourcesCount
+        return True
+
+    def attachImportStream(self, inputIndex, stream):
+        self.streams.append(stream)
+
+    def getStreamPuts(self, inputIndex, resourcesCount):
+        """Сток принимает без побочных эффектов сколько угодно поставок"""
+        return math.inf
+
+    def streamPut(self, inputIndex, resourcesCount, putTime):
+        self.processedCount = self.processedCount + resourcesCount
+
+    def syncStreams(self):
+        for stream in self.streams:
+            stream.syncStream()
+
+    def getProcessedCount(self):
+        self.syncStreams()
+        return self.processedCount
+    
+    def getState(self, order):
+        self.syncStreams()
+        return {
+            "processedCount": self.processedCount
+        }
+
+    def restoreState(self, state, restore):
+        self.processedCount = state["processedCount"]
+
+    def restoreCounters(self, state):
+        self.processedCount = state["processedCount"]
     
     def getImportNodes(self):
-        return [ImportEndpoint(self.resourceType)]
+        return [ImportEndpoint.get(self.resourceType)]
     
     def getExportNodes(self):
         return []
     
     def getStatus(self):
+        self.syncStreams()
         return {
             "type": "Node",
             "nodeType": "sync",
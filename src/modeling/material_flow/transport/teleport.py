@@ -1,5 +1,20 @@
+import math
+
+from modeling.profiling.kernel_profiler import getEventType, startProcess
+
+PHASE_GET = "GET"
+PHASE_MOVE = "MOVE"
+PHASE_PUT = "PUT"
+
+# на сколько рейсов вперед ищется операция, которую нельзя провести лениво
+STREAM_LOOKAHEAD = 64
+
 class Teleport:
-    def __init__(self, env, transportPerMinute, frame, source, sourceIndex, destination, destinationIndex):
+    __slots__ = ("env", "delay", "source", "sourceIndex", "destination", "destinationIndex", "frame", "fluid",
+                 "tryGet", "tryPut", "phase", "pendingEvent", "phaseEnd", "readyTime", "acting", "wakeupTime",
+                 "wakeups", "profiler", "profileKey")
+
+    def __init__(self, env, transportPerMinute, frame, source, sourceIndex, destination, destinationIndex, fluid=False):
         self.env = env
         self.delay = 1 / transportPerMinute * frame
         self.source = source
@@ -7,19 +22,320 @@ class Teleport:
         self.destination = destination
         self.destinationIndex = destinationIndex
         self.frame = frame
+        # fluid - поток без процесса: рейсы, которые источник и приемник обслуживают без побочных
+        # эффектов, досчитываются лениво (узлы вызывают syncStream перед любым обращением к себе),
+        # события - только на границах: источник пуст, приемник полон или его ждут другие
+        self.fluid = fluid
+        self.tryGet = getattr(source, "tryGetResources", None) if fluid else None
+        self.tryPut = getattr(destination, "tryPutResources", None) if fluid else None
+
+        # фаза цикла и ожидаемое событие - для контрольных точек
+        self.phase = None
+        self.pendingEvent = None
+        self.phaseEnd = None
+        if fluid:
+            # момент, с которого поток готов забрать следующий кадр (фаза GET)
+            self.readyTime = None
+            self.acting = False
+            self.wakeupTime = None
+            # запланированные пробуждения: (момент, таймаут)
+            self.wakeups = []
+            for node, attach, index in ((source, "attachExportStream", sourceIndex),
+                                        (destination, "attachImportStream", destinationIndex)):
+                attach = getattr(node, attach, None)
+                if attach is not None:
+                    attach(index, self)
 
     def activate(self):
-        self.env.process(self.runLifeCycle())
+        if self.fluid:
+            self.phase = PHASE_GET
+            self.readyTime = self.env.now
+            self._act(self.env.now)
+            return
+        startProcess(self, self.runLifeCycle())
 
     def runLifeCycle(self):
+        return self.runDiscreteLifeCycle()
+
+    def runDiscreteLifeCycle(self):
+        while True:
+            self.phase = PHASE_GET
+            self.pendingEvent = self.source.getResources(self.sourceIndex, self.frame)
+            yield self.pendingEvent
+            yield from self._move(self.delay)
+            self.phase = PHASE_PUT
+            self.pendingEvent = self.destination.putResources(self.destinationIndex, self.frame)
+            yield self.pendingEvent
+
+    def _move(self, delay):
+        self.phase = PHASE_MOVE
+        self.phaseEnd = self.env.now + delay
+        self.pendingEvent = self.env.timeout(delay)
+        yield self.pendingEvent
+
+    def _put(self):
+        self.phase = PHASE_PUT
+        self.pendingEvent = self.destination.putResources(self.destinationIndex, self.frame)
+        yield self.pendingEvent
+
+    def _getStreamTakes(self):
+        getStreamTakes = getattr(self.source, "getStreamTakes", None)
+        return 0 if getStreamTakes is None else getStreamTakes(self.sourceIndex, self.frame)
+
+    def _getStreamPuts(self):
+        getStreamPuts = getattr(self.destination, "getStreamPuts", None)
+        return 0 if getStreamPuts is None else getStreamPuts(self.destinationIndex, self.frame)
+
+    def syncStream(self):
+        """Досчитывает лениво рейсы до текущего момента (вызывают узлы перед обращением к себе)"""
+        if self.acting or self.pendingEvent is not None or self.phase is None:
+            return
+        self._catchUp(self.env.now)
+
+    def _catchUp(self, now):
+        """Рейсы до now без событий, пока источник и приемник обслуживают их без побочных эффектов.
+        Время забора и поставки - как у процесса: от момента забора + delay"""
+        takes = puts = None
         while True:
-            yield self.source.getResources(self.sourceIndex, self.frame)
-            yield self.env.timeout(self.delay)
-            yield self.destination.putResources(self.destinationIndex, self.frame)
+            if self.phase == PHASE_MOVE:
+                if self.phaseEnd > now:
+                    return
+                if puts is None:
+                    puts = self._getStreamPuts()
+                if puts == 0:
+                    return
+                puts = puts - 1
+                self.destination.streamPut(self.destinationIndex, self.frame, self.phaseEnd)
+                self.phase = PHASE_GET
+                self.readyTime = self.phaseEnd
+            elif self.phase == PHASE_GET:
+                if self.readyTime > now:
+                    return
+                if takes is None:
+                    takes = self._getStreamTakes()
+                if takes == 0:
+                    return
+                takeTime = self.source.getStreamTakeTime(self.sourceIndex, self.frame, self.readyTime)
+                if takeTime is None or takeTime > now:
+                    return
+                takes = takes - 1
+                self.source.streamTake(self.sourceIndex, self.frame, takeTime)
+                self.phase = PHASE_MOVE
+                self.phaseEnd = takeTime + self.delay
+            else:
+                return
+
+    def _act(self, now):
+        """Операции, которые нельзя провести лениво, - в свой момент: синхронно, если узел
+        обслуживает сразу (tryGet/tryPut), иначе запросом с ожиданием события"""
+        self.acting = True
+        try:
+            while self.pendingEvent is None:
+                self._catchUp(now)
+                if self.phase == PHASE_GET and self.readyTime <= now and not self._isTakeLater(now):
+                    if self.tryGet is not None and self.tryGet(self.sourceIndex, self.frame):
+                        self.phase = PHASE_MOVE
+                        self.phaseEnd = now + self.delay
+                        continue
+                    self._request(self.source.getResources(self.sourceIndex, self.frame), self._onGet)
+                elif self.phase == PHASE_MOVE and self.phaseEnd <= now:
+                    if self.tryPut is not None and self.tryPut(self.destinationIndex, self.frame):
+                        self.phase = PHASE_GET
+                        self.readyTime = now
+                        continue
+                    self.phase = PHASE_PUT
+                    self._request(self.destination.putResources(self.destinationIndex, self.frame), self._onPut)
+                else:
+                    break
+        finally:
+            self.acting = False
+        self.planStream()
+
+    def _isTakeLater(self, now):
+        """Кадр у источника наберется позже now и будет забран лениво (генератор)"""
+        if self._getStreamTakes() == 0:
+            return False
+        takeTime = self.source.getStreamTakeTime(self.sourceIndex, self.frame, self.readyTime)
+        return takeTime is not None and takeTime > now
+
+    def _request(self, event, callback):
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, getEventType(event))
+        self.pendingEvent = event
+        event.callbacks.append(callback)
+
+    def _onGet(self, event):
+        self.pendingEvent = None
+        self.phase = PHASE_MOVE
+        self.phaseEnd = self.env.now + self.delay
+        self._act(self.env.now)
+
+    def _onPut(self, event):
+        self.pendingEvent = None
+        self.phase = PHASE_GET
+        self.readyTime = self.env.now
+        self._act(self.env.now)
+
+    def planStream(self):
+        """Пробуждение к первой операции, которую нельзя провести лениво.
+        Вызывается после изменений узлов - более раннее пробуждение уже стоящего не заменяет"""
+        if self.acting or self.pendingEvent is not None or self.phase is None:
+            return
+        wakeupTime = self._getWakeupTime()
+        if wakeupTime is None or (self.wakeupTime is not None and self.wakeupTime <= wakeupTime):
+            return
+        self.wakeupTime = wakeupTime
+        self._addWakeup(wakeupTime)
+
+    def _getWakeupTime(self):
+        """Прогон рейсов вперед без изменения состояния. None - пока узлы не изменятся, событий не нужно.
+        Время забора у генератора предсказуемо только на один рейс - дальше пересчет на поставке"""
+        takes = self._getStreamTakes()
+        puts = self._getStreamPuts()
+        readyTime = self.readyTime
+        if self.phase == PHASE_MOVE:
+            if puts == 0:
+                return self.phaseEnd
+            puts = puts - 1
+            readyTime = self.phaseEnd
+        for _ in range(STREAM_LOOKAHEAD):
+            if takes == 0:
+                return readyTime
+            takeTime = self.source.getStreamTakeTime(self.sourceIndex, self.frame, readyTime)
+            if takeTime is None:
+                # источник не наберет кадр никогда - запрос будет ждать, как у процесса
+                return readyTime
+            if takes == math.inf:
+                return None if puts == math.inf else takeTime + self.delay
+            if puts == 0:
+                return takeTime + self.delay
+            takes = takes - 1
+            puts = puts - 1
+            readyTime = takeTime + self.delay
+        return readyTime
+
+    def _addWakeup(self, wakeupTime):
+        timeout = self.env.timeout(max(0, wakeupTime - self.env.now))
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "timeout")
+        self.wakeups.append((wakeupTime, timeout))
+        timeout.callbacks.append(lambda event: self._onWakeup(event, wakeupTime))
+
+    def _onWakeup(self, event, wakeupTime):
+        self.wakeups.remove((wakeupTime, event))
+        if self.wakeupTime == wakeupTime:
+            self.wakeupTime = None
+        if self.pendingEvent is None:
+            # max - защита от погрешности now + (t - now) != t
+            self._act(max(self.env.now, wakeupTime))
+
+    def resumeLifeCycle(self, phase):
+        """Доигрывает прерванный контрольной точкой цикл и продолжает обычный.
+        Событие текущей фазы уже создано восстановлением (_resumePhase)"""
+        if phase is None:
+            # контрольная точка сделана до старта процесса
+            yield from self.runLifeCycle()
+        yield self.pendingEvent
+        if phase == PHASE_GET:
+            yield from self._move(self.delay)
+        if phase != PHASE_PUT:
+            yield from self._put()
+        yield from self.runLifeCycle()
+
+    def _resumePhase(self, phase, remaining):
+        """Незавершенный запрос к узлу подается заново, перемещение - с остатком времени"""
+        if phase == PHASE_GET:
+            self.pendingEvent = self.source.getResources(self.sourceIndex, self.frame)
+        elif phase == PHASE_PUT:
+            self.pendingEvent = self.destination.putResources(self.destinationIndex, self.frame)
+        else:
+            self.phaseEnd = self.env.now + remaining
+            self.pendingEvent = self.env.timeout(remaining)
+
+    def getState(self, order):
+        if self.fluid:
+            return self._getStreamState(order)
+        phase = self.phase
+        remaining = None
+        key = order.getKey(self.pendingEvent)
+        if phase == PHASE_MOVE:
+            remaining = self.phaseEnd - self.env.now
+        elif self.pendingEvent is not None and self.pendingEvent.triggered:
+            # запрос к узлу уже выполнен, процесс еще не возобновлен
+            phase = PHASE_MOVE if phase == PHASE_GET else PHASE_GET
+            remaining = self.delay if phase == PHASE_MOVE else None
+            key = None
+        return {
+            "phase": phase,
+            "remaining": remaining,
+            "order": key
+        }
+
+    def _getStreamState(self, order):
+        """Фаза потока, ожидаемый запрос к узлу и пробуждения. Выполненный, но еще не обработанный
+        запрос доигрывается при восстановлении на своем месте в очереди"""
+        self.syncStream()
+        pending = self.pendingEvent is not None
+        return {
+            "phase": self.phase,
+            "time": self.readyTime if self.phase == PHASE_GET else self.phaseEnd,
+            "pending": pending,
+            "completed": pending and self.pendingEvent.triggered,
+            "order": order.getKey(self.pendingEvent),
+            "wakeupTime": self.wakeupTime,
+            "wakeups": [[wakeupTime, order.getKey(timeout)] for wakeupTime, timeout in self.wakeups]
+        }
+
+    def _restoreStreamState(self, state, restore):
+        self.phase = state["phase"]
+        if self.phase is None:
+            # контрольная точка сделана до запуска потока
+            restore.add(None, self.activate)
+            return
+        if self.phase == PHASE_GET:
+            self.readyTime = state["time"]
+        else:
+            self.phaseEnd = state["time"]
+        self.wakeupTime = state["wakeupTime"]
+        for wakeupTime, key in state["wakeups"]:
+            restore.add(key, self._addWakeup, wakeupTime)
+        if state["pending"]:
+            # до повторной подачи запроса узлы не должны досчитывать и планировать поток
+            self.acting = True
+        if state["completed"]:
+            restore.add(state["order"], self._completeRequest, self.phase)
+        elif state["pending"]:
+            restore.add(state["order"], self._resumeRequest, self.phase)
+
+    def _resumeRequest(self, phase):
+        """Незавершенный запрос к узлу подается заново"""
+        try:
+            if phase == PHASE_GET:
+                self._request(self.source.getResources(self.sourceIndex, self.frame), self._onGet)
+            else:
+                self._request(self.destination.putResources(self.destinationIndex, self.frame), self._onPut)
+        finally:
+            self.acting = False
+
+    def _completeRequest(self, phase):
+        self.acting = False
+        if phase == PHASE_GET:
+            self._onGet(None)
+        else:
+            self._onPut(None)
 
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки: событие фазы создается заново в исходном порядке"""
+        if self.fluid:
+            self._restoreStreamState(state, restore)
+            return
+        self.phase = state["phase"]
+        if self.phase is not None:
+            restore.add(state["order"], self._resumePhase, self.phase, state["remaining"])
+        startProcess(self, self.resumeLifeCycle(self.phase))
     
     def getStatus(self):
         return {
             "type": "Transport",
             "nodeType": "teleport"
-        }
\ No newline at end of file
+        }
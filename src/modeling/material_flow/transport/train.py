@@ -1,10 +1,19 @@
 import random
 
+from modeling.profiling.kernel_profiler import startProcess
+
 class Train:
+    __slots__ = ("env", "minTravelTime", "maxTravelTime", "travelTime", "capacity", "source", "sourceIndex",
+                 "destination", "destinationIndex", "status", "started", "pendingEvent", "phaseEnd", "profiler",
+                 "profileKey")
 
-    def __init__(self, env, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex):
+    def __init__(self, env, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng=random):
         self.env = env
-        self.travelTime = random.uniform(minTravelTime, maxTravelTime)
+        self.minTravelTime = minTravelTime
+        self.maxTravelTime = maxTravelTime
+        # rng - поток случайных чисел модели (random.Random), по умолчанию глобальный.
+        # Нужен только здесь, поэтому в поезде не хранится
+        self.travelTime = rng.uniform(minTravelTime, maxTravelTime)
         self.capacity = capacity
         self.source = source
         self.sourceIndex = sourceIndex
@@ -12,24 +21,92 @@ class Train:
         self.destinationIndex = destinationIndex
 
         self.status = "GET_RESOURCES"
+        self.started = False
+        # текущее ожидаемое событие и конец перегона - для контрольных точек
+        self.pendingEvent = None
+        self.phaseEnd = None
     
     def activate(self):
-        self.env.process(self.runLifeCycle())
+        startProcess(self, self.runLifeCycle())
 
     def runLifeCycle(self):
+        self.started = True
         while True:
             self.status = "GET_RESOURCES"
-            yield self.source.getResources(self.sourceIndex, self.capacity)
-            self.status = "TO_DEST"
-            yield self.env.timeout(self.travelTime)
+            self.pendingEvent = self.source.getResources(self.sourceIndex, self.capacity)
+            yield self.pendingEvent
+            yield self._travel("TO_DEST", self.travelTime)
+            self.status = "PUT_RESOURCES"
+            self.pendingEvent = self.destination.putResources(self.destinationIndex, self.capacity)
+            yield self.pendingEvent
+            yield self._travel("TO_BASE", self.travelTime)
+
+    def _travel(self, status, delay):
+        self.status = status
+        self.phaseEnd = self.env.now + delay
+        self.pendingEvent = self.env.timeout(delay)
+        return self.pendingEvent
+
+    def resumeLifeCycle(self, status):
+        """Доигрывает прерванный контрольной точкой цикл и продолжает обычный.
+        Событие текущей фазы уже создано восстановлением (_resumePhase)"""
+        if status is None:
+            # контрольная точка сделана до старта процесса
+            yield from self.runLifeCycle()
+        yield self.pendingEvent
+        if status == "GET_RESOURCES":
+            yield self._travel("TO_DEST", self.travelTime)
+        if status in ("GET_RESOURCES", "TO_DEST"):
             self.status = "PUT_RESOURCES"
-            yield self.destination.putResources(self.destinationIndex, self.capacity)
-            self.status = "TO_BASE"
-            yield self.env.timeout(self.travelTime)
+            self.pendingEvent = self.destination.putResources(self.destinationIndex, self.capacity)
+            yield self.pendingEvent
+        if status != "TO_BASE":
+            yield self._travel("TO_BASE", self.travelTime)
+        yield from self.runLifeCycle()
+
+    def _resumePhase(self, status, remaining):
+        """Незавершенный запрос к узлу подается заново, перегон - с остатком времени"""
+        if status == "GET_RESOURCES":
+            self.pendingEvent = self.source.getResources(self.sourceIndex, self.capacity)
+        elif status == "PUT_RESOURCES":
+            self.pendingEvent = self.destination.putResources(self.destinationIndex, self.capacity)
+        else:
+            self._travel(status, remaining)
+
+    def getState(self, order):
+        status = self.status if self.started else None
+        remaining = None
+        key = order.getKey(self.pendingEvent)
+        if status in ("TO_DEST", "TO_BASE"):
+            remaining = self.phaseEnd - self.env.now
+        elif self.pendingEvent is not None and self.pendingEvent.triggered:
+            # погрузка/разгрузка уже состоялась, процесс еще не возобновлен
+            status = "TO_DEST" if status == "GET_RESOURCES" else "TO_BASE"
+            remaining, key = self.travelTime, None
+        return {
+            "status": status,
+            "remaining": remaining,
+            "order": key,
+            "travelTime": self.travelTime,
+            "minTravelTime": self.minTravelTime,
+            "maxTravelTime": self.maxTravelTime
+        }
+
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки: событие фазы создается заново в исходном порядке"""
+        # время в пути сохраняется, если форк не менял диапазон
+        if (state["minTravelTime"], state["maxTravelTime"]) == (self.minTravelTime, self.maxTravelTime):
+            self.travelTime = state["travelTime"]
+        status = state["status"]
+        self.status = status or "GET_RESOURCES"
+        self.started = status is not None
+        if status is not None:
+            restore.add(state["order"], self._resumePhase, status, state["remaining"])
+        startProcess(self, self.resumeLifeCycle(status))
     
     def getStatus(self):
         return {
             "type": "Transport",
             "nodeType": "train",
             "currentStatus": self.status
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,252 @@
+import random
+from array import array
+import heapq
+from collections import deque
+
+import simpy
+
+from modeling.profiling.kernel_profiler import startProcess
+
+STATUS_GET_RESOURCES = 0
+STATUS_TO_DEST = 1
+STATUS_PUT_RESOURCES = 2
+STATUS_TO_BASE = 3
+
+STATUS_NAMES = ("GET_RESOURCES", "TO_DEST", "PUT_RESOURCES", "TO_BASE")
+
+def getDockSlots(node, method, index):
+    """Одновременных операций у конца маршрута: доки буфера (getExportSlots/getImportSlots),
+    у узлов без доков - одна (их события и так обслуживаются по очереди без задержки)"""
+    getSlots = getattr(node, method, None)
+    return 1 if getSlots is None else getSlots(index)
+
+class TrainFleet:
+    """N одинаковых поездов на одном маршруте source -> destination.
+    Состояние поездов - в массивах, а не в объектах. Перегоны ведет один процесс флота
+    по своей куче прибытий, погрузка/разгрузка - колбэками событий узлов"""
+
+    __slots__ = ("env", "count", "minTravelTime", "maxTravelTime", "capacity", "source", "sourceIndex",
+                 "destination", "destinationIndex", "travelTimes", "statuses", "cargo", "phaseEnds", "tripsCount",
+                 "loadSlots", "unloadSlots", "loadQueue", "unloadQueue", "loading", "unloading", "arrivals",
+                 "sleepUntil", "sleepEvent", "process", "profiler", "profileKey")
+
+    def __init__(self, env, count, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng=random):
+        self.env = env
+        self.count = count
+        self.minTravelTime = minTravelTime
+        self.maxTravelTime = maxTravelTime
+        self.capacity = capacity
+        self.source = source
+        self.sourceIndex = sourceIndex
+        self.destination = destination
+        self.destinationIndex = destinationIndex
+
+        # время в пути у каждого поезда свое, как у отдельного Train; rng после этого не нужен
+        self.travelTimes = array('d', (rng.uniform(minTravelTime, maxTravelTime) for _ in range(count)))
+        self.statuses = array('b', [STATUS_GET_RESOURCES] * count)
+        self.cargo = array('d', [0]) * count
+        self.phaseEnds = array('d', [0]) * count
+        self.tripsCount = 0
+
+        # очереди поездов флота на погрузку/разгрузку: запросы к узлу есть только у первых
+        # по числу доков узла (как у отдельных Train), остальные ждут здесь без событий SimPy
+        self.loadSlots = getDockSlots(source, "getExportSlots", sourceIndex)
+        self.unloadSlots = getDockSlots(destination, "getImportSlots", destinationIndex)
+        self.loadQueue = deque()
+        self.unloadQueue = deque()
+        # поданные запросы: (поезд, событие узла) в порядке подачи
+        self.loading = []
+        self.unloading = []
+
+        # прибытия поездов (время, индекс) - в SimPy только одно ожидание ближайшего
+        self.arrivals = []
+        self.sleepUntil = None
+        # текущее ожидание процесса - для порядка событий в контрольной точке
+        self.sleepEvent = None
+        self.process = None
+
+    def activate(self):
+        for index in range(self.count):
+            self._load(index)
+        self.process = startProcess(self, self.runLifeCycle())
+
+    def runLifeCycle(self):
+        arrivals = self.arrivals
+        while True:
+            # после восстановления ожидание уже создано (_resumeSleep)
+            waitFor = self.sleepEvent
+            if waitFor is None:
+                if arrivals:
+                    self.sleepUntil = arrivals[0][0]
+                    waitFor = self.env.timeout(max(0, self.sleepUntil - self.env.now))
+                else:
+                    self.sleepUntil = None
+                    waitFor = self.env.event()
+                self.sleepEvent = waitFor
+            try:
+                yield waitFor
+            except simpy.Interrupt:
+                # появилось прибытие раньше, чем процесс собирался проснуться
+                self.sleepEvent = None
+                continue
+            self.sleepEvent = None
+            self.sleepUntil = None
+            now = self.env.now
+            while arrivals and arrivals[0][0] <= now:
+                _, index = heapq.heappop(arrivals)
+                if self.statuses[index] == STATUS_TO_DEST:
+                    self._unload(index)
+                else:
+                    self._load(index)
+
+    def _load(self, index):
+        self.statuses[index] = STATUS_GET_RESOURCES
+        self.loadQueue.append(index)
+        self._requestLoads()
+
+    def _requestLoads(self):
+        while self.loadQueue and len(self.loading) < self.loadSlots:
+            self._requestLoad(self.loadQueue.popleft())
+
+    def _requestLoad(self, index):
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "get")
+        event = self.source.getResources(self.sourceIndex, self.capacity)
+        self.loading.append((index, event))
+        event.callbacks.append(lambda event: self._onLoaded(index, event))
+
+    def _onLoaded(self, index, event):
+        self.loading.remove((index, event))
+        self._requestLoads()
+        self.cargo[index] = self.capacity
+        self._travel(index, STATUS_TO_DEST)
+
+    def _unload(self, index):
+        self.statuses[index] = STATUS_PUT_RESOURCES
+        self.unloadQueue.append(index)
+        self._requestUnloads()
+
+    def _requestUnloads(self):
+        while self.unloadQueue and len(self.unloading) < self.unloadSlots:
+            self._requestUnload(self.unloadQueue.popleft())
+
+    def _requestUnload(self, index):
+        if getattr(self, "profiler", None) is not None:
+            self.profiler.countEvent(self.profileKey, "put")
+        event = self.destination.putResources(self.destinationIndex, self.capacity)
+        self.unloading.append((index, event))
+        event.callbacks.append(lambda event: self._onUnloaded(index, event))
+
+    def _onUnloaded(self, index, event):
+        self.unloading.remove((index, event))
+        self._requestUnloads()
+        self.cargo[index] = 0
+        self.tripsCount = self.tripsCount + 1
+        self._travel(index, STATUS_TO_BASE)
+
+    def _travel(self, index, status):
+        self.statuses[index] = status
+        arrivalTime = self.env.now + self.travelTimes[index]
+        self.phaseEnds[index] = arrivalTime
+        heapq.heappush(self.arrivals, (arrivalTime, index))
+        if self.process is not None and self.process.target is not None:
+            if self.sleepUntil is None or arrivalTime < self.sleepUntil:
+                self.sleepUntil = arrivalTime
+                self.process.interrupt()
+
+    def getState(self, order):
+        statuses = list(self.statuses)
+        cargo = list(self.cargo)
+        phaseEnds = list(self.phaseEnds)
+        tripsCount = self.tripsCount
+        now = self.env.now
+        # поданные запросы - с местом в очереди узла. Если погрузка/разгрузка уже состоялась,
+        # а колбэк еще не вызван - поезд уже в пути
+        loading = []
+        for index, event in self.loading:
+            if event.triggered:
+                statuses[index], cargo[index], phaseEnds[index] = STATUS_TO_DEST, self.capacity, now + self.travelTimes[index]
+            else:
+                loading.append([index, order.getKey(event)])
+        unloading = []
+        for index, event in self.unloading:
+            if event.triggered:
+                statuses[index], cargo[index], phaseEnds[index] = STATUS_TO_BASE, 0, now + self.travelTimes[index]
+                tripsCount = tripsCount + 1
+            else:
+                unloading.append([index, order.getKey(event)])
+        return {
+            "count": self.count,
+            "minTravelTime": self.minTravelTime,
+            "maxTravelTime": self.maxTravelTime,
+            "travelTimes": list(self.travelTimes),
+            "statuses": statuses,
+            "cargo": cargo,
+            "remaining": [phaseEnd - now for phaseEnd in phaseEnds],
+            "loading": loading,
+            "unloading": unloading,
+            "loadQueue": list(self.loadQueue),
+            "unloadQueue": list(self.unloadQueue),
+            "sleepOrder": order.getKey(self.sleepEvent),
+            "tripsCount": tripsCount
+        }
+
+    def restoreState(self, state, restore):
+        """Восстановление из контрольной точки вместо activate(): поданные запросы к узлам
+        и ожидание ближайшего прибытия создаются заново в исходном порядке,
+        куча прибытий строится по концам перегонов"""
+        if state["count"] != self.count:
+            raise ValueError(f"Fleet size cannot change on restore: {state['count']} -> {self.count}")
+        if (state["minTravelTime"], state["maxTravelTime"]) == (self.minTravelTime, self.maxTravelTime):
+            self.travelTimes = array('d', state["travelTimes"])
+        self.statuses = array('b', state["statuses"])
+        self.cargo = array('d', state["cargo"])
+        now = self.env.now
+        self.phaseEnds = array('d', (now + remaining for remaining in state["remaining"]))
+        self.tripsCount = state["tripsCount"]
+        self.arrivals = [(self.phaseEnds[index], index) for index in range(self.count)
+                         if self.statuses[index] in (STATUS_TO_DEST, STATUS_TO_BASE)]
+        heapq.heapify(self.arrivals)
+        self.loadQueue = deque(state["loadQueue"])
+        self.unloadQueue = deque(state["unloadQueue"])
+        self.loading = []
+        self.unloading = []
+        for index, key in state["loading"]:
+            restore.add(key, self._requestLoad, index)
+        for index, key in state["unloading"]:
+            restore.add(key, self._requestUnload, index)
+        if self.arrivals and state["sleepOrder"] is not None:
+            restore.add(state["sleepOrder"], self._resumeSleep)
+        self.process = startProcess(self, self.runLifeCycle())
+
+    def _resumeSleep(self):
+        self.sleepUntil = self.arrivals[0][0]
+        self.sleepEvent = self.env.timeout(max(0, self.sleepUntil - self.env.now))
+
+    def getTrainStatus(self, index):
+        return {
+            "index": index,
+            "currentStatus": STATUS_NAMES[self.statuses[index]],
+            "cargo": self.cargo[index],
+            "travelTime": self.travelTimes[index]
+        }
+
+    def getStatus(self):
+        statusCounts = dict.fromkeys(STATUS_NAMES, 0)
+        for status in self.statuses:
+            statusCounts[STATUS_NAMES[status]] = statusCounts[STATUS_NAMES[status]] + 1
+        return {
+            "type": "Transport",
+            "nodeType": "fleet",
+            "count": self.count,
+            "tripsCount": self.tripsCount,
+            "cargoTotal": sum(self.cargo),
+            "statusCounts": statusCounts
+        }
+
+    def getDetailedStatus(self):
+        """Статус с поездами по отдельности - только для запроса одной сущности:
+        срезы, запись рядов и поток изменений берут сводный getStatus()"""
+        status = self.getStatus()
+        status["trains"] = [self.getTrainStatus(index) for index in range(self.count)]
+        return status
@@ -0,0 +1,136 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from modeling.loading.map_schema import validateMap, validateEntry
+
+# Поля, меняющие структуру модели - параметрами их менять нельзя
+STRUCTURE_FIELDS = ("id", "type", "from_id", "to_id")
+
+class ModelSpec:
+    """Разобранное и проверенное описание модели: разбирается один раз, дальше из него
+    дешево создаются экземпляры ModelingCore, в т.ч. с подменой параметров.
+    Записи - неизменяемые модели схемы, спецификация хешируется по отпечатку карты"""
+
+    # Уже разобранные карты по отпечатку JSON: повторный POST той же карты не проверяется заново
+    cache = OrderedDict()
+    cacheSize = 64
+    cacheLock = Lock()
+
+    def __init__(self, name, caption, nodes, transports, fluid=False, key=None):
+        self.name = name
+        self.caption = caption
+        # fluid по умолчанию для генераторов и телепортов карты
+        self.fluid = fluid
+        self.nodes = tuple(nodes)
+        self.transports = tuple(transports)
+        self.nodePositions = {node.id: position for position, node in enumerate(self.nodes)}
+        self.transportPositions = {transport.id: position for position, transport in enumerate(self.transports)}
+        self.key = key if key is not None else ModelSpec.getKey(self.toDescription())
+        # статический анализ потоков (analyzeFlow) - считается один раз на спецификацию
+        self.flowAnalysis = None
+
+    def __getstate__(self):
+        # в процессы-воркеры анализ не передается
+        state = dict(self.__dict__)
+        state["flowAnalysis"] = None
+        return state
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, ModelSpec) and self.key == other.key
+
+    @staticmethod
+    def getKey(modelDescription):
+        """Отпечаток карты без секции run (настройки прогона на модель не влияют)"""
+        description = {field: value for field, value in modelDescription.items() if field != "run"}
+        payload = json.dumps(description, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def parse(modelDescription):
+        if isinstance(modelDescription, ModelSpec):
+            return modelDescription
+        if not isinstance(modelDescription, dict):
+            raise ValueError("Model map must be an object")
+        key = ModelSpec.getKey(modelDescription)
+        with ModelSpec.cacheLock:
+            cached = ModelSpec.cache.get(key)
+            if cached is not None:
+                ModelSpec.cache.move_to_end(key)
+                return cached
+        fluid = modelDescription.get("fluid", False)
+        if not isinstance(fluid, bool):
+            raise ValueError("Model 'fluid' must be a boolean")
+        nodes, transports = validateMap(modelDescription)
+        modelSpec = ModelSpec(modelDescription.get("name"), modelDescription.get("caption"), nodes, transports, fluid, key)
+        with ModelSpec.cacheLock:
+            ModelSpec.cache[key] = modelSpec
+            while len(ModelSpec.cache) > ModelSpec.cacheSize:
+                ModelSpec.cache.popitem(last=False)
+        return modelSpec
+
+    def toDescription(self):
+        """Обратно в JSON карты (для сохранения вместе с контрольной точкой)"""
+        return {
+            "name": self.name,
+            "caption": self.caption,
+            "fluid": self.fluid,
+            "nodes": [node.model_dump() for node in self.nodes],
+            "transport": [transport.model_dump() for transport in self.transports]
+        }
+
+    def withParameters(self, parameters):
+        """Копия спецификации с подставленными параметрами.
+        Путь параметра повторяет JSON карты: nodes.<id>.capacity, transport.<id>.data.limit,
+        nodes.<id>.reciept.delay, nodes.<id>.recipes.0.delay. Заново проверяются только затронутые записи"""
+        if not parameters:
+            return self
+        nodes = list(self.nodes)
+        transports = list(self.transports)
+        for path, value in parameters.items():
+            section, entityId, fields = self._splitPath(path)
+            if section == "nodes":
+                entries, positions = nodes, self.nodePositions
+            else:
+                entries, positions = transports, self.transportPositions
+            position = positions[entityId]
+            description = self._replaceField(entries[position].model_dump(), fields, value, path)
+            entries[position] = validateEntry(section, position, description)
+        key = ModelSpec.getKey({"base": self.key, "parameters": parameters})
+        return ModelSpec(self.name, self.caption, nodes, transports, self.fluid, key)
+
+    def _splitPath(self, path):
+        parts = path.split(".")
+        if len(parts) < 3 or parts[0] not in ("nodes", "transport"):
+            raise ValueError(f"Parameter path must look like nodes.<id>.<field> or transport.<id>.<field>: {path}")
+        try:
+            entityId = int(parts[1])
+        except ValueError:
+            raise ValueError(f"Entity id must be an integer: {path}")
+        positions = self.nodePositions if parts[0] == "nodes" else self.transportPositions
+        if entityId not in positions:
+            raise ValueError(f"Unknown entity in parameter: {path}")
+        if parts[2] in STRUCTURE_FIELDS:
+            raise ValueError(f"Parameter cannot change model structure: {path}")
+        return parts[0], entityId, parts[2:]
+
+    def _replaceField(self, entry, fields, value, path):
+        field = fields[0]
+        if isinstance(entry, (list, tuple)):
+            # элемент списка по номеру: nodes.<id>.recipes.0.delay
+            if not field.isdigit() or int(field) >= len(entry):
+                raise ValueError(f"Unknown parameter: {path}")
+            entry, field = list(entry), int(field)
+        elif not isinstance(entry, dict) or field not in entry:
+            raise ValueError(f"Unknown parameter: {path}")
+        else:
+            entry = dict(entry)
+        if len(fields) == 1:
+            entry[field] = value
+        else:
+            entry[field] = self._replaceField(entry[field], fields[1:], value, path)
+        return entry
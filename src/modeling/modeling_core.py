@@ -1,35 +1,79 @@
 import simpy
+import random
 import time
 import datetime
-from threading import Thread
+from threading import Thread, Lock
 
 from modeling.material_flow.node.generator.resource_generator import ResourceGenerator
 from modeling.material_flow.transport.train import Train
-from modeling.material_flow.node.fabric.fabric import Fabric
-from modeling.material_flow.node.fabric.fabric_export import FabricExport
-from modeling.material_flow.node.fabric.fabric_import import FabricImport
-from modeling.material_flow.node.fabric.fabric_reciept import FabricReciept
+from modeling.material_flow.transport.train_fleet import TrainFleet
 from modeling.material_flow.transport.teleport import Teleport
-from modeling.material_flow.node.buffer.buffer import Buffer
-from modeling.material_flow.node.sink.sink import Sink
+from modeling.model_spec import ModelSpec
+from modeling.loading.entity_builders import NODE_BUILDERS, TRANSPORT_BUILDERS
+from modeling.profiling.kernel_profiler import KernelProfiler
+from modeling.checkpoint.checkpoint_file import CHECKPOINT_VERSION, writeCheckpoint
+from modeling.checkpoint.event_order import EventOrder
+from modeling.checkpoint.restore_order import RestoreOrder
+from modeling.loading.map_schema import validateRecording, validateStopConditions
+from modeling.statistics.stop_conditions import createSteadyStateMonitor, createStopCondition, getTimeLimit
+
+RUN_MODE_REALTIME = "realtime"
+RUN_MODE_FAST = "fast"
+RUN_MODE_BATCH = "batch"
+
+RUN_MODES = (RUN_MODE_REALTIME, RUN_MODE_FAST, RUN_MODE_BATCH)
+
+DEFAULT_RECORDING_INTERVAL = 1
+DEFAULT_RECORDING_MAX_BYTES = 4 * 1024 * 1024
+
+# оценка памяти модели без записи рядов (замер tracemalloc на синтетической карте):
+# сущность со своими объектами SimPy и событие в очереди планировщика
+ENTITY_BYTES = 1024
+EVENT_BYTES = 256
 
 class ModelingCore:
 
-    def getDefaultRudeMiner(self, resourceType, miningSpeed, miningFrame, capacity):
-        resourceGenerator = ResourceGenerator(self.env, resourceType, miningSpeed, miningFrame, capacity)
-        resourceGenerator.activate()
+    def getDefaultRudeMiner(self, resourceType, miningSpeed, miningFrame, capacity, fluid=False):
+        resourceGenerator = ResourceGenerator(self.env, resourceType, miningSpeed, miningFrame, capacity, fluid)
         return resourceGenerator
     
-    def getDefaultTeleport(self, source, sourceIndex, destination, destinationIndex, perMinute, frame):
-        teleport = Teleport(self.env, perMinute, frame, source, sourceIndex, destination, destinationIndex)
-        teleport.activate()
+    def getDefaultTeleport(self, source, sourceIndex, destination, destinationIndex, perMinute, frame, fluid=False):
+        teleport = Teleport(self.env, perMinute, frame, source, sourceIndex, destination, destinationIndex, fluid)
         return teleport
     
-    def getTrain(self, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex):
-        train = Train(self.env, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex)
-        train.activate()
+    def getTrain(self, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng):
+        train = Train(self.env, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng)
         return train
     
+    def getTrainFleet(self, count, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng):
+        fleet = TrainFleet(self.env, count, minTravelTime, maxTravelTime, capacity, source, sourceIndex, destination, destinationIndex, rng)
+        return fleet
+
+    def activateEntity(self, entityType, entityId, entity):
+        """Подключает профилировщик (если включен) и запускает процессы сущности.
+        При восстановлении из контрольной точки процессы запускает restoreCheckpoint"""
+        if self.profiler is not None:
+            entity.profiler = self.profiler
+            entity.profileKey = f"{entityType}.{entityId}"
+        if self.restoring:
+            return
+        activate = getattr(entity, "activate", None)
+        if activate is not None:
+            activate()
+
+    def getProfile(self):
+        if self.profiler is None:
+            raise ValueError("Profiling is disabled for this simulation")
+        with self.lock:
+            return self.profiler.getReport()
+
+    def getRandomStream(self, entityKey):
+        """Отдельный поток случайных чисел для стохастической сущности модели.
+        С заданным seed поток детерминирован и не зависит от порядка создания сущностей"""
+        if self.seed is None:
+            return random.Random()
+        return random.Random(f"{self.seed}/{entityKey}")
+
     def getSimuLength(self):
         return self.env.now
     
@@ -40,107 +84,270 @@ class ModelingCore:
     def getModelTime(self):
         return self.env.now
 
-    def __init__(self, modelDescription, name, caption):
+    def getAcceleration(self):
+        """Достигнутая скорость: модельного времени за секунду реального"""
+        if self.wallStartTime is None:
+            return 0
+        wallElapsed = (self.wallStopTime or time.perf_counter()) - self.wallStartTime
+        if wallElapsed <= 0:
+            return 0
+        return (self.env.now - self.modelStartTime) / wallElapsed
+
+    def getSummary(self):
+        """Сводка прогона: для файла результатов и headless-запуска"""
+        return {
+            "name": self.name,
+            "caption": self.caption,
+            "mode": self.runMode,
+            "status": self.getState(),
+            "modelTime": self.getModelTime(),
+            "duration": self.getDuration(),
+            "acceleration": self.getAcceleration(),
+            "stopReason": self.stopReason
+        }
+
+    def getState(self):
+        if self.running:
+            return "running"
+        if self.finished:
+            return "finished"
+        if self.wallStartTime is None:
+            return "created"
+        return "stopped"
+
+    def configureRun(self, mode=RUN_MODE_REALTIME, realtimeFactor=None, until=None):
+        """Настраивает режим прогона: realtime (с коэффициентом ускорения), fast или batch"""
+        if mode not in RUN_MODES:
+            raise ValueError(f"Unknown run mode: {mode}")
+        if mode == RUN_MODE_BATCH and until is None and not self.stopConditions:
+            raise ValueError("Batch run requires 'until' or a stop condition")
+        if realtimeFactor is not None and realtimeFactor <= 0:
+            raise ValueError("realtimeFactor must be positive")
+        self.runMode = mode
+        if realtimeFactor is not None:
+            self.realtimeFactor = realtimeFactor
+        self.untilTime = until
+
+    def addStopCondition(self, condition, reason="condition"):
+        """Добавляет условие остановки - callable(core) -> bool, проверяется между шагами.
+        reason - что записать в stopReason, когда условие сработало"""
+        self.stopConditions.append((condition, reason))
+
+    def enableSteadyState(self):
+        """Определение прогрева (MSER-5) и сходимости по записываемым рядам стоков и буферов"""
+        if self.steadyState is None:
+            self.steadyState = createSteadyStateMonitor(self)
+
+    def getSteadyState(self):
+        with self.lock:
+            return {
+                "modelTime": self.env.now,
+                "stopReason": self.stopReason,
+                "warmup": self.steadyState.getReport() if self.steadyState is not None else None
+            }
+
+    @staticmethod
+    def create(modelDescription, name, caption, runOptions):
+        """Создает модель и настраивает прогон по секции run из запроса.
+        runOptions.checkpoint - продолжить с контрольной точки (карта и seed берутся из нее),
+        runOptions.parameters - подмена параметров карты для форка,
+        runOptions.stop - условия остановки (время, итог стока, точность выработки),
+        runOptions.warmup - определять прогрев и без условия точности,
+        runOptions.recording - запись рядов: по умолчанию выключена, кроме прогрева"""
+        checkpoint = runOptions.get("checkpoint")
+        seed = runOptions.get("seed")
+        if checkpoint is not None:
+            modelDescription = ModelSpec.parse(checkpoint["model"])
+            seed = checkpoint["seed"]
+        parameters = runOptions.get("parameters")
+        if parameters:
+            modelDescription = ModelSpec.parse(modelDescription).withParameters(parameters)
+        stopConditions = validateStopConditions(runOptions.get("stop", []))
+        warmup = bool(runOptions.get("warmup")) or any(condition.type == "confidence" for condition in stopConditions)
+        recording = validateRecording(runOptions.get("recording"), warmup)
+        core = ModelingCore(modelDescription, name, caption, seed, runOptions.get("profile", False), checkpoint)
+        if recording is not None:
+            core.enableRecording(
+                DEFAULT_RECORDING_INTERVAL if recording.interval is None else recording.interval,
+                DEFAULT_RECORDING_MAX_BYTES if recording.maxBytes is None else recording.maxBytes)
+        if warmup:
+            core.enableSteadyState()
+        for condition in stopConditions:
+            if condition.type != "time":
+                core.addStopCondition(*createStopCondition(core, condition))
+        core.configureRun(
+            runOptions.get("mode", RUN_MODE_REALTIME),
+            runOptions.get("realtimeFactor"),
+            getTimeLimit(stopConditions, runOptions.get("until")))
+        return core
+
+    def __init__(self, modelDescription, name, caption, seed=None, profile=False, checkpoint=None):
+        """modelDescription - JSON карты или уже разобранный ModelSpec,
+        profile - счетчики событий и времени по сущностям (KernelProfiler),
+        checkpoint - состояние из getCheckpoint(), с которого продолжается модель"""
+        self.modelSpec = ModelSpec.parse(modelDescription)
         self.name = name
         self.caption = caption
+        self.seed = seed
         self.startTime = datetime.datetime.now()
 
         self.running = False
+        self.finished = False
+        self.thread = None
         self.SIMULATION_SPEED = 1
+        # шаг без задержек для fast/batch - условия остановки проверяются между шагами
+        self.FAST_SIMULATION_STEP = 100
 
-        self.env = simpy.Environment()
+        self.runMode = RUN_MODE_REALTIME
+        # модельных единиц за секунду реального времени (как simpy.rt factor, но обратный)
+        self.realtimeFactor = 100
+        self.untilTime = None
+        self.stopConditions = []
+        self.stopReason = None
+        self.steadyState = None
+        self.recorder = None
+        self.profiler = KernelProfiler() if profile else None
+        # шаг модели и чтение состояния не пересекаются - срезы согласованы по env.now
+        self.lock = Lock()
 
-        jsonNodes = modelDescription["nodes"]
+        self.wallStartTime = None
+        self.wallStopTime = None
+        self.modelStartTime = 0
 
-        nodes = []
+        self.restoring = checkpoint is not None
+        self.env = simpy.Environment(checkpoint["modelTime"] if self.restoring else 0)
 
         self.nodes = dict()
         self.transports = dict()
 
-        for node in jsonNodes:
-            entityId = node["id"]
-            nodeType = node["type"]
-            if nodeType == "source":
-                resourceType = node["resourceType"]
-                miningSpeed = node["miningSpeed"]
-                miningFrame = node["miningFrame"]
-                capacity = node["internalStorageCapacity"]
-                miner = self.getDefaultRudeMiner(resourceType, miningSpeed, miningFrame, capacity)
-                nodes.append(miner)
-                self.nodes[entityId] = miner
-            if nodeType == "simple_storage":
-                resourceType = node["resourceType"]
-                importLock = node["importLock"]
-                importLockDelay = node["importLockDelay"]
-                exportLock = node["exportLock"]
-                exportLockDelay = node["exportLockDelay"]
-                capacity = node["capacity"]
-                simpleStorage = Buffer(self.env, resourceType, capacity, importLock, exportLock, importLockDelay, exportLockDelay)
-                nodes.append(simpleStorage)
-                self.nodes[entityId] = simpleStorage
-            if nodeType == "fabric":
-                imports = []
-                exports = []
-                jsonImports = node["imports"]
-                for jsonImport in jsonImports:
-                    resourceType = jsonImport["resourceType"]
-                    minForReciept = jsonImport["minForReciept"]
-                    internalCapacity = jsonImport["internalCapacity"]
-                    newImport = FabricImport(resourceType, minForReciept, internalCapacity)
-                    imports.append(newImport)
-                jsonExports = node["exports"]
-                for jsonExport in jsonExports:
-                    resourceType = jsonExport["resourceType"]
-                    minForReciept = jsonExport["outPerReciept"]
-                    internalCapacity = jsonExport["internalCapacity"]
-                    newExport = FabricExport(resourceType, minForReciept, internalCapacity)
-                    exports.append(newExport)
-                recieptData = node["reciept"]
-                duration = recieptData["delay"]
-                fabricReciept = FabricReciept(imports, exports, duration)
-                fabric = Fabric(self.env, fabricReciept)
-                fabricIterator = fabric.getSimuIterator()
-                self.env.process(fabricIterator)
-                nodes.append(fabric)
-                self.nodes[entityId] = fabric
-            if nodeType == "sink":
-                resourceType = node["resourceType"]
-                sink = Sink(self.env, resourceType)
-                nodes.append(sink)
-                self.nodes[entityId] = sink
-
-        jsonTransport = modelDescription["transport"]
-
-        transports = []
-
-        for transport in jsonTransport:
-            entityId = transport["id"]
-            transportType = transport["type"]
-            if transportType == "teleport":
-                fromId = transport["from_id"]
-                from_endpoint = transport["from_endpoint"]
-                toId = transport["to_id"]
-                to_endpoint = transport["to_endpoint"]
-                perMinute = transport["data"]["perMinute"]
-                frame = transport["data"]["frame"]
-                teleport = self.getDefaultTeleport(nodes[fromId], from_endpoint, nodes[toId], to_endpoint, perMinute, frame)
-                transports.append(teleport)
-                self.transports[entityId] = teleport
-            if transportType == "train":
-                fromId = transport["from_id"]
-                from_endpoint = transport["from_endpoint"]
-                toId = transport["to_id"]
-                to_endpoint = transport["to_endpoint"]
-                limit = transport["data"]["limit"]
-                minDelay = transport["data"]["min_delay"]
-                maxDelay = transport["data"]["max_delay"]
-                train = self.getTrain(minDelay, maxDelay, limit, nodes[fromId], from_endpoint, nodes[toId], to_endpoint)
-                transports.append(train)
-                self.transports[entityId] = train
+        # записи уже проверены схемой, транспорт ссылается на узлы по id
+        for node in self.modelSpec.nodes:
+            entity = NODE_BUILDERS[node.type](self, node)
+            self.nodes[node.id] = entity
+            self.activateEntity("Node", node.id, entity)
+
+        for transport in self.modelSpec.transports:
+            entity = TRANSPORT_BUILDERS[transport.type](self, transport, self.nodes[transport.from_id], self.nodes[transport.to_id])
+            self.transports[transport.id] = entity
+            self.activateEntity("Transport", transport.id, entity)
+
+        if self.restoring:
+            self.restoreCheckpoint(checkpoint)
+            self.restoring = False
+
+    def getCheckpoint(self):
+        """Полное состояние модели на текущий env.now: уровни, счетчики, фазы процессов,
+        остатки таймаутов, порядок ожидаемых событий (EventOrder) и состояние генераторов
+        случайных чисел. Ряды рекордера не входят"""
+        with self.lock:
+            # ленивые потоки досчитываются до порядка событий - их итог не создает событий позже
+            for node in self.nodes.values():
+                syncStreams = getattr(node, "syncStreams", None)
+                if syncStreams is not None:
+                    syncStreams()
+            order = EventOrder(self.env, self.nodes.values())
+            return {
+                "version": CHECKPOINT_VERSION,
+                "modelTime": self.env.now,
+                "seed": self.seed,
+                "name": self.name,
+                "caption": self.caption,
+                "model": self.modelSpec.toDescription(),
+                "nodes": {str(entityId): node.getState(order) for entityId, node in self.nodes.items()},
+                "transports": {str(entityId): transport.getState(order) for entityId, transport in self.transports.items()}
+            }
+
+    def saveCheckpoint(self, path):
+        return writeCheckpoint(path, self.getCheckpoint())
+
+    def saveResults(self, path, compress=False):
+        """Сводка, итоговые счетчики и записанные ряды - в колоночный файл (ResultFile)"""
+        # numpy - только когда нужны файлы результатов или запись рядов (быстрый старт воркера)
+        from modeling.recording.result_file import ResultFile
+        return ResultFile.write(path, self, compress)
+
+    def restoreCheckpoint(self, checkpoint):
+        """Узлы восстанавливаются первыми, затем транспорт. События SimPy и запросы к узлам
+        сущности создают заново в исходном порядке (RestoreOrder), после чего счетчики узлов,
+        тронутые повторными запросами, возвращаются к значениям из контрольной точки"""
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+        nodeStates = self._getEntityStates(checkpoint, "nodes", self.nodes)
+        transportStates = self._getEntityStates(checkpoint, "transports", self.transports)
+        restore = RestoreOrder()
+        for entityId, node in self.nodes.items():
+            node.restoreState(nodeStates[entityId], restore)
+        for entityId, transport in self.transports.items():
+            transport.restoreState(transportStates[entityId], restore)
+        restore.run()
+        for entityId, node in self.nodes.items():
+            node.restoreCounters(nodeStates[entityId])
+
+    def _getEntityStates(self, checkpoint, section, entities):
+        states = checkpoint[section]
+        missing = [entityId for entityId in entities if str(entityId) not in states]
+        if missing or len(states) != len(entities):
+            raise ValueError(f"Checkpoint {section} do not match the model")
+        return {entityId: states[str(entityId)] for entityId in entities}
     
+    def enableRecording(self, interval, maxBytes):
+        """Включает запись рядов по всем узлам и транспорту с шагом interval модельного времени"""
+        from modeling.recording.time_series_recorder import TimeSeriesRecorder
+        self.recorder = TimeSeriesRecorder(self.env, interval, maxBytes)
+        for entityId, node in self.nodes.items():
+            self.recorder.addEntity("Node", entityId, node)
+        for entityId, transport in self.transports.items():
+            self.recorder.addEntity("Transport", entityId, transport)
+        self.recorder.activate()
+
+    def getMemoryUsage(self):
+        """Оценка занятой моделью памяти, байт: записанные ряды (с батчами прогрева), сущности и очередь событий"""
+        with self.lock:
+            if self.env is None:
+                return 0
+            entitiesCount = len(self.nodes) + len(self.transports)
+            eventsCount = len(self.env._queue)
+        recorded = self.recorder.getMemoryUsage() if self.recorder is not None else 0
+        steadyState = self.steadyState
+        if steadyState is not None:
+            recorded = recorded + steadyState.getMemoryUsage()
+        return recorded + entitiesCount * ENTITY_BYTES + eventsCount * EVENT_BYTES
+
+    def getSeries(self, fromTime=None, toTime=None, columns=None):
+        if self.recorder is None:
+            raise ValueError("Recording is disabled for this simulation")
+        with self.lock:
+            times, names, values = self.recorder.getWindow(fromTime, toTime, columns)
+        return {
+            "interval": self.recorder.interval,
+            "time": times,
+            "columns": names,
+            "values": values
+        }
+
+    def getSnapshot(self, fields=None):
+        """Состояние всех узлов и транспорта на один момент env.now.
+        fields - список полей статуса, которые нужно оставить (None - все)"""
+        with self.lock:
+            nodes = {entityId: node.getStatus() for entityId, node in self.nodes.items()}
+            transports = {entityId: transport.getStatus() for entityId, transport in self.transports.items()}
+            modelTime = self.env.now
+        if fields is not None:
+            nodes = {entityId: {field: status[field] for field in fields if field in status} for entityId, status in nodes.items()}
+            transports = {entityId: {field: status[field] for field in fields if field in status} for entityId, status in transports.items()}
+        return {
+            "time": modelTime,
+            "nodes": nodes,
+            "transports": transports
+        }
+
     def getEntityStatus(self, entityType, entityId):
         if entityType == "Transport":
-            return self.transports[entityId].getStatus()
+            transport = self.transports[entityId]
+            # у флота подробный статус с поездами, в срезах - только сводный
+            if isinstance(transport, TrainFleet):
+                return transport.getDetailedStatus()
+            return transport.getStatus()
         elif entityType == "Node":
             return self.nodes[entityId].getStatus()
     
@@ -154,16 +361,72 @@ class ModelingCore:
         self.thread.start()
         return True
 
+    def launch(self, background=False):
+        """Запускает модель согласно режиму: batch - синхронно, иначе в отдельном потоке.
+        background - batch тоже в отдельном потоке, вызывающий не ждет конца прогона"""
+        if self.runMode == RUN_MODE_BATCH:
+            self._checkBatchStop()
+            if not background:
+                return self.run_batch()
+        return self.start_simulation()
+
+    def run_batch(self):
+        """Синхронно прогоняет модель без задержек до until или условия остановки"""
+        if self.running:
+            return False
+        self._checkBatchStop()
+
+        self.running = True
+        self._simulation_loop()
+        return True
+
+    def _checkBatchStop(self):
+        if self.untilTime is None and not self.stopConditions:
+            raise ValueError("Batch run requires 'until' or a stop condition")
+
+    def _isStopReached(self):
+        if self.untilTime is not None and self.env.now >= self.untilTime:
+            self.stopReason = "until"
+            return True
+        for condition, reason in self.stopConditions:
+            if condition(self):
+                self.stopReason = reason
+                return True
+        return False
+
+    def _nextStepTime(self):
+        step = self.SIMULATION_SPEED if self.runMode == RUN_MODE_REALTIME else self.FAST_SIMULATION_STEP
+        nextTime = self.env.now + step
+        if self.untilTime is not None:
+            nextTime = min(nextTime, self.untilTime)
+        return nextTime
+
+    def _waitRealtime(self):
+        """Выравнивает модельное время по реальному с учетом realtimeFactor"""
+        targetWallTime = self.wallStartTime + (self.env.now - self.modelStartTime) / self.realtimeFactor
+        delay = targetWallTime - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
     def _simulation_loop(self):
         """Основной цикл симуляции"""
+        self.wallStartTime = time.perf_counter()
+        self.wallStopTime = None
+        self.modelStartTime = self.env.now
         while self.running:
             try:
-                self.env.run(until=self.env.now + self.SIMULATION_SPEED)
-                time.sleep(0.01)
+                if self._isStopReached():
+                    self.finished = True
+                    break
+                with self.lock:
+                    self.env.run(until=self._nextStepTime())
+                if self.runMode == RUN_MODE_REALTIME:
+                    self._waitRealtime()
             except Exception as e:
                 print(f"Simulation error: {e}")
                 break
         
+        self.wallStopTime = time.perf_counter()
         self.running = False
 
     def remove_simulation(self):
@@ -174,4 +437,4 @@ class ModelingCore:
             self.thread.join(timeout=1.0)
         
         self.thread = None
-        self.env = None
\ No newline at end of file
+        self.env = None
@@ -0,0 +1,59 @@
+from modeling.modeling_core import ModelingCore
+from modeling.partitioning.transfer_departure import TransferDeparture
+from modeling.partitioning.transfer_arrival import TransferArrival
+
+class PartitionModel:
+    """Один раздел карты: ModelingCore по подспецификации плюс половины разрезанного транспорта.
+    Шагает окнами до границы, выданной координатором, входящие сообщения становятся
+    событиями на их точное модельное время"""
+
+    def __init__(self, modelSpec, plan, partition, seed=None):
+        self.partition = partition
+        self.core = ModelingCore(plan.getSubSpec(partition, modelSpec), modelSpec.name, modelSpec.caption, seed)
+        self.env = self.core.env
+        self.outbox = []
+        self.departures = dict()
+        self.arrivals = dict()
+        for transport in plan.cutTransports:
+            sourcePartition = plan.nodePartitions[transport.from_id]
+            targetPartition = plan.nodePartitions[transport.to_id]
+            if sourcePartition == partition:
+                # те же времена в пути, что у последовательной модели с тем же seed
+                rng = self.core.getRandomStream(f"transport/{transport.id}")
+                count = transport.data.count if transport.type == "fleet" else 1
+                travelTimes = [rng.uniform(transport.data.min_delay, transport.data.max_delay) for _ in range(count)]
+                departure = TransferDeparture(self.env, transport.type, transport.id, travelTimes, transport.data.limit,
+                                              self.core.nodes[transport.from_id], transport.from_endpoint, self.outbox, targetPartition)
+                self.departures[transport.id] = departure
+                departure.activate()
+            if targetPartition == partition:
+                self.arrivals[transport.id] = TransferArrival(self.env, transport.type, transport.id, transport.data.limit,
+                                                              self.core.nodes[transport.to_id], transport.to_endpoint, self.outbox, sourcePartition)
+
+    def deliver(self, message):
+        time, _, transportId, kind, index, travelTime = message
+        if kind == "arrive":
+            handler = lambda event: self.arrivals[transportId].onArrive(index, travelTime)
+        else:
+            handler = lambda event: self.departures[transportId].onReturn(index)
+        self.env.timeout(max(0, time - self.env.now)).callbacks.append(handler)
+
+    def step(self, until, inbox):
+        """Доставляет сообщения и исполняет события раньше until.
+        Возвращает исходящие сообщения и время следующего события"""
+        for message in inbox:
+            self.deliver(message)
+        if until > self.env.now:
+            self.env.run(until=until)
+        outbox = list(self.outbox)
+        self.outbox.clear()
+        return outbox, self.env.peek()
+
+    def getSnapshot(self):
+        snapshot = self.core.getSnapshot()
+        transports = snapshot["transports"]
+        for transportId, departure in self.departures.items():
+            transports[transportId] = departure.getStatus()
+        for transportId, arrival in self.arrivals.items():
+            transports[transportId] = {**transports.get(transportId, {}), **arrival.getStatus()}
+        return snapshot
@@ -0,0 +1,101 @@
+from modeling.model_spec import ModelSpec
+
+# транспорт, который можно разрезать между разделами: поезд возвращается не раньше
+# чем через время в пути, поэтому и доставка, и возврат известны заранее на min_delay
+CUTTABLE_TRANSPORTS = ("train", "fleet")
+
+class PartitionPlan:
+    """Разбиение карты на разделы для параллельного прогона (консервативная синхронизация).
+    Узлы, связанные телепортами и поездами без задержки, остаются в одном разделе
+    (у телепорта следующий забор ждет конца выгрузки - нулевой lookahead обратно).
+    Разрезаются только поезда и флоты с min_delay > 0, lookahead - наименьший min_delay
+    разрезанных. Стоки ничего не отдают и копируются во все разделы, которые в них везут"""
+
+    def __init__(self, modelSpec, partitionsCount):
+        if not isinstance(partitionsCount, int) or partitionsCount < 1:
+            raise ValueError("partitions must be positive")
+        self.modelSpec = modelSpec
+        nodes = modelSpec.nodes
+        positions = modelSpec.nodePositions
+        self.sinkIds = {node.id for node in nodes if node.type == "sink"}
+
+        # группы узлов, которые нельзя разделить (система непересекающихся множеств)
+        parents = list(range(len(nodes)))
+
+        def find(position):
+            while parents[position] != position:
+                parents[position] = parents[parents[position]]
+                position = parents[position]
+            return position
+
+        weights = [1] * len(nodes)
+        candidates = []
+        for transport in modelSpec.transports:
+            source = positions[transport.from_id]
+            weights[source] = weights[source] + 1
+            if transport.to_id in self.sinkIds:
+                continue
+            if transport.type in CUTTABLE_TRANSPORTS and transport.data.min_delay > 0:
+                candidates.append(transport)
+                continue
+            sourceRoot, destinationRoot = find(source), find(positions[transport.to_id])
+            if sourceRoot != destinationRoot:
+                parents[destinationRoot] = sourceRoot
+
+        groups = dict()
+        for position, node in enumerate(nodes):
+            if node.id not in self.sinkIds:
+                groups.setdefault(find(position), []).append(position)
+
+        # LPT: самые тяжелые группы - в наименее загруженный раздел
+        self.partitionsCount = max(1, min(partitionsCount, len(groups)))
+        loads = [0] * self.partitionsCount
+        self.nodePartitions = dict()
+        for group in sorted(groups.values(), key=lambda group: -sum(weights[position] for position in group)):
+            partition = loads.index(min(loads))
+            loads[partition] = loads[partition] + sum(weights[position] for position in group)
+            for position in group:
+                self.nodePartitions[nodes[position].id] = partition
+        self.partitionLoads = loads
+
+        self.cutTransports = [transport for transport in candidates
+                              if self.nodePartitions[transport.from_id] != self.nodePartitions[transport.to_id]]
+        cutIds = {transport.id for transport in self.cutTransports}
+        self.lookahead = min((transport.data.min_delay for transport in self.cutTransports), default=float("inf"))
+
+        # разделы каждого стока: откуда в него везут (сток без транспорта - в разделе 0)
+        self.sinkPartitions = {sinkId: set() for sinkId in self.sinkIds}
+        self.transportPartitions = dict()
+        for transport in modelSpec.transports:
+            if transport.id in cutIds:
+                continue
+            partition = self.nodePartitions[transport.from_id]
+            self.transportPartitions[transport.id] = partition
+            if transport.to_id in self.sinkIds:
+                self.sinkPartitions[transport.to_id].add(partition)
+        for partitions in self.sinkPartitions.values():
+            if not partitions:
+                partitions.add(0)
+
+    def __getstate__(self):
+        # в процессы разделов спецификация передается отдельно
+        state = dict(self.__dict__)
+        state["modelSpec"] = None
+        return state
+
+    def getSubSpec(self, partition, modelSpec=None):
+        """Спецификация модели одного раздела: его узлы, копии стоков и внутренний транспорт"""
+        modelSpec = modelSpec or self.modelSpec
+        nodes = [node for node in modelSpec.nodes
+                 if self.nodePartitions.get(node.id) == partition or partition in self.sinkPartitions.get(node.id, ())]
+        transports = [transport for transport in modelSpec.transports
+                      if self.transportPartitions.get(transport.id) == partition]
+        return ModelSpec(modelSpec.name, modelSpec.caption, nodes, transports, modelSpec.fluid)
+
+    def getSummary(self):
+        return {
+            "partitions": self.partitionsCount,
+            "loads": self.partitionLoads,
+            "cutTransports": [transport.id for transport in self.cutTransports],
+            "lookahead": self.lookahead if self.cutTransports else None
+        }
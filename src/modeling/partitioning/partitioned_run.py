@@ -0,0 +1,164 @@
+import math
+import multiprocessing
+import time
+
+from modeling.model_spec import ModelSpec
+from modeling.partitioning.partition_plan import PartitionPlan
+from modeling.partitioning.partition_model import PartitionModel
+
+class LocalPartition:
+    """Раздел в текущем процессе (один раздел или отладка без процессов)"""
+
+    def __init__(self, modelSpec, plan, partition, seed):
+        self.model = PartitionModel(modelSpec, plan, partition, seed)
+
+    def sendStep(self, until, inbox):
+        self.result = self.model.step(until, inbox)
+
+    def receiveStep(self):
+        return self.result
+
+    def getSnapshot(self):
+        return self.model.getSnapshot()
+
+    def close(self):
+        pass
+
+class ProcessPartition:
+    """Раздел в своем процессе: команды и ответы по Pipe"""
+
+    def __init__(self, context, modelSpec, plan, partition, seed):
+        self.connection, childConnection = context.Pipe()
+        self.process = context.Process(target=runPartitionWorker, args=(childConnection, modelSpec, plan, partition, seed), daemon=True)
+        self.process.start()
+        childConnection.close()
+
+    def _receive(self):
+        try:
+            status, payload = self.connection.recv()
+        except (EOFError, OSError):
+            raise ConnectionError("Partition process is lost")
+        if status == "error":
+            raise payload
+        return payload
+
+    def sendStep(self, until, inbox):
+        self.connection.send(("step", (until, inbox)))
+
+    def receiveStep(self):
+        return self._receive()
+
+    def getSnapshot(self):
+        self.connection.send(("snapshot", ()))
+        return self._receive()
+
+    def close(self):
+        try:
+            self.connection.send(("close", ()))
+        except OSError:
+            pass
+        self.connection.close()
+        self.process.join(timeout=1.0)
+
+def runPartitionWorker(connection, modelSpec, plan, partition, seed):
+    """Точка входа процесса раздела"""
+    try:
+        model = PartitionModel(modelSpec, plan, partition, seed)
+        status, payload = "ok", None
+    except Exception as e:
+        model, status, payload = None, "error", e
+    while True:
+        try:
+            command, args = connection.recv()
+        except (EOFError, OSError):
+            break
+        if command == "close":
+            break
+        if model is None:
+            connection.send((status, payload))
+            continue
+        try:
+            if command == "step":
+                connection.send(("ok", model.step(*args)))
+            elif command == "snapshot":
+                connection.send(("ok", model.getSnapshot()))
+        except Exception as e:
+            connection.send(("error", e))
+    connection.close()
+
+def runPartitioned(modelDescription, until, partitionsCount, seed=None, processes=True):
+    """Прогон карты до until разделами параллельно (консервативная синхронизация окнами).
+    Окно кончается на ближайшем событии или сообщении всех разделов плюс lookahead:
+    раньше этой границы ни один раздел не может получить новое сообщение"""
+    if not isinstance(until, (int, float)) or until <= 0:
+        raise ValueError("Partitioned run requires positive 'until'")
+    modelSpec = ModelSpec.parse(modelDescription)
+    plan = PartitionPlan(modelSpec, partitionsCount)
+    wallStart = time.perf_counter()
+    if processes and plan.partitionsCount > 1:
+        context = multiprocessing.get_context("spawn")
+        partitions = [ProcessPartition(context, modelSpec, plan, index, seed) for index in range(plan.partitionsCount)]
+    else:
+        partitions = [LocalPartition(modelSpec, plan, index, seed) for index in range(plan.partitionsCount)]
+    try:
+        windowsCount, messagesCount = _runWindows(partitions, plan.lookahead, until)
+        snapshots = [partition.getSnapshot() for partition in partitions]
+    finally:
+        for partition in partitions:
+            partition.close()
+    return {
+        **plan.getSummary(),
+        "until": until,
+        "windows": windowsCount,
+        "messages": messagesCount,
+        "wallTime": time.perf_counter() - wallStart,
+        "snapshot": mergeSnapshots(plan, snapshots, until)
+    }
+
+def _runWindows(partitions, lookahead, until):
+    count = len(partitions)
+    inboxes = [[] for _ in range(count)]
+    nextTimes = [0.0] * count
+    windowsCount = 0
+    messagesCount = 0
+    windowEnd = 0.0
+    while windowEnd < until:
+        earliest = min(min(nextTimes), min((message[0] for inbox in inboxes for message in inbox), default=math.inf))
+        windowEnd = min(until, earliest + lookahead)
+        # шагают только разделы, у которых в окне есть события или сообщения;
+        # в последнем окне все доводятся до until
+        stepped = []
+        for index, partition in enumerate(partitions):
+            inbox = [message for message in inboxes[index] if message[0] < windowEnd]
+            if windowEnd < until and nextTimes[index] >= windowEnd and not inbox:
+                continue
+            inboxes[index] = [message for message in inboxes[index] if message[0] >= windowEnd]
+            partition.sendStep(windowEnd, inbox)
+            stepped.append(index)
+        for index in stepped:
+            outbox, nextTimes[index] = partitions[index].receiveStep()
+            messagesCount = messagesCount + len(outbox)
+            for message in outbox:
+                inboxes[message[1]].append(message)
+        windowsCount = windowsCount + 1
+    return windowsCount, messagesCount
+
+def mergeSnapshots(plan, snapshots, until):
+    """Общий срез: узлы - из своего раздела, итоги копий стоков складываются,
+    у разрезанного транспорта объединяются половины"""
+    nodes = dict()
+    transports = dict()
+    for partition, snapshot in enumerate(snapshots):
+        for entityId, status in snapshot["nodes"].items():
+            if entityId in plan.sinkIds:
+                merged = nodes.setdefault(entityId, {**status, "accumulatedTotal": 0})
+                merged["accumulatedTotal"] = merged["accumulatedTotal"] + status["accumulatedTotal"]
+            elif plan.nodePartitions[entityId] == partition:
+                nodes[entityId] = status
+        for entityId, status in snapshot["transports"].items():
+            transports[entityId] = {**transports.get(entityId, {}), **status}
+    return {
+        "time": until,
+        "nodes": dict(sorted(nodes.items())),
+        "transports": dict(sorted(transports.items()))
+    }
@@ -0,0 +1,53 @@
+from collections import deque
+
+from modeling.material_flow.transport.train_fleet import getDockSlots
+
+class TransferArrival:
+    """Половина разрезанного поезда/флота в разделе назначения: прибывшие поезда
+    разгружаются по очереди по числу доков назначения, после разгрузки - сообщение о возвращении в раздел источника"""
+
+    __slots__ = ("env", "transportType", "transportId", "capacity", "destination", "destinationIndex", "outbox",
+                 "sourcePartition", "unloadSlots", "unloadQueue", "unloading", "tripsCount")
+
+    def __init__(self, env, transportType, transportId, capacity, destination, destinationIndex, outbox, sourcePartition):
+        self.env = env
+        self.transportType = transportType
+        self.transportId = transportId
+        self.capacity = capacity
+        self.destination = destination
+        self.destinationIndex = destinationIndex
+        self.outbox = outbox
+        self.sourcePartition = sourcePartition
+
+        self.unloadSlots = getDockSlots(destination, "getImportSlots", destinationIndex)
+        # (поезд, время в пути) в очереди на разгрузку и поданные запросы (поезд, время в пути, событие)
+        self.unloadQueue = deque()
+        self.unloading = []
+        self.tripsCount = 0
+
+    def onArrive(self, index, travelTime):
+        self.unloadQueue.append((index, travelTime))
+        self._requestUnloads()
+
+    def _requestUnloads(self):
+        while self.unloadQueue and len(self.unloading) < self.unloadSlots:
+            index, travelTime = self.unloadQueue.popleft()
+            event = self.destination.putResources(self.destinationIndex, self.capacity)
+            request = (index, travelTime, event)
+            self.unloading.append(request)
+            event.callbacks.append(lambda event, request=request: self._onUnloaded(request))
+
+    def _onUnloaded(self, request):
+        self.unloading.remove(request)
+        self._requestUnloads()
+        index, travelTime, _ = request
+        self.tripsCount = self.tripsCount + 1
+        self.outbox.append((self.env.now + travelTime, self.sourcePartition, self.transportId, "return", index, travelTime))
+
+    def getStatus(self):
+        return {
+            "type": "Transport",
+            "nodeType": self.transportType,
+            "unloading": len(self.unloading) + len(self.unloadQueue),
+            "tripsCount": self.tripsCount
+        }
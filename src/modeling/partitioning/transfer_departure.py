@@ -0,0 +1,60 @@
+from collections import deque
+
+from modeling.material_flow.transport.train_fleet import getDockSlots
+
+class TransferDeparture:
+    """Половина разрезанного поезда/флота в разделе источника: погрузка по очереди
+    по числу доков источника, как у TrainFleet, после нее - сообщение о прибытии в раздел назначения.
+    Поезд возвращается сообщением от TransferArrival и снова встает на погрузку"""
+
+    __slots__ = ("env", "transportType", "transportId", "travelTimes", "capacity", "source", "sourceIndex", "outbox",
+                 "targetPartition", "loadSlots", "loadQueue", "loading", "departuresCount")
+
+    def __init__(self, env, transportType, transportId, travelTimes, capacity, source, sourceIndex, outbox, targetPartition):
+        self.env = env
+        self.transportType = transportType
+        self.transportId = transportId
+        self.travelTimes = travelTimes
+        self.capacity = capacity
+        self.source = source
+        self.sourceIndex = sourceIndex
+        # исходящие сообщения раздела: (время, раздел, транспорт, вид, поезд, время в пути)
+        self.outbox = outbox
+        self.targetPartition = targetPartition
+
+        self.loadSlots = getDockSlots(source, "getExportSlots", sourceIndex)
+        self.loadQueue = deque()
+        # поданные запросы: (поезд, событие узла)
+        self.loading = []
+        self.departuresCount = 0
+
+    def activate(self):
+        for index in range(len(self.travelTimes)):
+            self.onReturn(index)
+
+    def onReturn(self, index):
+        self.loadQueue.append(index)
+        self._requestLoads()
+
+    def _requestLoads(self):
+        while self.loadQueue and len(self.loading) < self.loadSlots:
+            index = self.loadQueue.popleft()
+            event = self.source.getResources(self.sourceIndex, self.capacity)
+            self.loading.append((index, event))
+            event.callbacks.append(lambda event, index=index: self._onLoaded(index, event))
+
+    def _onLoaded(self, index, event):
+        self.loading.remove((index, event))
+        self._requestLoads()
+        self.departuresCount = self.departuresCount + 1
+        travelTime = self.travelTimes[index]
+        self.outbox.append((self.env.now + travelTime, self.targetPartition, self.transportId, "arrive", index, travelTime))
+
+    def getStatus(self):
+        return {
+            "type": "Transport",
+            "nodeType": self.transportType,
+            "count": len(self.travelTimes),
+            "loading": len(self.loading) + len(self.loadQueue),
+            "departuresCount": self.departuresCount
+        }
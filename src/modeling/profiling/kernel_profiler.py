@@ -0,0 +1,102 @@
+from time import perf_counter
+
+from simpy.events import Timeout, Process, Condition
+from simpy.resources.container import ContainerPut, ContainerGet
+from simpy.resources.resource import Request, Release
+
+def getEventType(event):
+    if isinstance(event, Timeout):
+        return "timeout"
+    if isinstance(event, ContainerPut):
+        return "put"
+    if isinstance(event, ContainerGet):
+        return "get"
+    if isinstance(event, Request):
+        return "lockRequest"
+    if isinstance(event, Release):
+        return "lockRelease"
+    if isinstance(event, Process):
+        return "process"
+    if isinstance(event, Condition):
+        return "condition"
+    return "event"
+
+def startProcess(entity, generator):
+    """Запуск SimPy-процесса сущности; при включенном профилировании - через обертку"""
+    profiler = getattr(entity, "profiler", None)
+    if profiler is not None:
+        generator = profiler.wrap(entity.profileKey, generator)
+    return entity.env.process(generator)
+
+class KernelProfiler:
+    """Счетчики событий по сущностям и типам и время шагов генераторов процессов.
+    Подключается только при profile=True - без него процессы запускаются как есть"""
+
+    def __init__(self):
+        self.entities = dict()
+
+    def getEntityStats(self, entityKey):
+        stats = self.entities.get(entityKey)
+        if stats is None:
+            stats = {"steps": 0, "wallTime": 0.0, "processes": 0, "events": dict()}
+            self.entities[entityKey] = stats
+        return stats
+
+    def countEvent(self, entityKey, eventType):
+        """Учет события, созданного не из генератора (колбэки fleet, fluid)"""
+        events = self.getEntityStats(entityKey)["events"]
+        events[eventType] = events.get(eventType, 0) + 1
+
+    def wrap(self, entityKey, generator):
+        """Генератор-обертка: пробрасывает значения/исключения, считает yield'ы и время шагов"""
+        stats = self.getEntityStats(entityKey)
+        stats["processes"] = stats["processes"] + 1
+        events = stats["events"]
+        value = None
+        error = None
+        while True:
+            started = perf_counter()
+            try:
+                if error is None:
+                    event = generator.send(value)
+                else:
+                    event = generator.throw(error)
+            except StopIteration as stop:
+                stats["wallTime"] = stats["wallTime"] + perf_counter() - started
+                stats["steps"] = stats["steps"] + 1
+                return stop.value
+            except BaseException:
+                stats["wallTime"] = stats["wallTime"] + perf_counter() - started
+                raise
+            stats["wallTime"] = stats["wallTime"] + perf_counter() - started
+            stats["steps"] = stats["steps"] + 1
+            eventType = getEventType(event)
+            events[eventType] = events.get(eventType, 0) + 1
+            try:
+                value = yield event
+                error = None
+            except BaseException as e:
+                # Interrupt и GeneratorExit передаются в исходный генератор
+                value = None
+                error = e
+
+    def getReport(self, top=10):
+        byType = dict()
+        totalEvents = 0
+        totalWallTime = 0.0
+        entities = dict()
+        for entityKey, stats in self.entities.items():
+            eventsTotal = sum(stats["events"].values())
+            for eventType, count in stats["events"].items():
+                byType[eventType] = byType.get(eventType, 0) + count
+            totalEvents = totalEvents + eventsTotal
+            totalWallTime = totalWallTime + stats["wallTime"]
+            entities[entityKey] = dict(stats, events=dict(stats["events"]), eventsTotal=eventsTotal)
+        hottest = sorted(entities, key=lambda key: entities[key]["wallTime"], reverse=True)[:top]
+        return {
+            "totalEvents": totalEvents,
+            "totalWallTime": totalWallTime,
+            "byType": byType,
+            "top": [dict(entities[key], entity=key) for key in hottest],
+            "entities": entities
+        }
@@ -0,0 +1,184 @@
+import datetime
+import json
+import mmap
+import struct
+
+import numpy as np
+
+RESULTS_VERSION = 1
+
+# файл: MAGIC | колонки рядов | заголовок JSON | длина заголовка (uint64) | MAGIC
+RESULTS_MAGIC = b"MFRESLT1"
+TRAILER = struct.Struct("<Q8s")
+
+# строк в сжатом блоке колонки: окно по времени распаковывает только свои блоки
+COMPRESSED_CHUNK_ROWS = 65536
+
+class ResultFile:
+    """Результаты прогона на диске: сводка, итоговые счетчики и срез в заголовке,
+    записанные ряды - по колонкам float64 (время - колонка 0). Без сжатия колонка лежит
+    одним куском и читается из mmap без копирования, со сжатием - блоками zstd.
+    Файл держит mmap до close() - открывать через with"""
+
+    def __init__(self, path, header=None):
+        """header - уже разобранный заголовок этого файла (SpilledSimulation держит его в памяти)"""
+        self.path = path
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = header if header is not None else self._readHeader()
+        except ValueError:
+            self.close()
+            raise
+        self.series = self.header["series"]
+
+    def _readHeader(self):
+        if len(self.buffer) < len(RESULTS_MAGIC) + TRAILER.size or self.buffer[:len(RESULTS_MAGIC)] != RESULTS_MAGIC:
+            raise ValueError(f"Not a results file: {self.path}")
+        headerLength, magic = TRAILER.unpack_from(self.buffer, len(self.buffer) - TRAILER.size)
+        if magic != RESULTS_MAGIC:
+            raise ValueError(f"Results file is truncated: {self.path}")
+        headerStart = len(self.buffer) - TRAILER.size - headerLength
+        header = json.loads(self.buffer[headerStart:headerStart + headerLength])
+        if header.get("version") != RESULTS_VERSION:
+            raise ValueError(f"Unsupported results version: {header.get('version')}")
+        return header
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def collectCounters(snapshot):
+        """Итоговые числовые поля статусов, имена - как у колонок рекордера"""
+        counters = dict()
+        for entityType, section in (("Node", "nodes"), ("Transport", "transports")):
+            for entityId, status in snapshot[section].items():
+                for field, value in status.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        counters[f"{entityType}.{entityId}.{field}"] = value
+        return counters
+
+    @staticmethod
+    def write(path, core, compress=False, checkpoint=False):
+        """Пишет результаты модели (ModelingCore или прокси воркера) в файл.
+        compress - блоки zstd (если пакет установлен), checkpoint - сохранить и состояние модели"""
+        compressor = None
+        if compress:
+            try:
+                import zstandard
+                compressor = zstandard.ZstdCompressor(level=3)
+            except ImportError:
+                pass
+        snapshot = core.getSnapshot()
+        try:
+            series = core.getSeries()
+        except ValueError:
+            series = None
+        header = {
+            "version": RESULTS_VERSION,
+            "savedAt": datetime.datetime.now().isoformat(),
+            "summary": core.getSummary(),
+            "counters": ResultFile.collectCounters(snapshot),
+            "snapshot": snapshot,
+            "checkpoint": core.getCheckpoint() if checkpoint else None,
+            "series": None
+        }
+        with open(path, "wb") as file:
+            file.write(RESULTS_MAGIC)
+            if series is not None:
+                header["series"] = ResultFile._writeColumns(file, series, compressor)
+            payload = json.dumps(header, separators=(",", ":")).encode()
+            file.write(payload)
+            file.write(TRAILER.pack(len(payload), RESULTS_MAGIC))
+        return path
+
+    @staticmethod
+    def _writeColumns(file, series, compressor):
+        times = np.ascontiguousarray(series["time"], dtype=np.float64)
+        values = np.asarray(series["values"], dtype=np.float64)
+        rows = len(times)
+        chunkRows = COMPRESSED_CHUNK_ROWS if compressor is not None else max(1, rows)
+        # блоки колонки: [смещение, размер]; первое время каждого блока - для выбора блоков окна
+        chunks = []
+        for column in [times] + [values[:, index] for index in range(values.shape[1])]:
+            columnChunks = []
+            for start in range(0, rows, chunkRows):
+                data = np.ascontiguousarray(column[start:start + chunkRows]).tobytes()
+                if compressor is not None:
+                    data = compressor.compress(data)
+                columnChunks.append([file.tell(), len(data)])
+                file.write(data)
+            chunks.append(columnChunks)
+        return {
+            "interval": series["interval"],
+            "columns": list(series["columns"]),
+            "rows": rows,
+            "compression": "zstd" if compressor is not None else None,
+            "chunkRows": chunkRows,
+            "chunkTimes": times[::chunkRows].tolist(),
+            "chunks": chunks
+        }
+
+    def getSummary(self):
+        return self.header["summary"]
+
+    def getCounters(self):
+        return self.header["counters"]
+
+    def getSnapshot(self):
+        return self.header["snapshot"]
+
+    def getCheckpoint(self):
+        if self.header["checkpoint"] is None:
+            raise ValueError("Results file has no checkpoint")
+        return self.header["checkpoint"]
+
+    def _readColumn(self, column, firstChunk, lastChunk):
+        """Строки блоков [firstChunk, lastChunk) колонки: без сжатия - вид на mmap"""
+        chunks = self.series["chunks"][column][firstChunk:lastChunk]
+        if self.series["compression"] is None:
+            offset, size = chunks[0]
+            return np.frombuffer(self.buffer, dtype=np.float64, count=size // 8, offset=offset)
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor()
+        return np.concatenate([np.frombuffer(decompressor.decompress(self.buffer[offset:offset + size]), dtype=np.float64)
+                               for offset, size in chunks])
+
+    def getSeries(self, fromTime=None, toTime=None, columns=None):
+        """Окно рядов [fromTime, toTime], как TimeSeriesRecorder.getWindow.
+        Читаются только нужные колонки и (для сжатого файла) блоки; окно копируется из mmap,
+        после чтения файл можно закрыть"""
+        series = self.series
+        if series is None:
+            raise ValueError("Recording is disabled for this simulation")
+        names = series["columns"]
+        indexes = list(range(len(names)))
+        if columns is not None:
+            indexes = [names.index(name) for name in columns if name in names]
+        rows = series["rows"]
+        if rows == 0:
+            return {"interval": series["interval"], "time": np.zeros(0), "columns": [names[index] for index in indexes],
+                    "values": np.zeros((0, len(indexes)))}
+        chunkTimes = series["chunkTimes"]
+        firstChunk = 0 if fromTime is None else max(0, int(np.searchsorted(chunkTimes, fromTime, side="right")) - 1)
+        lastChunk = len(chunkTimes) if toTime is None else max(firstChunk + 1, int(np.searchsorted(chunkTimes, toTime, side="right")))
+        times = self._readColumn(0, firstChunk, lastChunk)
+        start = 0 if fromTime is None else int(np.searchsorted(times, fromTime, side="left"))
+        stop = len(times) if toTime is None else int(np.searchsorted(times, toTime, side="right"))
+        # fromTime > toTime - пустое окно, а не отрицательный размер
+        stop = max(stop, start)
+        values = np.empty((stop - start, len(indexes)), dtype=np.float64)
+        for position, index in enumerate(indexes):
+            values[:, position] = self._readColumn(index + 1, firstChunk, lastChunk)[start:stop]
+        return {
+            "interval": series["interval"],
+            "time": times[start:stop].copy(),
+            "columns": [names[index] for index in indexes],
+            "values": values
+        }
@@ -0,0 +1,86 @@
+import numpy as np
+
+class TimeSeriesRecorder:
+    """Запись уровней и счетчиков сущностей с шагом модельного времени
+    в заранее выделенный кольцевой буфер (колонки float64), с ограничением по памяти"""
+
+    def __init__(self, env, interval, maxBytes):
+        if interval <= 0:
+            raise ValueError("Recording interval must be positive")
+        self.env = env
+        self.interval = interval
+        self.maxBytes = maxBytes
+        self.columns = []
+        self.entities = []
+        self.listeners = []
+        self.values = None
+        self.times = None
+        self.capacity = 0
+        self.position = 0
+        self.samplesCount = 0
+
+    def addEntity(self, entityType, entityId, entity):
+        """Регистрирует числовые поля getStatus() сущности как колонки"""
+        status = entity.getStatus()
+        fields = [field for field, value in status.items()
+                  if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if not fields:
+            return
+        self.entities.append((entity, fields))
+        for field in fields:
+            self.columns.append(f"{entityType}.{entityId}.{field}")
+
+    def addListener(self, listener):
+        """listener(time, row) вызывается после каждого замера"""
+        self.listeners.append(listener)
+
+    def activate(self):
+        rowBytes = 8 * (len(self.columns) + 1)
+        self.capacity = max(2, self.maxBytes // rowBytes)
+        self.times = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.zeros((self.capacity, len(self.columns)), dtype=np.float64)
+        self.env.process(self.runLifeCycle())
+
+    def runLifeCycle(self):
+        while True:
+            self.sample()
+            yield self.env.timeout(self.interval)
+
+    def sample(self):
+        row = self.values[self.position]
+        column = 0
+        for entity, fields in self.entities:
+            status = entity.getStatus()
+            for field in fields:
+                row[column] = status[field]
+                column = column + 1
+        self.times[self.position] = self.env.now
+        self.position = (self.position + 1) % self.capacity
+        self.samplesCount = self.samplesCount + 1
+        for listener in self.listeners:
+            listener(self.env.now, row)
+
+    def getMemoryUsage(self):
+        if self.values is None:
+            return 0
+        return self.times.nbytes + self.values.nbytes
+
+    def getWindow(self, fromTime=None, toTime=None, columns=None):
+        """Срез записанных рядов по модельному времени [fromTime, toTime]: (times, columns, values)"""
+        if self.samplesCount == 0:
+            return np.zeros(0), [], np.zeros((0, 0))
+        if self.samplesCount < self.capacity:
+            times = self.times[:self.position]
+            values = self.values[:self.position]
+        else:
+            # кольцо заполнено - восстанавливаем хронологический порядок
+            times = np.concatenate((self.times[self.position:], self.times[:self.position]))
+            values = np.concatenate((self.values[self.position:], self.values[:self.position]))
+        start = 0 if fromTime is None else int(np.searchsorted(times, fromTime, side="left"))
+        stop = len(times) if toTime is None else int(np.searchsorted(times, toTime, side="right"))
+        names = self.columns
+        if columns is not None:
+            indexes = [self.columns.index(name) for name in columns if name in self.columns]
+            names = [self.columns[index] for index in indexes]
+            values = values[:, indexes]
+        return times[start:stop], names, values[start:stop]
@@ -0,0 +1,84 @@
+from array import array
+
+import numpy as np
+
+# меньше батчей - точку отсечения прогрева не определяем
+MIN_BATCHES = 10
+BATCH_SIZE = 5
+
+class MserTracker:
+    """MSER-m (по умолчанию MSER-5) по ряду наблюдений, накапливаемому по одному.
+    Наблюдения сворачиваются в средние батчей по m, для батчей хранятся префиксные суммы
+    значений и квадратов - статистика MSER для всех точек отсечения считается за O(n).
+    Батчей не больше maxBatches: при заполнении соседние сливаются попарно, m удваивается"""
+
+    def __init__(self, batchSize=BATCH_SIZE, maxBatches=None):
+        self.batchSize = batchSize
+        # четное: слияние попарно не оставляет хвоста
+        self.maxBatches = None if maxBatches is None else max(2 * MIN_BATCHES, maxBatches - maxBatches % 2)
+        self.batchMeans = array('d')
+        self.sums = array('d', [0.0])
+        self.squares = array('d', [0.0])
+        self.pendingSum = 0.0
+        self.pendingCount = 0
+        # отсечение пересчитывается только после нового батча
+        self.truncation = None
+        self.truncationValid = False
+
+    def add(self, value):
+        self.pendingSum = self.pendingSum + value
+        self.pendingCount = self.pendingCount + 1
+        if self.pendingCount == self.batchSize:
+            mean = self.pendingSum / self.batchSize
+            self.batchMeans.append(mean)
+            self.sums.append(self.sums[-1] + mean)
+            self.squares.append(self.squares[-1] + mean * mean)
+            self.pendingSum = 0.0
+            self.pendingCount = 0
+            self.truncationValid = False
+            if self.maxBatches is not None and len(self.batchMeans) >= self.maxBatches:
+                self._merge()
+
+    def _merge(self):
+        merged = np.frombuffer(self.batchMeans, dtype=np.float64).reshape(-1, 2).mean(axis=1)
+        self.batchSize = self.batchSize * 2
+        self.batchMeans = array('d', merged.tobytes())
+        self.sums = array('d', np.concatenate(([0.0], np.cumsum(merged))).tobytes())
+        self.squares = array('d', np.concatenate(([0.0], np.cumsum(merged * merged))).tobytes())
+
+    def getTruncation(self):
+        """Число отбрасываемых батчей прогрева или None, если ряд еще не установился.
+        Минимум MSER(d) = SS(d) / (n - d)^2 ищется в первой половине ряда (в конце статистика
+        вырождается на последних батчах); минимум на границе - ряд все еще в переходном режиме"""
+        if not self.truncationValid:
+            self.truncation = self._findTruncation()
+            self.truncationValid = True
+        return self.truncation
+
+    def _findTruncation(self):
+        count = len(self.batchMeans)
+        if count < MIN_BATCHES:
+            return None
+        half = count // 2
+        sums = np.frombuffer(self.sums, dtype=np.float64)
+        squares = np.frombuffer(self.squares, dtype=np.float64)
+        remaining = np.arange(count, count - half - 1, -1, dtype=np.float64)
+        tailSums = sums[count] - sums[:half + 1]
+        tailSquares = squares[count] - squares[:half + 1]
+        deviations = np.maximum(tailSquares - tailSums * tailSums / remaining, 0.0)
+        truncation = int(np.argmin(deviations / (remaining * remaining)))
+        if truncation == half:
+            return None
+        return truncation
+
+    def getTail(self, truncation):
+        """Средние батчей после отсечения прогрева (копия: вид на array не дал бы дописывать)"""
+        return np.frombuffer(self.batchMeans[truncation:], dtype=np.float64)
+
+    def getTailMean(self, truncation):
+        """Среднее после отсечения - по префиксным суммам, без копии"""
+        count = len(self.batchMeans)
+        return (self.sums[count] - self.sums[truncation]) / (count - truncation)
+
+    def getMemoryUsage(self):
+        return (len(self.batchMeans) + len(self.sums) + len(self.squares)) * self.batchMeans.itemsize
@@ -0,0 +1,125 @@
+import numpy as np
+
+from modeling.statistics.mser_tracker import BATCH_SIZE, MserTracker
+from modeling.statistics.summary import confidenceHalfWidth
+
+# ряд выработки всех стоков вместе
+TOTAL_THROUGHPUT = "sinks.throughput"
+
+class SteadyStateMonitor:
+    """Прогрев и сходимость по записанным рядам: слушатель TimeSeriesRecorder.
+    Выработка стоков (прирост accumulatedTotal за замер) и уровни буферов идут в MSER-5,
+    прогрев всей модели - самое позднее отсечение среди рядов. Доверительный интервал
+    выработки - по методу средних батчей на ряде после прогрева"""
+
+    def __init__(self, recorder, sinkIds, bufferIds):
+        self.interval = recorder.interval
+        self.startTime = None
+        self.observationsCount = 0
+        # ряд: (индекс колонки рекордера, накопительный ли счетчик)
+        self.series = dict()
+        for sinkId in sinkIds:
+            self.series[f"sink.{sinkId}.throughput"] = (recorder.columns.index(f"Node.{sinkId}.accumulatedTotal"), True)
+        for bufferId in bufferIds:
+            self.series[f"buffer.{bufferId}.level"] = (recorder.columns.index(f"Node.{bufferId}.currentCount"), False)
+        self.sinkColumns = [column for column, cumulative in self.series.values() if cumulative]
+        # батчей в трекере не больше, чем батчей в кольце рекордера: рядов меньше, чем колонок,
+        # и память трекеров остается в пределах maxBytes записи. Трекеры сливают батчи одновременно
+        maxBatches = recorder.capacity // BATCH_SIZE
+        self.trackers = {name: MserTracker(maxBatches=maxBatches) for name in self.series}
+        if self.sinkColumns:
+            self.trackers[TOTAL_THROUGHPUT] = MserTracker(maxBatches=maxBatches)
+        self.previous = None
+        # отсечение прогрева по всем рядам - на число наблюдений warmupCount
+        self.warmup = None
+        self.warmupCount = -1
+        # последняя оценка интервала по каждому ряду: для отчета
+        self.estimates = dict()
+        recorder.addListener(self.onSample)
+
+    def onSample(self, time, row):
+        if self.previous is None:
+            # первый замер - точка отсчета приростов
+            self.startTime = time
+            self.previous = np.array(row)
+            return
+        for name, (column, cumulative) in self.series.items():
+            value = row[column]
+            self.trackers[name].add((value - self.previous[column]) / self.interval if cumulative else value)
+        if self.sinkColumns:
+            total = sum(row[column] - self.previous[column] for column in self.sinkColumns)
+            self.trackers[TOTAL_THROUGHPUT].add(total / self.interval)
+        self.previous[:] = row
+        self.observationsCount = self.observationsCount + 1
+
+    def getWarmup(self):
+        """Отсечение прогрева в батчах MSER-5 (общее для всех рядов) или None"""
+        if self.warmupCount != self.observationsCount:
+            self.warmup = self._findWarmup()
+            self.warmupCount = self.observationsCount
+        return self.warmup
+
+    def _findWarmup(self):
+        if not self.trackers:
+            return None
+        truncation = 0
+        for tracker in self.trackers.values():
+            seriesTruncation = tracker.getTruncation()
+            if seriesTruncation is None:
+                return None
+            truncation = max(truncation, seriesTruncation)
+        return truncation
+
+    def getWarmupTime(self, truncation):
+        batchSize = next(iter(self.trackers.values())).batchSize
+        return self.startTime + truncation * batchSize * self.interval
+
+    def estimate(self, name, confidence=0.95, batches=20, minBatchSize=25):
+        """Среднее ряда после прогрева и полуширина интервала по batches средним батчей.
+        None - прогрев не определен или наблюдений на батч меньше minBatchSize"""
+        tracker = self.trackers.get(name)
+        if tracker is None:
+            raise ValueError(f"Unknown steady-state series: {name}")
+        truncation = self.getWarmup()
+        if truncation is None:
+            return None
+        tail = tracker.getTail(truncation)
+        groupSize = len(tail) // batches
+        if groupSize * tracker.batchSize < minBatchSize:
+            return None
+        # самые поздние наблюдения, лишнее отбрасывается со стороны прогрева
+        means = tail[len(tail) - groupSize * batches:].reshape(batches, groupSize).mean(axis=1)
+        mean = float(means.mean())
+        halfWidth = confidenceHalfWidth(means, confidence)
+        estimate = {
+            "mean": mean,
+            "halfWidth": halfWidth,
+            # при нулевой выработке относительная точность не определена
+            "relativeHalfWidth": halfWidth / abs(mean) if mean != 0 else None,
+            "confidence": confidence,
+            "batches": batches,
+            "batchSize": groupSize * tracker.batchSize,
+            "warmupTime": self.getWarmupTime(truncation)
+        }
+        self.estimates[name] = estimate
+        return estimate
+
+    def getMemoryUsage(self):
+        return sum(tracker.getMemoryUsage() for tracker in self.trackers.values())
+
+    def getReport(self):
+        truncation = self.getWarmup()
+        series = dict()
+        for name, tracker in self.trackers.items():
+            seriesTruncation = tracker.getTruncation()
+            series[name] = {
+                "warmupTime": None if seriesTruncation is None else self.getWarmupTime(seriesTruncation),
+                "mean": None if seriesTruncation is None else tracker.getTailMean(seriesTruncation)
+            }
+        return {
+            "interval": self.interval,
+            "observations": self.observationsCount,
+            "warmupTime": None if truncation is None else self.getWarmupTime(truncation),
+            "series": series,
+            "estimates": self.estimates
+        }
@@ -0,0 +1,54 @@
+from modeling.material_flow.node.buffer.buffer import Buffer
+from modeling.material_flow.node.sink.sink import Sink
+
+# Условия остановки из run.stop: condition(core) -> bool, проверяются между шагами модели.
+# Условие "time" сюда не попадает - оно становится until прогона
+
+def createSteadyStateMonitor(core):
+    """Прогрев и сходимость по рядам стоков и буферов модели (нужна запись рядов)"""
+    if core.recorder is None:
+        raise ValueError("Warm-up detection requires recording")
+    # монитор тянет numpy - импорт только при включенном прогреве
+    from modeling.statistics.steady_state_monitor import SteadyStateMonitor
+    sinkIds = [entityId for entityId, node in core.nodes.items() if isinstance(node, Sink)]
+    bufferIds = [entityId for entityId, node in core.nodes.items() if isinstance(node, Buffer)]
+    return SteadyStateMonitor(core.recorder, sinkIds, bufferIds)
+
+def getTimeLimit(conditions, until=None):
+    """until прогона с учетом условий "time" (самое раннее)"""
+    for condition in conditions:
+        if condition.type == "time":
+            until = condition.until if until is None else min(until, condition.until)
+    return until
+
+def getSink(core, sinkId):
+    sink = core.nodes.get(sinkId)
+    if not isinstance(sink, Sink):
+        raise ValueError(f"Stop condition refers to unknown sink: {sinkId}")
+    return sink
+
+def createStopCondition(core, condition):
+    """Условие остановки и его описание для stopReason"""
+    if condition.type == "sinkTotal":
+        sink = getSink(core, condition.sink)
+        total = condition.total
+
+        def isSinkTotalReached(core):
+            return sink.getProcessedCount() >= total
+
+        return isSinkTotalReached, f"sink {condition.sink} total {total}"
+
+    if condition.type == "confidence":
+        from modeling.statistics.steady_state_monitor import TOTAL_THROUGHPUT
+        if condition.sink is not None:
+            getSink(core, condition.sink)
+        name = TOTAL_THROUGHPUT if condition.sink is None else f"sink.{condition.sink}.throughput"
+
+        def isConfidenceReached(core):
+            estimate = core.steadyState.estimate(name, condition.confidence, condition.batches, condition.minBatchSize)
+            return (estimate is not None and estimate["relativeHalfWidth"] is not None
+                    and estimate["relativeHalfWidth"] <= condition.relativeHalfWidth)
+
+        return isConfidenceReached, f"{name} relative half-width {condition.relativeHalfWidth}"
+
+    raise ValueError(f"Unsupported stop condition: {condition.type}")
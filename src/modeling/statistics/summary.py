@@ -0,0 +1,49 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+def tQuantile(probability, degreesOfFreedom):
+    """Квантиль распределения Стьюдента (разложение Корниша-Фишера, A&S 26.7.5)"""
+    if degreesOfFreedom == 1:
+        return math.tan(math.pi * (probability - 0.5))
+    if degreesOfFreedom == 2:
+        return (2 * probability - 1) / math.sqrt(2 * probability * (1 - probability))
+    z = NormalDist().inv_cdf(probability)
+    v = degreesOfFreedom
+    return (z
+            + (z ** 3 + z) / (4 * v)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * v ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * v ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * v ** 4))
+
+def confidenceHalfWidth(values, confidence=0.95):
+    """Полуширина доверительного интервала среднего по независимым наблюдениям"""
+    count = len(values)
+    if count < 2:
+        return math.inf
+    std = float(np.std(values, ddof=1))
+    return tQuantile(0.5 + confidence / 2, count - 1) * std / math.sqrt(count)
+
+def summarize(values, confidence=0.95, percentiles=(5, 50, 95)):
+    """Сводная статистика по значениям метрики из независимых прогонов"""
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    halfWidth = confidenceHalfWidth(values, confidence)
+    if math.isinf(halfWidth):
+        # по одному прогону интервал не оценить
+        halfWidth = None
+    summary = {
+        "count": int(values.size),
+        "mean": mean,
+        "std": float(values.std(ddof=1)) if values.size > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "confidence": confidence,
+        "ciLow": None if halfWidth is None else mean - halfWidth,
+        "ciHigh": None if halfWidth is None else mean + halfWidth,
+        "halfWidth": halfWidth
+    }
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
@@ -0,0 +1,75 @@
+"""Headless-прогон модели без веб-сервера: для воркеров и массовых коротких прогонов.
+
+Карта - из файла или stdin ("-"), секция run карты задает прогон как в POST /api/simulations,
+режим всегда batch. Результат - файл результатов (ResultFile) или JSON в stdout:
+
+    python src/runner.py map.json --until 1000 --output results.mfres
+    cat map.json | python src/runner.py - --until 1000 > result.json
+
+Импорты ленивые: веб-сервер не импортируется вовсе, numpy - только для записи рядов
+и файла результатов. startupSeconds в ответе - от запуска до готовности к первому событию модели
+"""
+import time
+
+# отсчет холодного старта - до остальных импортов
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+def readMap(path):
+    if path == "-":
+        return json.load(sys.stdin)
+    with open(path) as file:
+        return json.load(file)
+
+def runMap(modelDescription, until=None, seed=None, output=None, compress=False, name="headless"):
+    """Прогоняет карту до until или условия остановки.
+    output - путь файла результатов, без него в ответе итоговый срез модели"""
+    from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+
+    runOptions = dict(modelDescription.get("run", {}), mode=RUN_MODE_BATCH)
+    if until is not None:
+        runOptions["until"] = until
+    if seed is not None:
+        runOptions["seed"] = seed
+    # ряды нужны файлу результатов; без него запись включается только для прогрева
+    if output is not None:
+        runOptions.setdefault("recording", True)
+    core = ModelingCore.create(
+        modelDescription, modelDescription.get("name", name), modelDescription.get("caption", ""), runOptions)
+    startupSeconds = time.perf_counter() - STARTED
+    core.run_batch()
+
+    result = {"summary": core.getSummary(), "startupSeconds": startupSeconds}
+    if output is not None:
+        result["output"] = core.saveResults(output, compress)
+    else:
+        result["snapshot"] = core.getSnapshot()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a model map headless, without the web server")
+    parser.add_argument("map", help="map JSON file, '-' for stdin")
+    parser.add_argument("--until", type=float, help="model time to run to (overrides run.until of the map)")
+    parser.add_argument("--seed", type=int, help="random seed (overrides run.seed of the map)")
+    parser.add_argument("--output", help="write a result file here instead of printing the final snapshot")
+    parser.add_argument("--compress", action="store_true", help="compress result file columns with zstd")
+    args = parser.parse_args()
+
+    try:
+        modelDescription = readMap(args.map)
+        if not isinstance(modelDescription, dict):
+            raise ValueError("Model map must be an object")
+        name = "stdin" if args.map == "-" else args.map
+        result = runMap(modelDescription, args.until, args.seed, args.output, args.compress, name)
+    except (OSError, ValueError) as e:
+        json.dump({"error": str(e)}, sys.stderr)
+        sys.stderr.write("\n")
+        sys.exit(2)
+    json.dump(result, sys.stdout, separators=(",", ":"))
+    sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
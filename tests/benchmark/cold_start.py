@@ -0,0 +1,56 @@
+"""Холодный старт headless-раннера (src/runner.py или собранного build_nuitka_runner.sh).
+
+Раннер запускается заново на каждый замер на маленькой карте до малого модельного времени.
+Меряются время процесса целиком и startupSeconds раннера (импорты и сборка модели до первого
+события); медиана процесса сравнивается с бюджетом:
+
+    python tests/benchmark/cold_start.py
+    python tests/benchmark/cold_start.py --binary cbuilds/runner/runner.dist/runner.bin --budget 0.3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# бюджет холодного старта, секунд: интерпретатор + импорты + сборка модели до первого события
+COLD_START_BUDGET = 0.5
+
+def launch(command, modelMap):
+    """Один запуск раннера: (время процесса, startupSeconds раннера)"""
+    start = time.perf_counter()
+    completed = subprocess.run(command, input=modelMap, capture_output=True, text=True)
+    wallSeconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"Runner failed: {completed.stderr.strip()}")
+    return wallSeconds, json.loads(completed.stdout)["startupSeconds"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start of the headless runner")
+    parser.add_argument("--binary", help="built runner executable (default: python src/runner.py)")
+    parser.add_argument("--map", default=os.path.join(ROOT, "tests", "demo.json"))
+    parser.add_argument("--until", type=float, default=1)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=COLD_START_BUDGET, help="allowed median process time, seconds")
+    args = parser.parse_args()
+
+    runner = [args.binary] if args.binary else [sys.executable, os.path.join(ROOT, "src", "runner.py")]
+    command = runner + ["-", "--until", str(args.until)]
+    with open(args.map) as file:
+        modelMap = file.read()
+
+    measurements = [launch(command, modelMap) for _ in range(args.runs)]
+    wall = statistics.median(wallSeconds for wallSeconds, _ in measurements)
+    startup = statistics.median(startupSeconds for _, startupSeconds in measurements)
+    print(f"runs={args.runs}  process {wall * 1000:.0f} ms  runner startup {startup * 1000:.0f} ms  "
+          f"budget {args.budget * 1000:.0f} ms")
+    if wall > args.budget:
+        print("  OVER BUDGET")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Бенчмарк ядра моделирования на синтетических картах.
+
+Каждый случай прогоняется в отдельном процессе (для честного пикового RSS)
+без HTTP до фиксированного модельного времени. Результат - JSON, который можно
+сравнить с результатом другого коммита:
+
+    python tests/benchmark/run_benchmark.py --output bench.json
+    python tests/benchmark/run_benchmark.py --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_maps import generateSyntheticMap
+
+# name: параметры generateSyntheticMap
+CASES = {
+    "small": {"chains": 2, "sourcesPerChain": 4, "trainsPerChain": 3, "recipesPerChain": 1},
+    "medium": {"chains": 20, "sourcesPerChain": 4, "trainsPerChain": 5, "recipesPerChain": 2},
+    "large": {"chains": 100, "sourcesPerChain": 8, "trainsPerChain": 10, "recipesPerChain": 3},
+    "fleet": {"chains": 20, "sourcesPerChain": 4, "trainsPerChain": 50, "recipesPerChain": 2, "fleet": True},
+}
+
+def measureEntityBytes(modelMap):
+    """Память построенной модели на одну сущность (tracemalloc, отдельная сборка -
+    трассировка замедляет прогон и не должна попадать в замер времени)"""
+    from modeling.modeling_core import ModelingCore
+
+    tracemalloc.start()
+    core = ModelingCore(modelMap, modelMap["name"], modelMap["caption"], seed=0)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size // (len(core.nodes) + len(core.transports))
+
+def runCase(caseName, parameters, until, fluid, profile=False):
+    """Прогон одного случая; выполняется в дочернем процессе"""
+    from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+
+    modelMap = generateSyntheticMap(**parameters)
+    modelMap["fluid"] = fluid
+
+    loadStart = time.perf_counter()
+    core = ModelingCore(modelMap, modelMap["name"], modelMap["caption"], seed=0, profile=profile)
+    loadSeconds = time.perf_counter() - loadStart
+    core.configureRun(RUN_MODE_BATCH, until=until)
+
+    env = core.env
+    scheduledBefore = next(env._eid)
+    queuedBefore = len(env._queue)
+    runStart = time.perf_counter()
+    core.run_batch()
+    wallSeconds = time.perf_counter() - runStart
+    # обработано = запланировано за прогон минус то, что осталось в очереди
+    events = (next(env._eid) - scheduledBefore - 1) - (len(env._queue) - queuedBefore)
+
+    result = {
+        "case": caseName,
+        "parameters": parameters,
+        "fluid": fluid,
+        "nodes": len(core.nodes),
+        "transports": len(core.transports),
+        "until": until,
+        "loadSeconds": loadSeconds,
+        "wallSeconds": wallSeconds,
+        "events": events,
+        "eventsPerSecond": events / wallSeconds if wallSeconds > 0 else 0,
+        "peakRssKb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "bytesPerEntity": measureEntityBytes(modelMap)
+    }
+    if profile:
+        report = core.getProfile()
+        result["profile"] = {"byType": report["byType"], "top": report["top"]}
+    return result
+
+def runPartitionedCase(caseName, parameters, until, fluid, partitions):
+    """Тот же случай разделами в параллельных процессах (modeling.partitioning)"""
+    from modeling.partitioning.partitioned_run import runPartitioned
+
+    modelMap = generateSyntheticMap(**parameters)
+    modelMap["fluid"] = fluid
+    result = runPartitioned(modelMap, until, partitions, seed=0)
+    return {
+        "partitions": result["partitions"],
+        "cutTransports": len(result["cutTransports"]),
+        "lookahead": result["lookahead"],
+        "windows": result["windows"],
+        "messages": result["messages"],
+        "wallSeconds": result["wallTime"]
+    }
+
+def runIsolated(caseName, parameters, until, fluid, profile=False):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(runCase, (caseName, parameters, until, fluid, profile))
+
+def getCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """Печатает сравнение с базовым прогоном, возвращает число регрессий"""
+    baselineCases = {(item["case"], item["fluid"]): item for item in baseline["results"]}
+    regressions = 0
+    for item in results["results"]:
+        base = baselineCases.get((item["case"], item["fluid"]))
+        if base is None:
+            continue
+        ratio = item["eventsPerSecond"] / base["eventsPerSecond"] if base["eventsPerSecond"] else 0
+        rssRatio = item["peakRssKb"] / base["peakRssKb"] if base["peakRssKb"] else 0
+        # в старых результатах замера на сущность нет
+        entityBytes = f"  bytes/entity {base.get('bytesPerEntity', '-')} -> {item['bytesPerEntity']}"
+        mark = ""
+        if ratio < 1 - tolerance:
+            mark = "  REGRESSION"
+            regressions = regressions + 1
+        print(f"{item['case']:>8} fluid={item['fluid']!s:5} events/s x{ratio:.2f}  wall {base['wallSeconds']:.3f}s -> {item['wallSeconds']:.3f}s  rss x{rssRatio:.2f}{entityBytes}{mark}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ModelingCore on synthetic maps")
+    parser.add_argument("--cases", default="small,medium", help="comma separated: " + ",".join(CASES))
+    parser.add_argument("--until", type=float, default=1000)
+    parser.add_argument("--fluid", action="store_true", help="also run every case in fluid mode")
+    parser.add_argument("--profile", action="store_true", help="collect per-entity kernel profile (adds overhead)")
+    parser.add_argument("--partitions", type=int, help="also run every case partitioned across this many processes")
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--compare", help="baseline results JSON to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed events/s drop before a regression is reported")
+    args = parser.parse_args()
+
+    results = {
+        "commit": getCommit(),
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": []
+    }
+    for caseName in args.cases.split(","):
+        for fluid in ((False, True) if args.fluid else (False,)):
+            result = runIsolated(caseName, CASES[caseName], args.until, fluid, args.profile)
+            results["results"].append(result)
+            print(f"{caseName:>8} fluid={fluid!s:5} nodes={result['nodes']:<6} transports={result['transports']:<6} "
+                  f"events={result['events']:<9} {result['eventsPerSecond']:>10.0f} ev/s  "
+                  f"wall={result['wallSeconds']:.3f}s  rss={result['peakRssKb'] / 1024:.1f} MB  {result['bytesPerEntity']} B/entity")
+            if args.partitions:
+                result["partitioned"] = runPartitionedCase(caseName, CASES[caseName], args.until, fluid, args.partitions)
+                partitioned = result["partitioned"]
+                print(f"{'':>10}partitions={partitioned['partitions']} cut={partitioned['cutTransports']} "
+                      f"windows={partitioned['windows']} messages={partitioned['messages']}  "
+                      f"wall={partitioned['wallSeconds']:.3f}s  speedup x{result['wallSeconds'] / partitioned['wallSeconds']:.2f}")
+            if args.profile:
+                for entity in result["profile"]["top"][:5]:
+                    print(f"{'':>10}{entity['entity']:<16} {entity['wallTime']:.3f}s  {entity['eventsTotal']} events  {entity['events']}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
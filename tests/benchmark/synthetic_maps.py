@@ -0,0 +1,88 @@
+import random
+
+def generateSyntheticMap(chains, sourcesPerChain=4, trainsPerChain=3, recipesPerChain=1, fleet=False, seed=0):
+    """Синтетическая карта из независимых производственных цепочек:
+    источники -> склад -> поезда -> склад -> фабрики (recipesPerChain последовательно) -> сток.
+    Размер растет по узлам (chains, sourcesPerChain), транспорту (trainsPerChain) и рецептам"""
+    rng = random.Random(seed)
+    nodes = []
+    transport = []
+
+    def addNode(node):
+        node["id"] = len(nodes)
+        nodes.append(node)
+        return node["id"]
+
+    def addTransport(transportType, fromId, toId, data):
+        transport.append({
+            "id": len(transport),
+            "type": transportType,
+            "from_id": fromId,
+            "from_endpoint": 0,
+            "to_id": toId,
+            "to_endpoint": 0,
+            "data": data
+        })
+
+    for chain in range(chains):
+        rawResource = f"raw_{chain}"
+        miningSpeed = rng.choice((240, 480, 960))
+        storage = addNode({
+            "type": "simple_storage",
+            "resourceType": rawResource,
+            "importLock": False,
+            "importLockDelay": 0,
+            "exportLock": True,
+            "exportLockDelay": 1,
+            "capacity": 51200
+        })
+        for _ in range(sourcesPerChain):
+            source = addNode({
+                "type": "source",
+                "imports": [],
+                "resourceType": rawResource,
+                "miningSpeed": miningSpeed,
+                "miningFrame": miningSpeed // 10,
+                "internalStorageCapacity": 200
+            })
+            addTransport("teleport", source, storage, {"perMinute": miningSpeed, "frame": miningSpeed // 10})
+
+        unloading = addNode({
+            "type": "simple_storage",
+            "resourceType": rawResource,
+            "importLock": True,
+            "importLockDelay": 1,
+            "exportLock": False,
+            "exportLockDelay": 0,
+            "capacity": 51200
+        })
+        trainData = {"limit": 2000, "min_delay": 20.0, "max_delay": 30.0}
+        if fleet:
+            addTransport("fleet", storage, unloading, dict(trainData, count=trainsPerChain))
+        else:
+            for _ in range(trainsPerChain):
+                addTransport("train", storage, unloading, dict(trainData))
+
+        previous = unloading
+        resource = rawResource
+        for stage in range(recipesPerChain):
+            product = f"product_{chain}_{stage}"
+            fabric = addNode({
+                "type": "fabric",
+                "imports": [{"id": 0, "resourceType": resource, "minForReciept": 100, "internalCapacity": 51200}],
+                "exports": [{"id": 0, "resourceType": product, "outPerReciept": 90, "internalCapacity": 51200}],
+                "reciept": {"delay": 1.0}
+            })
+            addTransport("teleport", previous, fabric, {"perMinute": 1000, "frame": 100})
+            previous = fabric
+            resource = product
+
+        sink = addNode({"type": "sink", "resourceType": resource})
+        addTransport("teleport", previous, sink, {"perMinute": 1000, "frame": 100})
+
+    return {
+        "name": f"synthetic-{chains}x{sourcesPerChain}x{trainsPerChain}x{recipesPerChain}",
+        "caption": "Synthetic benchmark map",
+        "nodes": nodes,
+        "transport": transport
+    }
@@ -0,0 +1,43 @@
+"""ASGI-сервер: Flask API через WSGI и потоковые эндпоинты срезов модели.
+
+    python -m pytest tests/test_async_server.py
+"""
+import os
+import sys
+import warnings
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from hosting.async_server import create_async_app
+
+UNKNOWN_ID = 10 ** 9
+
+@pytest.fixture
+def client():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        app = create_async_app("thread")
+    return TestClient(app)
+
+def testFlaskApiIsMounted(client):
+    response = client.get("/api/simulations/registry")
+    assert response.status_code == 200
+    assert "live" in response.json()
+
+def testStreamOfUnknownSimulationIs404(client):
+    response = client.get(f"/api/simulations/{UNKNOWN_ID}/stream")
+    assert response.status_code == 404
+    assert "error" in response.json()
+
+def testWebSocketOfUnknownSimulationIsClosed(client):
+    with client.websocket_connect(f"/api/simulations/{UNKNOWN_ID}/ws") as websocket:
+        assert "error" in websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1008
@@ -0,0 +1,71 @@
+"""Восстановление из контрольной точки продолжает прогон так же, как без нее:
+прогон до T, контрольная точка (через JSON), восстановление и прогон до 2T дают тот же срез,
+что и прогон до 2T без перерыва. Карты покрывают поезда, флот, фабрику и доки буферов
+(очередь к слоту и задержку блокировки); T - не на сетке событий, с одновременными событиями.
+
+Числа с плавающей точкой сравниваются с допуском: средние по времени копятся интегралом
+по отрезкам, и контрольная точка сама добавляет границу отрезка.
+
+    python -m pytest tests/test_checkpoint_restore.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "benchmark"))
+
+from synthetic_maps import generateSyntheticMap
+from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+
+def loadDemo():
+    with open(os.path.join(ROOT, "tests", "demo.json")) as file:
+        return json.load(file)
+
+def dockedDemo(ports, delay):
+    """Демо с флотом между буферами 4 -> 5 и доками на обоих буферах"""
+    modelMap = loadDemo()
+    modelMap["transport"].append({
+        "id": 10, "type": "fleet", "from_id": 4, "from_endpoint": 0, "to_id": 5, "to_endpoint": 0,
+        "data": {"limit": 2000, "min_delay": 15.0, "max_delay": 35.0, "count": 3}
+    })
+    for node in modelMap["nodes"]:
+        if node["id"] in (4, 5):
+            node.update(importPorts=ports, exportPorts=ports, importLock=True, exportLock=True,
+                        importLockDelay=delay, exportLockDelay=delay)
+    return modelMap
+
+MAPS = {
+    "demo": loadDemo,
+    "demo-fluid": lambda: dict(loadDemo(), fluid=True),
+    "docks": lambda: dockedDemo(1, 5.0),
+    "docks-parallel": lambda: dockedDemo(2, 5.0),
+    "synthetic-fleet": lambda: generateSyntheticMap(3, recipesPerChain=2, fleet=True),
+}
+
+def runCore(modelMap, until, runOptions):
+    core = ModelingCore.create(modelMap, "checkpoint", "", dict(runOptions, mode=RUN_MODE_BATCH, until=until, recording=False))
+    core.run_batch()
+    return core
+
+def approx(value):
+    if isinstance(value, dict):
+        return {key: approx(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return pytest.approx(value, rel=1e-9, abs=1e-9)
+    return value
+
+@pytest.mark.parametrize("mapName", MAPS)
+@pytest.mark.parametrize("checkpointTime", [88.3, 326.637, 512.9])
+def testRestoredRunMatchesUninterrupted(mapName, checkpointTime):
+    modelMap = MAPS[mapName]()
+    uninterrupted = runCore(modelMap, 2 * checkpointTime, {"seed": 3}).getSnapshot()
+    checkpoint = json.loads(json.dumps(runCore(modelMap, checkpointTime, {"seed": 3}).getCheckpoint()))
+    restored = runCore(None, 2 * checkpointTime, {"checkpoint": checkpoint}).getSnapshot()
+    for section in ("nodes", "transports"):
+        assert restored[section].keys() == uninterrupted[section].keys()
+        for entityId, status in uninterrupted[section].items():
+            assert restored[section][entityId] == approx(status), f"{section} {entityId}"
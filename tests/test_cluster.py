@@ -0,0 +1,94 @@
+"""Кластерный бэкенд на одной машине: координатор на Unix-сокете и два локальных воркера
+(runClusterWorker в своих процессах). Проверяются раздача моделей по воркерам, пересоздание
+модели на другом воркере после гибели своего и переподключение воркеров к перезапущенному
+координатору.
+
+    python -m pytest tests/test_cluster.py
+"""
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from hosting.workers.cluster_coordinator import ClusterCoordinator
+from hosting.workers.cluster_worker import runClusterWorker
+from modeling.model_spec import ModelSpec
+
+AUTHKEY = b"cluster-test"
+
+def loadDemo():
+    with open(os.path.join(ROOT, "tests", "demo.json")) as file:
+        return json.load(file)
+
+def waitFor(predicate, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+def registeredPids(coordinator):
+    return {worker["pid"] for worker in coordinator.getWorkers() if worker["alive"]}
+
+@pytest.fixture
+def cluster(tmp_path):
+    address = str(tmp_path / "coordinator.sock")
+    coordinator = ClusterCoordinator(address, AUTHKEY, registrationTimeout=15.0)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=runClusterWorker, args=(address, AUTHKEY, 0.1), daemon=True) for _ in range(2)]
+    for process in processes:
+        process.start()
+    state = {"coordinator": coordinator, "address": address, "processes": processes}
+    try:
+        assert waitFor(lambda: len(registeredPids(coordinator)) == 2), "workers did not register"
+        yield state
+    finally:
+        state["coordinator"].stopWorkers()
+        state["coordinator"].shutdown()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+
+def submitDemo(coordinator, until=50):
+    return coordinator.submit(ModelSpec.parse(loadDemo()), "demo", "", {"mode": "batch", "until": until, "seed": 1})
+
+def testModelsAreSpreadOverWorkers(cluster):
+    coordinator = cluster["coordinator"]
+    cores = [submitDemo(coordinator) for _ in range(2)]
+    assert {core.worker.info["pid"] for core in cores} == registeredPids(coordinator)
+    for core in cores:
+        assert waitFor(lambda: core.getState() == "finished")
+        assert core.getModelTime() == 50
+    assert cores[0].getSnapshot()["nodes"] == cores[1].getSnapshot()["nodes"]
+
+def testModelIsRecreatedWhenItsWorkerDies(cluster):
+    coordinator = cluster["coordinator"]
+    core = submitDemo(coordinator)
+    lostPid = core.worker.info["pid"]
+    os.kill(lostPid, signal.SIGKILL)
+    assert waitFor(lambda: not core.worker.alive)
+    # следующий вызов пересоздает модель на оставшемся воркере
+    assert waitFor(lambda: core.getState() == "finished")
+    assert core.worker.info["pid"] != lostPid
+    assert core.getModelTime() == 50
+    # модель начата заново с t=0 - клиент видит это в сводке
+    assert core.restarted == 1
+    assert core.getSummary()["restarted"] == 1
+
+def testWorkersReconnectToRestartedCoordinator(cluster):
+    pids = registeredPids(cluster["coordinator"])
+    cluster["coordinator"].shutdown()
+    coordinator = cluster["coordinator"] = ClusterCoordinator(cluster["address"], AUTHKEY, registrationTimeout=15.0)
+    assert waitFor(lambda: registeredPids(coordinator) == pids), "workers did not reconnect"
+    assert all(process.is_alive() for process in cluster["processes"])
+    core = submitDemo(coordinator)
+    assert waitFor(lambda: core.getState() == "finished")
@@ -0,0 +1,51 @@
+"""Проверка карты при загрузке: индексы входов/выходов транспорта считаются с 0 и не выходят
+за число входов/выходов узла - иначе 400 при создании модели.
+
+    python -m pytest tests/test_map_schema.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from hosting.server import create_app
+from modeling.model_spec import ModelSpec
+
+def loadDemo():
+    with open(os.path.join(ROOT, "tests", "demo.json")) as file:
+        return json.load(file)
+
+def fabricTransport(modelMap, field):
+    fabricId = next(node["id"] for node in modelMap["nodes"] if node["type"] == "fabric")
+    idField = "to_id" if field == "to_endpoint" else "from_id"
+    return next(transport for transport in modelMap["transport"] if transport[idField] == fabricId)
+
+def testDemoEndpointsAreAccepted():
+    ModelSpec.parse(loadDemo())
+
+@pytest.mark.parametrize("field", ["to_endpoint", "from_endpoint"])
+def testFabricEndpointOutOfRangeIsRejected(field):
+    modelMap = loadDemo()
+    # у фабрики демо один вход и один выход: индекс 1 - старая нумерация с 1
+    fabricTransport(modelMap, field)[field] = 1
+    with pytest.raises(ValueError, match=f"{field} 1 is out of range"):
+        ModelSpec.parse(modelMap)
+
+def testSingleEndpointNodeRejectsNonZeroIndex():
+    modelMap = loadDemo()
+    sinkId = next(node["id"] for node in modelMap["nodes"] if node["type"] == "sink")
+    next(transport for transport in modelMap["transport"] if transport["to_id"] == sinkId)["to_endpoint"] = 1
+    with pytest.raises(ValueError, match="to_endpoint 1 is out of range"):
+        ModelSpec.parse(modelMap)
+
+def testOutOfRangeEndpointGives400():
+    modelMap = loadDemo()
+    fabricTransport(modelMap, "to_endpoint")["to_endpoint"] = 1
+    modelMap.update(name="demo", caption="", run={"mode": "batch", "until": 10})
+    response = create_app("thread").test_client().post("/api/simulations/", json=modelMap)
+    assert response.status_code == 400
+    assert "out of range" in response.get_json()["error"]
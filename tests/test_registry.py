@@ -0,0 +1,137 @@
+"""Реестр моделей сервера: вытеснение по TTL и LRU с выгрузкой на диск, чтение выгруженной
+модели (срез и ряды из файла результатов) и отказ 429 при исчерпании лимита.
+
+    python -m pytest tests/test_registry.py
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from hosting.server import create_app
+from hosting.controllers.modeling_core_repository import ModelingCoresSingletone
+from hosting.controllers.spilled_simulation import SpilledSimulation
+from modeling.modeling_core import ModelingCore, RUN_MODE_BATCH
+
+def loadDemo():
+    with open(os.path.join(ROOT, "tests", "demo.json")) as file:
+        return json.load(file)
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app("thread")
+    ModelingCoresSingletone.configure(ttl=600, maxLive=2, spillDir=str(tmp_path), teardownDelay=0, memoryMaxAge=0)
+    yield app
+    for shard in ModelingCoresSingletone.shards:
+        shard.clear()
+    ModelingCoresSingletone.pendingCount = 0
+    ModelingCoresSingletone.configure()
+
+def addFinished(until=50):
+    core = ModelingCore.create(loadDemo(), "demo", "", {"mode": RUN_MODE_BATCH, "until": until, "seed": 1, "recording": True})
+    core.run_batch()
+    ModelingCoresSingletone.admit()
+    return ModelingCoresSingletone.add(core), core
+
+def setIdle(simulationId, seconds):
+    shard, lock = ModelingCoresSingletone._getShard(simulationId)
+    with lock:
+        shard[simulationId].lastAccess = time.monotonic() - seconds
+
+def testIdleSimulationIsSpilledAfterTtl(app):
+    simulationId, core = addFinished()
+    snapshot = core.getSnapshot()
+    series = core.getSeries()
+    modelTime = core.getModelTime()
+    setIdle(simulationId, ModelingCoresSingletone.ttl + 1)
+    ModelingCoresSingletone.sweep()
+
+    spilled = ModelingCoresSingletone.get(simulationId)
+    assert isinstance(spilled, SpilledSimulation)
+    assert os.path.isfile(spilled.path)
+    assert ModelingCoresSingletone.getStatistics()["spilled"] == 1
+    # выгруженная модель отвечает тем же, что и живая
+    assert spilled.getState() == "finished"
+    assert spilled.getModelTime() == modelTime
+    assert spilled.getSnapshot()["nodes"] == snapshot["nodes"]
+    spilledSeries = spilled.getSeries()
+    assert spilledSeries["columns"] == series["columns"]
+    assert spilledSeries["time"].tolist() == series["time"].tolist()
+    response = app.test_client().get(f"/api/simulations/{simulationId}/snapshot")
+    assert response.status_code == 200
+    assert response.get_json()["time"] == snapshot["time"]
+
+def testLeastRecentlyUsedIsSpilledOverLiveLimit(app):
+    firstId, _ = addFinished()
+    secondId, _ = addFinished()
+    setIdle(firstId, 20)
+    setIdle(secondId, 10)
+    # обращение делает первую модель самой свежей - вытесняется вторая
+    ModelingCoresSingletone.get(firstId)
+    ModelingCoresSingletone.admit()
+    ModelingCoresSingletone.cancelAdmission()
+    assert not isinstance(ModelingCoresSingletone.get(firstId), SpilledSimulation)
+    assert isinstance(ModelingCoresSingletone.get(secondId), SpilledSimulation)
+
+def testAdmissionLimitReturns429(app):
+    # оба места заняты допущенными, но еще не добавленными моделями - вытеснять нечего
+    ModelingCoresSingletone.admit(2)
+    modelMap = dict(loadDemo(), name="demo", caption="", run={"mode": RUN_MODE_BATCH, "until": 10})
+    response = app.test_client().post("/api/simulations/", json=modelMap)
+    assert response.status_code == 429
+    assert "error" in response.get_json()
+    assert response.headers["Retry-After"] == "5"
+
+    ModelingCoresSingletone.cancelAdmission(2)
+    response = app.test_client().post("/api/simulations/", json=modelMap)
+    assert response.status_code in (200, 202)
+
+def testThreadBatchRunsInBackground(app):
+    # запрос не ждет прогона: 202 с id, итог - опросом по id
+    modelMap = dict(loadDemo(), name="demo", caption="", run={"mode": RUN_MODE_BATCH, "until": 10000})
+    response = app.test_client().post("/api/simulations/", json=modelMap)
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "running"
+    core = ModelingCoresSingletone.get(response.get_json()["id"])
+    deadline = time.monotonic() + 60
+    while core.getState() == "running" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert core.getState() == "finished"
+    assert core.getModelTime() == 10000
+
+def testThreadBatchWithoutStopIsRejected(app):
+    modelMap = dict(loadDemo(), name="demo", caption="", run={"mode": RUN_MODE_BATCH})
+    response = app.test_client().post("/api/simulations/", json=modelMap)
+    assert response.status_code == 400
+    assert ModelingCoresSingletone.getStatistics()["pending"] == 0
+
+class CountingCore:
+    """Модель, которая считает запросы оценки памяти (у воркера - запрос к процессу)"""
+
+    def __init__(self):
+        self.memoryCalls = 0
+
+    def getMemoryUsage(self):
+        self.memoryCalls = self.memoryCalls + 1
+        return 1024
+
+    def getState(self):
+        return "running"
+
+def testAdmissionReusesRecentMemoryEstimates(app):
+    ModelingCoresSingletone.memoryMaxAge = 60
+    core = CountingCore()
+    ModelingCoresSingletone.admit()
+    ModelingCoresSingletone.add(core)
+    calls = core.memoryCalls
+    ModelingCoresSingletone.admit()
+    ModelingCoresSingletone.cancelAdmission()
+    assert core.memoryCalls == calls
+    # обход реестра обновляет оценки всегда
+    ModelingCoresSingletone.sweep()
+    assert core.memoryCalls == calls + 1